@@ -1,44 +1,101 @@
-from flask import Flask
-from flask_cors import CORS
-import os
-from controlador.controlador import rutas
-from controlador.controlador_usuario import ControladorUsuario
-from controlador.controlador_diagnostico import ControladorDiagnostico
-from controlador.controlador_resultados import ControladorResultados
-from controlador.controlador_admin import ControladorAdmin
-from controlador.controlador_configuracion import ControladorConfiguracion
-from controlador.controlador_sesion import ControladorSesion
-from config import get_db_config, SECRET_KEY, FLASK_ENV, PORT, CORS_ORIGINS
-
-app = Flask(__name__)
-CORS(app, 
-     resources={
-         r"/*": { 
-             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-             "allow_headers": ["Content-Type", "Authorization"], 
-             "supports_credentials": True,
-             "origins": CORS_ORIGINS
-         }
-     })
-
-# Configuración para Docker y desarrollo
-app.secret_key = SECRET_KEY
-app.config['SESSION_COOKIE_SAMESITE'] = 'None'
-app.config['SESSION_COOKIE_SECURE'] = False  # Para desarrollo local/Docker
-app.config['SESSION_COOKIE_HTTPONLY'] = False  # Para Flutter Web
-app.config['SESSION_COOKIE_DOMAIN'] = None  # Permitir cualquier dominio localhost
-
-# Configuración de base de datos
-DB_CONFIG = get_db_config()
-
-app.register_blueprint(rutas)
-app.register_blueprint(ControladorUsuario.blueprint)
-app.register_blueprint(ControladorDiagnostico.blueprint)
-app.register_blueprint(ControladorResultados.blueprint)
-app.register_blueprint(ControladorAdmin.blueprint)
-app.register_blueprint(ControladorConfiguracion.blueprint)
-app.register_blueprint(ControladorSesion.blueprint)
-
-if __name__ == '__main__':
-    debug = FLASK_ENV != 'production'
+from flask import Flask
+from flask_cors import CORS
+import os
+from controlador.controlador import rutas
+from controlador.controlador_usuario import ControladorUsuario
+from controlador.controlador_diagnostico import ControladorDiagnostico
+from controlador.controlador_resultados import ControladorResultados
+from controlador.controlador_admin import ControladorAdmin
+from controlador.controlador_configuracion import ControladorConfiguracion
+from controlador.controlador_sesion import ControladorSesion
+from controlador.controlador_metricas import ControladorMetricas
+from modelo.registro_modelos import RegistroModelos
+from modelo.unidad_trabajo import registrar_unidad_trabajo
+from modelo.instrumentacion import registrar_instrumentacion
+from modelo.plazos import registrar_plazos
+from modelo.limitador import registrar_limitador
+from modelo.sesiones import registrar_sesiones
+from modelo.tokens import registrar_tokens
+from modelo.contrasenas import registrar_contrasenas
+from modelo.cola_persistencia import ColaPersistencia
+from config import (
+    get_db_config, SECRET_KEY, FLASK_ENV, PORT, CORS_ORIGINS, PRECARGAR_MODELOS, PERSISTENCIA_DIFERIDA, BD_MOTOR,
+    PARTICIONES_MANTENIMIENTO, MIGRAR_AL_ARRANCAR
+)
+
+app = Flask(__name__)
+CORS(app, 
+     resources={
+         r"/*": { 
+             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+             "allow_headers": ["Content-Type", "Authorization"], 
+             "supports_credentials": True,
+             "origins": CORS_ORIGINS
+         }
+     })
+
+# Configuración para Docker y desarrollo
+app.secret_key = SECRET_KEY
+app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+app.config['SESSION_COOKIE_SECURE'] = False  # Para desarrollo local/Docker
+app.config['SESSION_COOKIE_HTTPONLY'] = False  # Para Flutter Web
+app.config['SESSION_COOKIE_DOMAIN'] = None  # Permitir cualquier dominio localhost
+
+# Configuración de base de datos
+DB_CONFIG = get_db_config()
+
+app.register_blueprint(rutas)
+app.register_blueprint(ControladorUsuario.blueprint)
+app.register_blueprint(ControladorDiagnostico.blueprint)
+app.register_blueprint(ControladorResultados.blueprint)
+app.register_blueprint(ControladorAdmin.blueprint)
+app.register_blueprint(ControladorConfiguracion.blueprint)
+app.register_blueprint(ControladorSesion.blueprint)
+app.register_blueprint(ControladorMetricas.blueprint)
+
+# Sesiones guardadas en el servidor; la cookie solo lleva su identificador
+registrar_sesiones(app)
+# 429 para las peticiones de login, registro y diagnóstico por encima de su límite,
+# antes que cualquier otro trabajo de la petición
+registrar_limitador(app)
+# Plazo de cada petición para la base de datos y 503 si no está disponible
+registrar_plazos(app)
+# 401 para los tokens Bearer inválidos, caducados o revocados
+registrar_tokens(app)
+# Hashes de contraseñas en hilos dedicados; 503 si hay demasiados logins en cola
+registrar_contrasenas(app)
+# Sentencias, filas y tiempos de base de datos por endpoint (antes que la unidad de
+# trabajo, para que su commit final también se mida)
+registrar_instrumentacion(app)
+# Una conexión por petición, confirmada o deshecha una sola vez al terminar
+registrar_unidad_trabajo(app)
+
+# El esquema se crea o actualiza al arrancar, también en PostgreSQL: el despliegue solo
+# ejecuta `python app.py`. aplicar_migraciones toma un advisory lock, así que los
+# workers que arrancan a la vez se esperan en vez de aplicar dos veces lo mismo
+if MIGRAR_AL_ARRANCAR:
+    from modelo.modelo import abrir_conexion_bd
+    from modelo.migraciones import aplicar_migraciones
+    conn = abrir_conexion_bd()
+    try:
+        aplicar_migraciones(conn)
+    finally:
+        conn.close()
+
+# PostgreSQL: las particiones mensuales de los próximos meses se crean por adelantado
+if BD_MOTOR == 'postgres' and PARTICIONES_MANTENIMIENTO:
+    from modelo.particiones import iniciar_mantenimiento
+    iniciar_mantenimiento()
+
+# Precarga de modelos: con `gunicorn --preload app:app` ocurre una sola vez en el
+# proceso maestro y los workers comparten la memoria del modelo tras el fork
+if PRECARGAR_MODELOS:
+    RegistroModelos.precargar()
+
+# Persistencia diferida: arranca el hilo de escritura y reproduce lo volcado a disco
+if PERSISTENCIA_DIFERIDA:
+    ColaPersistencia.global_()
+
+if __name__ == '__main__':
+    debug = FLASK_ENV != 'production'
     app.run(host='0.0.0.0', debug=debug, port=PORT)
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""Servidor ASGI de la aplicación: uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Las vistas de VISTAS_ASYNC (sesión, resultados, configuración y lecturas del
+panel de administración) se ejecutan en el bucle de eventos con el pool async
+de psycopg 3: mientras esperan a PostgreSQL no ocupan ningún hilo. El resto de
+rutas son las vistas WSGI de siempre y se ejecutan en un pool de hilos
+(ASGI_HILOS_WSGI), de modo que la inferencia y las escrituras no bloquean el bucle.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import HTTPException
+from app import app as aplicacion_wsgi
+from controlador.controlador_async import VISTAS_ASYNC
+from modelo.pool_async import PoolAsync
+from config import ASGI_HILOS_WSGI, BD_MOTOR
+
+
+class AdaptadorAsgi:
+    """Sirve una aplicación Flask por ASGI con vistas async nativas y el resto en hilos"""
+
+    def __init__(self, aplicacion, vistas_async, hilos=ASGI_HILOS_WSGI):
+        self.aplicacion = aplicacion
+        self.vistas_async = vistas_async
+        self.hilos = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='asgi-wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        environ = self._environ(scope, await self._leer_cuerpo(receive))
+        vista, argumentos = self._buscar_vista_async(environ)
+        if vista is None:
+            bucle = asyncio.get_running_loop()
+            await bucle.run_in_executor(self.hilos, self._atender_wsgi, environ, send, bucle)
+        else:
+            await self._atender_async(environ, vista, argumentos, send)
+
+    async def _ciclo_de_vida(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                if self.vistas_async:
+                    await PoolAsync.global_()
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await PoolAsync.cerrar()
+                self.hilos.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _leer_cuerpo(receive):
+        partes = []
+        while True:
+            mensaje = await receive()
+            partes.append(mensaje.get('body', b''))
+            if not mensaje.get('more_body'):
+                return b''.join(partes)
+
+    @staticmethod
+    def _environ(scope, cuerpo):
+        servidor = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': servidor[0],
+            'SERVER_PORT': str(servidor[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+            'CONTENT_LENGTH': str(len(cuerpo)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(cuerpo),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for nombre, valor in scope.get('headers', []):
+            nombre = nombre.decode('latin-1').upper().replace('-', '_')
+            valor = valor.decode('latin-1')
+            if nombre == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = valor
+                continue
+            if nombre == 'CONTENT_LENGTH':
+                continue
+            clave = 'HTTP_' + nombre
+            environ[clave] = environ[clave] + ',' + valor if clave in environ else valor
+        return environ
+
+    def _buscar_vista_async(self, environ):
+        """La ruta la resuelve el url_map de Flask; la vista async sustituye a la del mismo endpoint"""
+        try:
+            endpoint, argumentos = self.aplicacion.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None, None
+        return self.vistas_async.get((endpoint, environ['REQUEST_METHOD'])), argumentos
+
+    async def _atender_async(self, environ, vista, argumentos, send):
+        # Mismo ciclo que Flask.full_dispatch_request: before_request, vista,
+        # after_request (CORS, cookie de sesión) y teardown al salir del contexto
+        aplicacion = self.aplicacion
+        with aplicacion.request_context(environ):
+            try:
+                try:
+                    respuesta = aplicacion.preprocess_request()
+                    if respuesta is None:
+                        respuesta = await vista(**argumentos)
+                except Exception as e:
+                    respuesta = aplicacion.handle_user_exception(e)
+                respuesta = aplicacion.finalize_request(respuesta)
+            except Exception as e:
+                respuesta = aplicacion.handle_exception(e)
+            cuerpo, estado, cabeceras = respuesta.get_wsgi_response(environ)
+            cuerpo = b''.join(cuerpo)
+        await send({
+            'type': 'http.response.start',
+            'status': int(estado.split(' ', 1)[0]),
+            'headers': [(nombre.lower().encode('latin-1'), valor.encode('latin-1')) for nombre, valor in cabeceras],
+        })
+        await send({'type': 'http.response.body', 'body': cuerpo})
+
+    def _atender_wsgi(self, environ, send, bucle):
+        """Ejecuta la vista WSGI en un hilo del pool, respuesta en streaming incluida"""
+        def enviar(mensaje):
+            # Espera a que el bucle envíe cada parte: la respuesta no se acumula en memoria
+            asyncio.run_coroutine_threadsafe(send(mensaje), bucle).result()
+
+        inicio = {}
+
+        def start_response(estado, cabeceras, exc_info=None):
+            inicio['status'] = int(estado.split(' ', 1)[0])
+            inicio['headers'] = [
+                (nombre.lower().encode('latin-1'), valor.encode('latin-1')) for nombre, valor in cabeceras
+            ]
+
+        resultado = self.aplicacion(environ, start_response)
+        try:
+            iniciada = False
+            for parte in resultado:
+                if not parte:
+                    continue
+                if not iniciada:
+                    enviar({'type': 'http.response.start', **inicio})
+                    iniciada = True
+                enviar({'type': 'http.response.body', 'body': parte, 'more_body': True})
+            if not iniciada:
+                enviar({'type': 'http.response.start', **inicio})
+            enviar({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(resultado, 'close'):
+                resultado.close()
+
+
+# Con SQLite no hay driver async: todas las vistas se atienden en hilos
+app = AdaptadorAsgi(aplicacion_wsgi, VISTAS_ASYNC if BD_MOTOR == 'postgres' else {})
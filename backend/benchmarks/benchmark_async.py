@@ -0,0 +1,188 @@
+"""Benchmark de capacidad concurrente: servidor síncrono (gunicorn gthread) frente al modo ASGI.
+
+Arranca cada servidor con la base de datos detrás de un proxy TCP que añade
+--latencia-ms de ida y vuelta (PostgreSQL remoto) y mide peticiones/segundo y
+latencias p50/p99 con distintas cantidades de conexiones simultáneas sobre
+una lectura de /api/resultados/<username>.
+
+Uso (desde backend/, con la base de datos de config.py y un usuario existente):
+    python -m benchmarks.benchmark_async [--usuario ana] [--latencia-ms 20]
+        [--conexiones 8,32,128,512] [--segundos 10] [--hilos 8]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+from config import get_db_config
+
+PUERTO_PROXY = 6543
+PUERTO_SERVIDOR = 5099
+
+
+async def _reenviar(lector, escritor, retardo):
+    """Copia un sentido de la conexión entregando cada bloque retardo segundos después de leerlo"""
+    pendientes = asyncio.Queue()
+
+    async def entregar():
+        while True:
+            vence, datos = await pendientes.get()
+            if datos is None:
+                break
+            await asyncio.sleep(max(vence - time.monotonic(), 0))
+            escritor.write(datos)
+            await escritor.drain()
+        escritor.close()
+
+    entrega = asyncio.ensure_future(entregar())
+    try:
+        while True:
+            datos = await lector.read(65536)
+            if not datos:
+                break
+            pendientes.put_nowait((time.monotonic() + retardo, datos))
+    except ConnectionError:
+        pass
+    finally:
+        pendientes.put_nowait((0, None))
+        await entrega
+
+
+async def _proxy_con_latencia(latencia_ms):
+    """Proxy hacia PostgreSQL que añade latencia_ms de ida y vuelta"""
+    db_config = get_db_config()
+    host, puerto = db_config['host'], db_config.get('port', 5432)
+    retardo = latencia_ms / 2000
+
+    async def atender(lector_cliente, escritor_cliente):
+        if host.startswith('/'):
+            lector_bd, escritor_bd = await asyncio.open_unix_connection(f"{host}/.s.PGSQL.{puerto}")
+        else:
+            lector_bd, escritor_bd = await asyncio.open_connection(host, puerto)
+        try:
+            await asyncio.gather(
+                _reenviar(lector_cliente, escritor_bd, retardo),
+                _reenviar(lector_bd, escritor_cliente, retardo),
+            )
+        except asyncio.CancelledError:
+            # Conexiones que siguen abiertas al terminar el benchmark
+            escritor_cliente.close()
+            escritor_bd.close()
+
+    return await asyncio.start_server(atender, '127.0.0.1', PUERTO_PROXY)
+
+
+async def _pedir(lector, escritor, peticion):
+    escritor.write(peticion)
+    await escritor.drain()
+    cabecera = await lector.readuntil(b'\r\n\r\n')
+    estado = int(cabecera.split(b' ', 2)[1])
+    largo = 0
+    for linea in cabecera.split(b'\r\n'):
+        if linea.lower().startswith(b'content-length:'):
+            largo = int(linea.split(b':', 1)[1])
+    await lector.readexactly(largo)
+    return estado
+
+
+async def _carga(ruta, conexiones, segundos):
+    """conexiones clientes keep-alive pidiendo ruta sin pausa durante segundos"""
+    peticion = f"GET {ruta} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode()
+    latencias = []
+    errores = 0
+    fin = time.monotonic() + segundos
+
+    async def cliente():
+        nonlocal errores
+        try:
+            lector, escritor = await asyncio.open_connection('127.0.0.1', PUERTO_SERVIDOR)
+        except OSError:
+            errores += 1
+            return
+        try:
+            while time.monotonic() < fin:
+                inicio = time.perf_counter()
+                if await _pedir(lector, escritor, peticion) != 200:
+                    errores += 1
+                else:
+                    latencias.append(time.perf_counter() - inicio)
+        except (OSError, asyncio.IncompleteReadError):
+            errores += 1
+        finally:
+            escritor.close()
+
+    await asyncio.gather(*(cliente() for _ in range(conexiones)))
+    latencias.sort()
+    percentil = lambda p: latencias[min(int(len(latencias) * p), len(latencias) - 1)] * 1000 if latencias else float('nan')
+    return len(latencias) / segundos, percentil(0.5), percentil(0.99), errores
+
+
+def _arrancar(comando, entorno):
+    proceso = subprocess.Popen(comando, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    return proceso
+
+
+async def _esperar_servidor(ruta, limite=60):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            lector, escritor = await asyncio.open_connection('127.0.0.1', PUERTO_SERVIDOR)
+            estado = await _pedir(lector, escritor, f"GET {ruta} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+            escritor.close()
+            if estado == 200:
+                return
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+async def principal(argumentos):
+    proxy = await _proxy_con_latencia(argumentos.latencia_ms)
+    db_config = get_db_config()
+    entorno = dict(
+        os.environ,
+        DATABASE_URL=f"postgresql://{quote(db_config['user'])}:{quote(db_config['password'] or '')}"
+                     f"@127.0.0.1:{PUERTO_PROXY}/{db_config['database']}",
+        POOL_CONEXIONES_MAX=str(argumentos.hilos),
+        POOL_ASYNC_MAX=str(argumentos.pool_async),
+        PRECARGAR_MODELOS='0',
+    )
+    servidores = {
+        f"sync (gunicorn gthread, {argumentos.hilos} hilos)": [
+            sys.executable, '-m', 'gunicorn', '-k', 'gthread', '-w', '1', '--threads', str(argumentos.hilos),
+            '--backlog', '4096', '-b', f"127.0.0.1:{PUERTO_SERVIDOR}", 'app:app'],
+        f"asgi (uvicorn, pool async {argumentos.pool_async})": [
+            sys.executable, '-m', 'uvicorn', '--workers', '1', '--backlog', '4096', '--log-level', 'warning',
+            '--port', str(PUERTO_SERVIDOR), 'asgi:app'],
+    }
+    ruta = f"/api/resultados/{quote(argumentos.usuario)}"
+    print(f"Latencia añadida a PostgreSQL: {argumentos.latencia_ms} ms; ruta {ruta}; {argumentos.segundos}s por medida")
+    for nombre, comando in servidores.items():
+        proceso = _arrancar(comando, entorno)
+        try:
+            await _esperar_servidor(ruta)
+            print(f"\n{nombre}")
+            print(f"{'conexiones':>10} {'pet/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errores':>8}")
+            for conexiones in argumentos.conexiones:
+                velocidad, p50, p99, errores = await _carga(ruta, conexiones, argumentos.segundos)
+                print(f"{conexiones:>10} {velocidad:>9.0f} {p50:>9.1f} {p99:>9.1f} {errores:>8}")
+        finally:
+            os.killpg(proceso.pid, signal.SIGTERM)
+            proceso.wait()
+    proxy.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuario', default='ana')
+    parser.add_argument('--latencia-ms', type=float, default=20)
+    parser.add_argument('--conexiones', type=lambda valor: [int(n) for n in valor.split(',')], default=[8, 32, 128, 512])
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--pool-async', type=int, default=20)
+    asyncio.run(principal(parser.parse_args()))
@@ -0,0 +1,53 @@
+"""Benchmark del codificador de variables: filas/segundo de la ruta escalar y la columnar.
+
+Uso (desde backend/): python -m benchmarks.benchmark_codificador [filas]
+"""
+import sys
+import time
+import numpy as np
+from modelo.codificador import codificar, codificar_columnas
+
+
+def generar_columnas(filas, semilla=0):
+    aleatorio = np.random.default_rng(semilla)
+    peso = aleatorio.uniform(40, 130, filas)
+    estatura = aleatorio.integers(140, 205, filas)
+    return {
+        'edad': aleatorio.integers(18, 95, filas),
+        'genero': aleatorio.choice(['Femenino', 'Masculino'], filas),
+        'ps': aleatorio.integers(85, 200, filas),
+        'pd': aleatorio.integers(50, 120, filas),
+        'colesterol': aleatorio.uniform(120, 320, filas),
+        'glucosa': aleatorio.uniform(60, 200, filas),
+        'fuma': aleatorio.choice(['s', 'n'], filas),
+        'alcohol': aleatorio.choice(['s', 'n'], filas),
+        'actividad': aleatorio.choice(['No realiza', '1-2 veces por semana', '3 o más veces'], filas),
+        'peso': peso,
+        'estatura': estatura,
+        'imc': peso / ((estatura / 100) ** 2),
+    }
+
+
+def medir(funcion, filas):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    return resultado, filas / segundos
+
+
+if __name__ == '__main__':
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    filas_escalar = min(filas, 200_000)
+    columnas = generar_columnas(filas)
+    registros = [
+        {campo: valores[i].item() for campo, valores in columnas.items()}
+        for i in range(filas_escalar)
+    ]
+
+    escalar, velocidad_escalar = medir(lambda: np.concatenate([codificar(r) for r in registros]), filas_escalar)
+    columnar, velocidad_columnar = medir(lambda: codificar_columnas(columnas), filas)
+
+    if not np.array_equal(escalar, columnar[:filas_escalar]):
+        sys.exit("Las rutas escalar y columnar no coinciden")
+    print(f"Ruta escalar:  {velocidad_escalar:>14,.0f} filas/s ({filas_escalar:,} filas)")
+    print(f"Ruta columnar: {velocidad_columnar:>14,.0f} filas/s ({filas:,} filas)")
@@ -0,0 +1,48 @@
+"""Benchmark del hash de contraseñas: logins/segundo por núcleo y a través del pool.
+
+Para cada método mide la comprobación de un hash en un solo hilo (el coste de
+un login) y después --logins comprobaciones concurrentes enviadas al
+PoolContrasenas con --hilos hilos, como en una ráfaga de inicios de sesión.
+
+Uso (desde backend/):
+    python -m benchmarks.benchmark_contrasenas [--metodo scrypt:32768:8:1 ...] [--hilos 2] [--logins 64]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from modelo.contrasenas import PoolContrasenas, comprobar
+
+argumentos = argparse.ArgumentParser()
+argumentos.add_argument('--metodo', nargs='+', default=['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000'])
+argumentos.add_argument('--hilos', type=int, default=2)
+argumentos.add_argument('--logins', type=int, default=64)
+argumentos.add_argument('--repeticiones', type=int, default=5, help='comprobaciones en un solo hilo')
+
+
+def por_segundo(funcion, veces):
+    inicio = time.perf_counter()
+    for _ in range(veces):
+        funcion()
+    return veces / (time.perf_counter() - inicio)
+
+
+if __name__ == '__main__':
+    argumentos = argumentos.parse_args()
+    print(f"{os.cpu_count()} núcleos, pool de {argumentos.hilos} hilos, {argumentos.logins} logins concurrentes")
+    for metodo in argumentos.metodo:
+        almacenada = generate_password_hash('clave', method=metodo)
+        por_nucleo = por_segundo(lambda: check_password_hash(almacenada, 'clave'), argumentos.repeticiones)
+
+        # Cola suficiente para la ráfaga: aquí se mide el rendimiento, no el rechazo
+        pool = PoolContrasenas(hilos=argumentos.hilos, cola_max=argumentos.logins)
+        with ThreadPoolExecutor(max_workers=argumentos.logins) as peticiones:
+            inicio = time.perf_counter()
+            correctos = list(peticiones.map(lambda _: pool.ejecutar(comprobar, almacenada, 'clave'), range(argumentos.logins)))
+            con_pool = argumentos.logins / (time.perf_counter() - inicio)
+        if not all(correctos):
+            raise SystemExit(f"{metodo}: la comprobación falló")
+        espera = pool.estadisticas()['espera_ms']
+        print(f"{metodo:<24} {1000 / por_nucleo:8.1f} ms/login {por_nucleo:8.1f} logins/s por núcleo "
+              f"{con_pool:8.1f} logins/s con el pool (espera media {espera['promedio']:.0f} ms)")
@@ -0,0 +1,132 @@
+"""Benchmark de la importación masiva: COPY por bloques frente a registrar_usuario + guardar_diagnostico fila a fila.
+
+Trabaja sobre una base desechable (un esquema temporal en PostgreSQL o un
+archivo temporal en SQLite) con las migraciones aplicadas. La ruta fila a fila
+se mide sobre una muestra y se expresa en filas/segundo, igual que la masiva.
+
+Uso (desde backend/):
+    python -m benchmarks.benchmark_importacion [--filas 50000] [--mediciones 5] [--muestra 2000] [--sqlite]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+argumentos = argparse.ArgumentParser()
+argumentos.add_argument('--filas', type=int, default=50_000)
+argumentos.add_argument('--mediciones', type=int, default=5, help='mediciones por paciente')
+argumentos.add_argument('--muestra', type=int, default=2000, help='filas de la ruta fila a fila')
+argumentos.add_argument('--sqlite', action='store_true')
+argumentos = argumentos.parse_args()
+
+# La configuración se lee al importar los modelos: la base desechable va primero
+os.environ['PERSISTENCIA_DIFERIDA'] = '0'
+# Cada paciente nuevo cuesta un hash en ambas rutas: con un método barato se mide la carga
+os.environ.setdefault('CONTRASENA_METODO', 'pbkdf2:sha256:1000')
+if argumentos.sqlite:
+    descriptor, RUTA_SQLITE = tempfile.mkstemp(suffix='.db')
+    os.close(descriptor)
+    os.environ['BD_MOTOR'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = RUTA_SQLITE
+else:
+    ESQUEMA = f"benchmark_importacion_{os.getpid()}"
+    os.environ['BD_MOTOR'] = 'postgres'
+    os.environ['PGOPTIONS'] = f"-c search_path={ESQUEMA}"
+
+from modelo.modelo import abrir_conexion_bd
+from modelo.migraciones import aplicar_migraciones
+from modelo.modelo_usuario import ModeloUsuario
+from modelo.modelo_resultados import ModeloResultados
+from modelo.modelo_importacion import ModeloImportacion, CAMPOS_PACIENTE
+from modelo.codificador import leer_registro, codificar
+from modelo.registro_modelos import RegistroModelos
+from benchmarks.benchmark_codificador import generar_columnas
+
+CAMPOS_CSV = CAMPOS_PACIENTE + (
+    'edad', 'ps', 'pd', 'colesterol', 'glucosa', 'fuma', 'alcohol', 'actividad', 'peso', 'estatura', 'fecha_diagnostico'
+)
+
+
+def generar_csv(filas, mediciones, prefijo):
+    """CSV de filas mediciones con mediciones filas por paciente, fechas distintas por paciente"""
+    columnas = generar_columnas(filas)
+    lineas = [','.join(CAMPOS_CSV)]
+    for i in range(filas):
+        paciente = i // mediciones
+        primera = i % mediciones == 0
+        lineas.append(','.join(str(valor) for valor in (
+            f"{prefijo}{paciente}", 'clave' if primera else '', f"Nombre{paciente}" if primera else '',
+            f"Apellido{paciente}" if primera else '', '', columnas['genero'][i], '', '',
+            f"{prefijo}{paciente}"[-20:], columnas['edad'][i], columnas['ps'][i], columnas['pd'][i],
+            round(columnas['colesterol'][i], 1), round(columnas['glucosa'][i], 1), columnas['fuma'][i],
+            columnas['alcohol'][i], columnas['actividad'][i], round(columnas['peso'][i], 1),
+            columnas['estatura'][i], f"2024-{1 + i % mediciones:02d}-15 10:00:00",
+        )))
+    return '\n'.join(lineas) + '\n'
+
+
+def fila_a_fila(texto):
+    """Lo que haría un cliente con los endpoints actuales: un registro y un diagnóstico por fila"""
+    import csv
+    modelo = RegistroModelos.obtener('diagnostico')
+    for registro in csv.DictReader(io.StringIO(texto)):
+        if registro['password']:
+            ModeloUsuario.registrar_usuario(
+                registro['username'], registro['password'], 'paciente', registro['nombre'], registro['apellido'],
+                None, registro['genero'], None, None, registro['dni']
+            )
+        usuario_id = ModeloUsuario.buscar_usuario_por_username(registro['username'])[0]
+        datos = leer_registro(registro)
+        riesgo, confianza = modelo.diagnosticar(codificar(datos))
+        ModeloResultados.guardar_diagnostico(
+            usuario_id, datos['edad'], datos['genero'], datos['ps'], datos['pd'], datos['colesterol'], datos['glucosa'],
+            datos['fuma'], datos['alcohol'], datos['actividad'], datos['peso'], datos['estatura'], datos['imc'],
+            riesgo, confianza
+        )
+
+
+def medir(funcion, filas):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, filas / (time.perf_counter() - inicio)
+
+
+def principal():
+    RegistroModelos.obtener('diagnostico')
+    muestra = min(argumentos.muestra, argumentos.filas)
+    _, velocidad_filas = medir(lambda: fila_a_fila(generar_csv(muestra, argumentos.mediciones, 'fila')), muestra)
+
+    texto = generar_csv(argumentos.filas, argumentos.mediciones, 'copy')
+    informe, velocidad_copy = medir(lambda: ModeloImportacion.importar_csv(io.StringIO(texto)), argumentos.filas)
+    assert informe['rechazadas'] == 0 and informe['diagnosticos'] == argumentos.filas, informe
+
+    print(f"Motor: {os.environ['BD_MOTOR']}; {argumentos.filas} filas, {argumentos.mediciones} mediciones por paciente")
+    print(f"{'ruta':<28} {'filas/s':>10}")
+    print(f"{f'fila a fila ({muestra} filas)':<28} {velocidad_filas:>10,.0f}")
+    print(f"{'importación masiva':<28} {velocidad_copy:>10,.0f}")
+    print(f"Aceleración: x{velocidad_copy / velocidad_filas:,.0f}")
+
+
+if __name__ == '__main__':
+    if not argumentos.sqlite:
+        conn = abrir_conexion_bd()
+        conn.cursor().execute(f"CREATE SCHEMA {ESQUEMA}")
+        conn.commit()
+    conn = abrir_conexion_bd()
+    aplicar_migraciones(conn)
+    conn.close()
+    try:
+        principal()
+    finally:
+        if argumentos.sqlite:
+            for sufijo in ('', '-wal', '-shm'):
+                if os.path.exists(RUTA_SQLITE + sufijo):
+                    os.remove(RUTA_SQLITE + sufijo)
+        else:
+            conn = abrir_conexion_bd()
+            conn.cursor().execute(f"DROP SCHEMA {ESQUEMA} CASCADE")
+            conn.commit()
+            conn.close()
+        sys.exit(0)
@@ -1,53 +1,199 @@
-from flask import Blueprint, jsonify, session, request
-from modelo.modelo_admin import ModeloAdmin
-
-class ControladorAdmin:
-    blueprint = Blueprint('admin', __name__)
-
-    @staticmethod
-    @blueprint.route('/api/admin', methods=['GET'])
-    def admin_panel():
-        if not session.get('logged_in') or session.get('user_type') != 'administrador':
-            return jsonify({'message': 'Acceso no autorizado'}), 403
-        
-        filtro = request.args.get('filtro', '').lower()
-        pacientes = ModeloAdmin.obtener_pacientes(filtro)
-        return jsonify({'pacientes': pacientes}), 200
-
-    @staticmethod
-    @blueprint.route('/api/admin/<username>', methods=['GET'])
-    def admin_panel_by_username(username):
-        """Endpoint alternativo para Flutter Web sin sessions"""
-        from modelo.modelo_usuario import ModeloUsuario
-        
-        # Verificar que el usuario sea admin
-        user_row = ModeloUsuario.buscar_usuario_por_username(username)
-        if not user_row or user_row[2] != 'administrador':
-            return jsonify({'message': 'Acceso no autorizado'}), 403
-        
-        filtro = request.args.get('filtro', '').lower()
-        pacientes = ModeloAdmin.obtener_pacientes(filtro)
-        return jsonify({'pacientes': pacientes}), 200
-
-    @staticmethod
-    @blueprint.route('/api/admin/diagnosticos/<int:usuario_id>', methods=['GET'])
-    def obtener_historial_usuario(usuario_id):
-        if not session.get('logged_in') or session.get('user_type') != 'administrador':
-            return jsonify({'message': 'Acceso no autorizado'}), 403
-        
-        historial = ModeloAdmin.obtener_historial_diagnosticos(usuario_id)
-        return jsonify(historial), 200
-
-    @staticmethod
-    @blueprint.route('/api/admin/<username>/diagnosticos/<int:usuario_id>', methods=['GET'])
-    def obtener_historial_usuario_by_username(username, usuario_id):
-        """Endpoint alternativo para Flutter Web sin sessions"""
-        from modelo.modelo_usuario import ModeloUsuario
-        
-        # Verificar que el usuario sea admin
-        user_row = ModeloUsuario.buscar_usuario_por_username(username)
-        if not user_row or user_row[2] != 'administrador':
-            return jsonify({'message': 'Acceso no autorizado'}), 403
-        
-        historial = ModeloAdmin.obtener_historial_diagnosticos(usuario_id)
-        return jsonify(historial), 200
\ No newline at end of file
+from flask import Blueprint, Response, jsonify, session, request, stream_with_context
+from modelo.modelo_admin import ModeloAdmin, COLUMNAS_EXPORTACION
+from modelo.modelo_importacion import ModeloImportacion
+from modelo.paginacion import leer_paginacion, codificar_cursor
+from modelo.plazos import con_plazo_largo
+from modelo.tokens import administrador_autenticado
+from datetime import datetime
+import csv
+import io
+import json
+
+def _respuesta_pacientes():
+    """Lista completa de pacientes, o una página si se indican limit/cursor"""
+    filtro = request.args.get('filtro', '').lower()
+    try:
+        limite, despues_de = leer_paginacion(request.args, (str, int))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if limite is None:
+        pacientes = ModeloAdmin.obtener_pacientes(filtro)
+        return jsonify({'pacientes': pacientes}), 200
+
+    pacientes, ultima = ModeloAdmin.obtener_pacientes_pagina(filtro, limite, despues_de)
+    respuesta = {
+        'pacientes': pacientes,
+        'siguiente_cursor': codificar_cursor(*ultima) if ultima else None,
+    }
+    if despues_de is None:
+        # El total solo se calcula al pedir la primera página
+        respuesta['total'] = ModeloAdmin.contar_pacientes(filtro)
+    return jsonify(respuesta), 200
+
+def _respuesta_historial(usuario_id):
+    """Historial completo del paciente, o una página si se indican limit/cursor"""
+    try:
+        limite, antes_de = leer_paginacion(request.args, (datetime, int))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    # incluir_archivo=1 añade los meses archivados (más lento: se leen sus archivos)
+    incluir_archivo = request.args.get('incluir_archivo', '').lower() in ('1', 'true')
+    if limite is None:
+        historial = ModeloAdmin.obtener_historial_diagnosticos(usuario_id, incluir_archivo)
+        return jsonify(historial), 200
+
+    historial, ultima, total = ModeloAdmin.obtener_historial_pagina(usuario_id, limite, antes_de, incluir_archivo)
+    return jsonify({
+        'diagnosticos': historial,
+        'siguiente_cursor': codificar_cursor(*ultima) if ultima else None,
+        'total': total,
+    }), 200
+
+def _valor_exportable(valor):
+    return valor.strftime('%Y-%m-%d %H:%M:%S') if isinstance(valor, datetime) else valor
+
+def _csv_por_bloques(bloques):
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(COLUMNAS_EXPORTACION)
+    yield salida.getvalue()
+    for filas in bloques:
+        salida.seek(0)
+        salida.truncate()
+        escritor.writerows([_valor_exportable(valor) for valor in fila] for fila in filas)
+        yield salida.getvalue()
+
+def _ndjson_por_bloques(bloques):
+    for filas in bloques:
+        yield ''.join(
+            json.dumps(dict(zip(COLUMNAS_EXPORTACION, map(_valor_exportable, fila))), ensure_ascii=False) + '\n'
+            for fila in filas
+        )
+
+FORMATOS_EXPORTACION = {
+    'csv': (_csv_por_bloques, 'text/csv'),
+    'ndjson': (_ndjson_por_bloques, 'application/x-ndjson'),
+}
+
+def _respuesta_exportacion():
+    """Exporta historiales en streaming: un paciente (usuario_id), los que cumplen filtro, o todos"""
+    formato = request.args.get('formato', 'csv').lower()
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({'message': 'Formato no soportado, use csv o ndjson'}), 400
+    usuario_id = request.args.get('usuario_id')
+    if usuario_id is not None:
+        try:
+            usuario_id = int(usuario_id)
+        except ValueError:
+            return jsonify({'message': 'El parámetro usuario_id debe ser un entero'}), 400
+    filtro = request.args.get('filtro', '').lower()
+
+    generar, tipo = FORMATOS_EXPORTACION[formato]
+    bloques = ModeloAdmin.exportar_diagnosticos(usuario_id, filtro)
+    nombre = f"diagnosticos_{usuario_id if usuario_id is not None else 'pacientes'}.{formato}"
+    return Response(
+        stream_with_context(generar(bloques)),
+        mimetype=tipo,
+        headers={'Content-Disposition': f'attachment; filename="{nombre}"'}
+    )
+
+def _archivo_importacion():
+    """CSV a importar como texto, sin cargarlo entero: archivo multipart 'archivo' o cuerpo text/csv"""
+    archivo = request.files.get('archivo')
+    if archivo is not None:
+        return io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    if request.mimetype in ('text/csv', 'application/csv'):
+        return io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    return None
+
+def _respuesta_importacion():
+    """Importa pacientes y diagnósticos históricos; con simular=1 solo devuelve el informe"""
+    archivo = _archivo_importacion()
+    if archivo is None:
+        return jsonify({'message': 'Se esperaba un CSV (campo archivo o cuerpo text/csv)'}), 400
+    simular = request.args.get('simular', '').lower() in ('1', 'true')
+    try:
+        informe = ModeloImportacion.importar_csv(archivo, simular)
+    except ValueError as e:
+        # Cabecera sin username o archivo que no es UTF-8
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Error en la importación: {str(e)}'}), 500
+    return jsonify(informe), 200
+
+class ControladorAdmin:
+    blueprint = Blueprint('admin', __name__)
+
+    @staticmethod
+    @blueprint.route('/api/admin', methods=['GET'])
+    def admin_panel():
+        if not session.get('logged_in') or session.get('user_type') != 'administrador':
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_pacientes()
+
+    @staticmethod
+    @blueprint.route('/api/admin/<username>', methods=['GET'])
+    def admin_panel_by_username(username):
+        """Endpoint alternativo para Flutter Web sin sessions (exige el token Bearer o la sesión del administrador)"""
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_pacientes()
+
+    @staticmethod
+    @blueprint.route('/api/admin/diagnosticos/<int:usuario_id>', methods=['GET'])
+    def obtener_historial_usuario(usuario_id):
+        if not session.get('logged_in') or session.get('user_type') != 'administrador':
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_historial(usuario_id)
+
+    @staticmethod
+    @blueprint.route('/api/admin/<username>/diagnosticos/<int:usuario_id>', methods=['GET'])
+    def obtener_historial_usuario_by_username(username, usuario_id):
+        """Endpoint alternativo para Flutter Web sin sessions (exige el token Bearer o la sesión del administrador)"""
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_historial(usuario_id)
+
+    @staticmethod
+    @blueprint.route('/api/admin/exportar', methods=['GET'])
+    @con_plazo_largo
+    def exportar_diagnosticos():
+        if not session.get('logged_in') or session.get('user_type') != 'administrador':
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_exportacion()
+
+    @staticmethod
+    @blueprint.route('/api/admin/<username>/exportar', methods=['GET'])
+    @con_plazo_largo
+    def exportar_diagnosticos_by_username(username):
+        """Endpoint alternativo para Flutter Web sin sessions (exige el token Bearer o la sesión del administrador)"""
+        # Exportar todos los historiales clínicos exige una identidad autenticada, no solo el username
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_exportacion()
+
+    @staticmethod
+    @blueprint.route('/api/admin/importar', methods=['POST'])
+    @con_plazo_largo
+    def importar_pacientes():
+        if not session.get('logged_in') or session.get('user_type') != 'administrador':
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_importacion()
+
+    @staticmethod
+    @blueprint.route('/api/admin/<username>/importar', methods=['POST'])
+    @con_plazo_largo
+    def importar_pacientes_by_username(username):
+        """Endpoint alternativo para Flutter Web sin sessions (exige el token Bearer o la sesión del administrador)"""
+        # Crear usuarios y diagnósticos en masa exige una identidad autenticada, no solo el username
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        
+        return _respuesta_importacion()
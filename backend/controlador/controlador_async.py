@@ -0,0 +1,146 @@
+from flask import jsonify, session, request
+from modelo.modelo_async import ModeloAsync
+from modelo.paginacion import leer_paginacion, codificar_cursor
+from modelo.tokens import usuario_de_ruta, administrador_autenticado
+from datetime import datetime
+
+# Vistas async por (endpoint de Flask, método). Solo se usan con el servidor ASGI
+# (asgi.py); con WSGI siguen atendiendo las vistas síncronas de cada blueprint
+VISTAS_ASYNC = {}
+
+def vista_async(endpoint, metodo='GET'):
+    def registrar(funcion):
+        VISTAS_ASYNC[(endpoint, metodo)] = funcion
+        return funcion
+    return registrar
+
+def _diagnostico(row):
+    if not row:
+        return None
+    fecha_formateada = row[2].strftime('%Y-%m-%d %H:%M:%S') if row[2] else None
+    return {'riesgo': row[0], 'confianza': row[1], 'fecha': fecha_formateada}
+
+def _sesion_administrador():
+    return session.get('logged_in') and session.get('user_type') == 'administrador'
+
+async def _respuesta_pacientes():
+    filtro = request.args.get('filtro', '').lower()
+    try:
+        limite, despues_de = leer_paginacion(request.args, (str, int))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if limite is None:
+        pacientes = await ModeloAsync.obtener_pacientes(filtro)
+        return jsonify({'pacientes': pacientes}), 200
+
+    pacientes, ultima = await ModeloAsync.obtener_pacientes_pagina(filtro, limite, despues_de)
+    respuesta = {
+        'pacientes': pacientes,
+        'siguiente_cursor': codificar_cursor(*ultima) if ultima else None,
+    }
+    if despues_de is None:
+        respuesta['total'] = await ModeloAsync.contar_pacientes(filtro)
+    return jsonify(respuesta), 200
+
+async def _respuesta_historial(usuario_id):
+    try:
+        limite, antes_de = leer_paginacion(request.args, (datetime, int))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    # incluir_archivo=1 añade los meses archivados (más lento: se leen sus archivos)
+    incluir_archivo = request.args.get('incluir_archivo', '').lower() in ('1', 'true')
+    if limite is None:
+        historial = await ModeloAsync.obtener_historial_diagnosticos(usuario_id, incluir_archivo)
+        return jsonify(historial), 200
+
+    historial, ultima, total = await ModeloAsync.obtener_historial_pagina(usuario_id, limite, antes_de, incluir_archivo)
+    return jsonify({
+        'diagnosticos': historial,
+        'siguiente_cursor': codificar_cursor(*ultima) if ultima else None,
+        'total': total,
+    }), 200
+
+class ControladorAsync:
+    """Versiones async de los endpoints de lectura; mismas respuestas que las vistas síncronas"""
+
+    @staticmethod
+    @vista_async('resultados.resultados')
+    async def resultados():
+        if not session.get('logged_in'):
+            return jsonify({'message': 'Unauthorized'}), 401
+        if 'ultimo_diagnostico' in session:
+            riesgo, confianza, fecha_str = session.pop('ultimo_diagnostico')
+            return jsonify({'diagnostico': {'riesgo': riesgo, 'confianza': confianza, 'fecha': fecha_str}}), 200
+        row = await ModeloAsync.obtener_ultimo_diagnostico(session['user_id'])
+        return jsonify({'diagnostico': _diagnostico(row)}), 200
+
+    @staticmethod
+    @vista_async('resultados.resultados_by_username')
+    async def resultados_by_username(username):
+        user_row = usuario_de_ruta(username)
+        if not user_row:
+            return jsonify({'message': 'Unauthorized'}), 401
+        row = await ModeloAsync.obtener_ultimo_diagnostico(user_row[0])
+        return jsonify({'diagnostico': _diagnostico(row)}), 200
+
+    @staticmethod
+    @vista_async('sesion.verificar_sesion')
+    async def verificar_sesion():
+        if not session.get('logged_in'):
+            return jsonify({'message': 'No hay sesión activa'}), 200
+        # Como ControladorSesion.verificar_sesion: la identidad sale de la sesión, sin consultas
+        return jsonify({
+            'logged_in': True,
+            'user_id': session['user_id'],
+            'username': session['username'],
+            'user_type': session['user_type']
+        }), 200
+
+    @staticmethod
+    @vista_async('configuracion.configuracion')
+    async def configuracion():
+        if not session.get('logged_in'):
+            return jsonify({'message': 'No autorizado'}), 401
+        datos = await ModeloAsync.obtener_datos_usuario(session['user_id'])
+        if datos:
+            return jsonify(datos), 200
+        return jsonify({'message': 'Usuario no encontrado'}), 404
+
+    @staticmethod
+    @vista_async('configuracion.configuracion_by_username')
+    async def configuracion_by_username(username):
+        user_row = usuario_de_ruta(username)
+        if not user_row:
+            return jsonify({'message': 'No autorizado'}), 401
+        datos = await ModeloAsync.obtener_datos_usuario(user_row[0])
+        if datos:
+            return jsonify(datos), 200
+        return jsonify({'message': 'Usuario no encontrado'}), 404
+
+    @staticmethod
+    @vista_async('admin.admin_panel')
+    async def admin_panel():
+        if not _sesion_administrador():
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return await _respuesta_pacientes()
+
+    @staticmethod
+    @vista_async('admin.admin_panel_by_username')
+    async def admin_panel_by_username(username):
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return await _respuesta_pacientes()
+
+    @staticmethod
+    @vista_async('admin.obtener_historial_usuario')
+    async def obtener_historial_usuario(usuario_id):
+        if not _sesion_administrador():
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return await _respuesta_historial(usuario_id)
+
+    @staticmethod
+    @vista_async('admin.obtener_historial_usuario_by_username')
+    async def obtener_historial_usuario_by_username(username, usuario_id):
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return await _respuesta_historial(usuario_id)
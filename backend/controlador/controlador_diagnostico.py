@@ -1,113 +1,156 @@
-from flask import Blueprint, jsonify, request, session
-from modelo.modelo_diagnostico import ModeloDiagnostico
-import numpy as np
-from datetime import datetime
-from modelo.modelo_usuario import ModeloUsuario
-
-class ControladorDiagnostico:
-    blueprint = Blueprint('diagnostico', __name__)
-    modelo_diagnostico = ModeloDiagnostico()
-
-    @staticmethod
-    @blueprint.route('/api/diagnostico', methods=['POST'])
-    def diagnostico():
-        if not session.get('logged_in'):
-            return jsonify({'message': 'Unauthorized'}), 401
-        try:
-            edad = int(request.json.get('edad'))
-            genero = request.json.get('genero')
-            ps = int(request.json.get('ps'))
-            pd = int(request.json.get('pd'))
-            col = float(request.json.get('colesterol'))
-            glu = float(request.json.get('glucosa'))
-            fuma = request.json.get('fuma')
-            alcohol = request.json.get('alcohol')
-            actividad = request.json.get('actividad')
-            peso = float(request.json.get('peso'))
-            estatura = int(request.json.get('estatura'))
-            imc = peso / ((estatura / 100) ** 2)
-            entrada = [
-                0 if edad < 45 else 1 if edad <= 59 else 2,
-                0 if 'femenino' in genero.lower() else 1,
-                0 if ps < 120 else 1 if ps <= 139 else 2,
-                0 if pd < 80 else 1 if pd <= 89 else 2,
-                0 if col < 200 else 1 if col <= 239 else 2,
-                0 if glu < 100 else 1 if glu <= 125 else 2,
-                1 if fuma == 's' else 0,
-                1 if alcohol == 's' else 0,
-                2 if 'no' in actividad.lower() else 1 if '1' in actividad or '2' in actividad else 0,
-                1 if imc == 0 else 1 if imc < 18.5 else 0 if imc < 25 else 1 if imc < 30 else 2
-            ]
-            input_array = np.array([entrada], dtype=np.float32)
-            pred = ControladorDiagnostico.modelo_diagnostico.predecir(input_array)
-            riesgo = int(np.argmax(pred))
-            confianza = float(np.max(pred))
-            
-            # Guardar el diagnóstico en la base de datos
-            from modelo.modelo_resultados import ModeloResultados
-            user_id = session.get('user_id')
-            ModeloResultados.guardar_diagnostico(
-                user_id, edad, genero, ps, pd, col, glu, fuma, alcohol, actividad, peso, estatura, imc, riesgo, confianza
-            )
-            
-            session['ultimo_diagnostico'] = [
-                riesgo,
-                confianza,
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ]
-            return jsonify({'riesgo': riesgo, 'confianza': confianza}), 200
-        except Exception as e:
-            return jsonify({'message': f'Error en el diagnóstico: {str(e)}'}), 500
-
-    @staticmethod
-    @blueprint.route('/api/diagnostico/<username>', methods=['POST'])
-    def diagnostico_by_username(username):
-        """Endpoint alternativo para Flutter Web sin sessions"""
-        from modelo.modelo_usuario import ModeloUsuario
-        from modelo.modelo_resultados import ModeloResultados
-        
-        # Verificar que el usuario existe
-        user_row = ModeloUsuario.buscar_usuario_por_username(username)
-        if not user_row:
-            return jsonify({'message': 'Usuario no encontrado'}), 404
-            
-        user_id = user_row[0]  # El ID está en la primera posición
-            
-        try:
-            edad = int(request.json.get('edad'))
-            genero = request.json.get('genero')
-            ps = int(request.json.get('ps'))
-            pd = int(request.json.get('pd'))
-            col = float(request.json.get('colesterol'))
-            glu = float(request.json.get('glucosa'))
-            fuma = request.json.get('fuma')
-            alcohol = request.json.get('alcohol')
-            actividad = request.json.get('actividad')
-            peso = float(request.json.get('peso'))
-            estatura = int(request.json.get('estatura'))
-            imc = peso / ((estatura / 100) ** 2)
-            entrada = [
-                0 if edad < 45 else 1 if edad <= 59 else 2,
-                0 if 'femenino' in genero.lower() else 1,
-                0 if ps < 120 else 1 if ps <= 139 else 2,
-                0 if pd < 80 else 1 if pd <= 89 else 2,
-                0 if col < 200 else 1 if col <= 239 else 2,
-                0 if glu < 100 else 1 if glu <= 125 else 2,
-                1 if fuma == 's' else 0,
-                1 if alcohol == 's' else 0,
-                2 if 'no' in actividad.lower() else 1 if '1' in actividad or '2' in actividad else 0,
-                1 if imc == 0 else 1 if imc < 18.5 else 0 if imc < 25 else 1 if imc < 30 else 2
-            ]
-            input_array = np.array([entrada], dtype=np.float32)
-            pred = ControladorDiagnostico.modelo_diagnostico.predecir(input_array)
-            riesgo = int(np.argmax(pred))
-            confianza = float(np.max(pred))
-            
-            # Guardar el diagnóstico en la base de datos
-            ModeloResultados.guardar_diagnostico(
-                user_id, edad, genero, ps, pd, col, glu, fuma, alcohol, actividad, peso, estatura, imc, riesgo, confianza
-            )
-            
-            return jsonify({'riesgo': riesgo, 'confianza': confianza}), 200
-        except Exception as e:
-            return jsonify({'message': f'Error en el diagnóstico: {str(e)}'}), 500
+from flask import Blueprint, jsonify, request, session
+from modelo.registro_modelos import RegistroModelos
+from modelo.codificador import leer_registro, codificar, codificar_lote
+import csv
+import io
+from datetime import datetime
+from modelo.modelo_usuario import ModeloUsuario
+from modelo.tokens import usuario_de_ruta, administrador_autenticado
+from modelo.limitador import limitar_tasa
+from config import LOTE_DIAGNOSTICO_MAX
+
+def _leer_registros_lote():
+    """Obtiene la lista de registros del cuerpo: JSON (lista o {'registros': [...]}) o CSV"""
+    archivo = request.files.get('archivo')
+    if archivo is not None:
+        return list(csv.DictReader(io.TextIOWrapper(archivo.stream, encoding='utf-8-sig')))
+    if request.mimetype in ('text/csv', 'application/csv'):
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict):
+        datos = datos.get('registros')
+    if not isinstance(datos, list):
+        return None
+    return datos
+
+class ControladorDiagnostico:
+    blueprint = Blueprint('diagnostico', __name__)
+
+    @staticmethod
+    @blueprint.route('/api/diagnostico', methods=['POST'])
+    @limitar_tasa('diagnostico')
+    def diagnostico():
+        if not session.get('logged_in'):
+            return jsonify({'message': 'Unauthorized'}), 401
+        try:
+            datos = leer_registro(request.json)
+            input_array = codificar(datos)
+            riesgo, confianza = RegistroModelos.obtener('diagnostico').diagnosticar(input_array)
+            
+            # Guardar el diagnóstico en la base de datos
+            from modelo.modelo_resultados import ModeloResultados
+            user_id = session.get('user_id')
+            if not ModeloResultados.guardar_diagnostico(
+                user_id, datos['edad'], datos['genero'], datos['ps'], datos['pd'], datos['colesterol'], datos['glucosa'],
+                datos['fuma'], datos['alcohol'], datos['actividad'], datos['peso'], datos['estatura'], datos['imc'], riesgo, confianza
+            ):
+                return jsonify({'message': 'Error al guardar el diagnóstico'}), 500
+            
+            session['ultimo_diagnostico'] = [
+                riesgo,
+                confianza,
+                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ]
+            return jsonify({'riesgo': riesgo, 'confianza': confianza}), 200
+        except Exception as e:
+            return jsonify({'message': f'Error en el diagnóstico: {str(e)}'}), 500
+
+    @staticmethod
+    @blueprint.route('/api/diagnostico/<username>', methods=['POST'])
+    @limitar_tasa('diagnostico')
+    def diagnostico_by_username(username):
+        """Endpoint alternativo para Flutter Web sin sessions"""
+        from modelo.modelo_resultados import ModeloResultados
+        
+        # Solo el propio usuario, por su token o su sesión
+        user_row = usuario_de_ruta(username)
+        if not user_row:
+            return jsonify({'message': 'Unauthorized'}), 401
+            
+        user_id = user_row[0]  # El ID está en la primera posición
+            
+        try:
+            datos = leer_registro(request.json)
+            input_array = codificar(datos)
+            riesgo, confianza = RegistroModelos.obtener('diagnostico').diagnosticar(input_array)
+            
+            # Guardar el diagnóstico en la base de datos
+            if not ModeloResultados.guardar_diagnostico(
+                user_id, datos['edad'], datos['genero'], datos['ps'], datos['pd'], datos['colesterol'], datos['glucosa'],
+                datos['fuma'], datos['alcohol'], datos['actividad'], datos['peso'], datos['estatura'], datos['imc'], riesgo, confianza
+            ):
+                return jsonify({'message': 'Error al guardar el diagnóstico'}), 500
+            
+            return jsonify({'riesgo': riesgo, 'confianza': confianza}), 200
+        except Exception as e:
+            return jsonify({'message': f'Error en el diagnóstico: {str(e)}'}), 500
+
+    @staticmethod
+    @blueprint.route('/api/diagnostico/lote', methods=['POST'])
+    @limitar_tasa('lote')
+    def diagnostico_lote():
+        """Diagnóstico masivo de una campaña de cribado (JSON o CSV)"""
+        if not session.get('logged_in') or session.get('user_type') != 'administrador':
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return ControladorDiagnostico._procesar_lote()
+
+    @staticmethod
+    @blueprint.route('/api/diagnostico/lote/<username>', methods=['POST'])
+    @limitar_tasa('lote')
+    def diagnostico_lote_by_username(username):
+        """Endpoint alternativo para Flutter Web sin sessions (exige el token Bearer o la sesión del administrador)"""
+        if not administrador_autenticado(username):
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return ControladorDiagnostico._procesar_lote()
+
+    @staticmethod
+    def _procesar_lote():
+        from modelo.modelo_resultados import ModeloResultados
+
+        registros = _leer_registros_lote()
+        if registros is None:
+            return jsonify({'message': 'Se esperaba una lista JSON de registros o un CSV'}), 400
+        if len(registros) > LOTE_DIAGNOSTICO_MAX:
+            return jsonify({'message': f'El lote supera el máximo de {LOTE_DIAGNOSTICO_MAX} registros'}), 413
+
+        errores = {}
+        validos = []
+        for indice, registro in enumerate(registros):
+            try:
+                if not isinstance(registro, dict) or not registro.get('username'):
+                    raise ValueError("Falta el campo 'username'")
+                if not isinstance(registro['username'], str):
+                    raise ValueError("El campo 'username' debe ser un texto")
+                validos.append((indice, registro['username'], leer_registro(registro)))
+            except ValueError as e:
+                errores[indice] = str(e)
+
+        try:
+            usuarios = ModeloUsuario.buscar_usuarios_por_username({username for _, username, _ in validos})
+            for indice, username, _ in validos:
+                if username not in usuarios:
+                    errores[indice] = f"Usuario no encontrado: {username}"
+            validos = [v for v in validos if v[0] not in errores]
+
+            resultados = []
+            if validos:
+                entrada = codificar_lote([datos for _, _, datos in validos])
+                riesgos, confianzas = RegistroModelos.obtener('diagnostico').diagnosticar_lote(entrada)
+                filas = []
+                for (indice, username, d), riesgo, confianza in zip(validos, riesgos.tolist(), confianzas.tolist()):
+                    filas.append((
+                        usuarios[username][0], d['edad'], d['genero'], d['ps'], d['pd'], d['colesterol'], d['glucosa'],
+                        d['fuma'], d['alcohol'], d['actividad'], d['peso'], d['estatura'], d['imc'], riesgo, confianza
+                    ))
+                    resultados.append({'indice': indice, 'username': username, 'riesgo': riesgo, 'confianza': confianza})
+                if not ModeloResultados.guardar_diagnosticos_lote(filas):
+                    return jsonify({'message': 'Error al guardar el lote de diagnósticos'}), 500
+        except Exception as e:
+            return jsonify({'message': f'Error en el diagnóstico del lote: {str(e)}'}), 500
+
+        return jsonify({
+            'total': len(registros),
+            'procesados': len(resultados),
+            'resultados': resultados,
+            'errores': [{'indice': i, 'message': errores[i]} for i in sorted(errores)]
+        }), 200
@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify
+from modelo.metricas import Metricas
+from modelo.tokens import administrador_autenticado
+
+class ControladorMetricas:
+    blueprint = Blueprint('metricas', __name__)
+
+    @staticmethod
+    @blueprint.route('/api/metricas', methods=['GET'])
+    def metricas():
+        """Métricas internas del proceso (modelos, microlotes, consultas por endpoint, etc.)"""
+        # Exponen el SQL normalizado y el estado del pool y del interruptor: solo administradores
+        if not administrador_autenticado():
+            return jsonify({'message': 'Acceso no autorizado'}), 403
+        return jsonify(Metricas.exportar()), 200
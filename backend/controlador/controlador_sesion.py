@@ -1,23 +1,29 @@
-from flask import Blueprint, jsonify, session
-from modelo.modelo_autenticacion import ModeloAutenticacion
-
-class ControladorSesion:
-    blueprint = Blueprint('sesion', __name__)
-
-    @staticmethod
-    @blueprint.route('/api/sesion', methods=['GET'])
-    def verificar_sesion():
-        """Verifica si hay una sesión activa y devuelve información del usuario"""
-        if not session.get('logged_in'):
-            return jsonify({'message': 'No hay sesión activa'}), 200
-        
-        usuario = ModeloAutenticacion.obtener_info_sesion(session['user_id'])
-        if usuario:
-            return jsonify({
-                'logged_in': True,
-                'user_id': usuario[0],
-                'username': usuario[1],
-                'user_type': usuario[2]
-            }), 200
-        
-        return jsonify({'message': 'Sesión inválida'}), 401
\ No newline at end of file
+from flask import Blueprint, jsonify, session, request
+from modelo.tokens import refrescar_tokens
+
+class ControladorSesion:
+    blueprint = Blueprint('sesion', __name__)
+
+    @staticmethod
+    @blueprint.route('/api/sesion', methods=['GET'])
+    def verificar_sesion():
+        """Verifica si hay una sesión activa y devuelve información del usuario"""
+        if not session.get('logged_in'):
+            return jsonify({'message': 'No hay sesión activa'}), 200
+
+        # La identidad la guardó el login y no cambia: no hace falta volver a consultarla
+        return jsonify({
+            'logged_in': True,
+            'user_id': session['user_id'],
+            'username': session['username'],
+            'user_type': session['user_type']
+        }), 200
+
+    @staticmethod
+    @blueprint.route('/api/token/refrescar', methods=['POST'])
+    def refrescar_token():
+        """Canjea el refresh_token (de un solo uso) por un nuevo par de tokens"""
+        token = (request.get_json(silent=True) or {}).get('refresh_token')
+        if not token:
+            return jsonify({'message': 'Falta el refresh_token'}), 400
+        return jsonify(refrescar_tokens(token)), 200
@@ -0,0 +1,206 @@
+"""Backends de almacenamiento intercambiables: PostgreSQL (psycopg2) o SQLite embebido.
+
+Los modelos escriben el SQL una sola vez con el estilo de psycopg2 (%s,
+RETURNING, ON CONFLICT, NOW(), TO_CHAR). El backend SQLite traduce los
+marcadores, registra NOW y TO_CHAR como funciones y mantiene una conexión por
+hilo en modo WAL, de modo que el mismo código de los Modelo* sirve para ambos.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from config import SQLITE_PATH, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_MB, SQLITE_MMAP_MB
+
+try:
+    import psycopg2
+except ImportError:
+    # Despliegues solo con SQLite (quioscos, clínicas sin red)
+    psycopg2 = None
+
+# Excepciones equivalentes de ambos drivers, para usar en los except de los modelos
+ErrorIntegridad = (sqlite3.IntegrityError,) + ((psycopg2.IntegrityError,) if psycopg2 else ())
+ErrorConexion = (sqlite3.OperationalError,) + (
+    (psycopg2.OperationalError, psycopg2.InterfaceError) if psycopg2 else ()
+)
+
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_converter('TIMESTAMP', lambda valor: datetime.fromisoformat(valor.decode()))
+sqlite3.register_converter('DATE', lambda valor: date.fromisoformat(valor.decode()))
+
+_MARCADOR = re.compile(r"%\((\w+)\)s|%s|%%")
+_FORMATO_TO_CHAR = (('YYYY', '%Y'), ('HH24', '%H'), ('MI', '%M'), ('SS', '%S'), ('MM', '%m'), ('DD', '%d'))
+
+
+def _traducir(sql, parametros):
+    """Convierte marcadores de psycopg2 a los de sqlite3; una tupla se expande como lista de IN"""
+    if isinstance(parametros, dict):
+        return _MARCADOR.sub(lambda m: ':' + m.group(1) if m.group(1) else '%', sql), parametros
+    valores = []
+    restantes = iter(parametros)
+
+    def sustituir(marca):
+        if marca.group(0) == '%%':
+            return '%'
+        valor = next(restantes)
+        if isinstance(valor, tuple):
+            valores.extend(valor)
+            return '(' + ', '.join('?' * len(valor)) + ')'
+        valores.append(valor)
+        return '?'
+
+    return _MARCADOR.sub(sustituir, sql), valores
+
+
+def _to_char(valor, formato):
+    if valor is None:
+        return None
+    if not isinstance(valor, datetime):
+        valor = datetime.fromisoformat(str(valor))
+    for origen, destino in _FORMATO_TO_CHAR:
+        formato = formato.replace(origen, destino)
+    return valor.strftime(formato)
+
+
+class CursorSqlite:
+    """Cursor sqlite3 que acepta el SQL y los parámetros escritos para psycopg2"""
+    dialecto = 'sqlite'
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, parametros=None):
+        # Como psycopg2: sin parámetros el SQL se envía tal cual (un % no se interpreta)
+        if parametros is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(*_traducir(sql, parametros))
+        return self
+
+    def executemany(self, sql, lista_parametros):
+        lista_parametros = list(lista_parametros)
+        if lista_parametros:
+            sql = _traducir(sql, lista_parametros[0])[0]
+        self._cursor.executemany(sql, lista_parametros)
+        return self
+
+
+class _Sqlite3(sqlite3.Connection):
+    """Conexión sqlite3 cuyo NOW() es constante dentro de cada transacción, como en PostgreSQL"""
+    ahora = None
+
+    def now(self):
+        if self.ahora is None:
+            self.ahora = datetime.now().isoformat(' ')
+        return self.ahora
+
+
+class ConexionSqlite:
+    """Conexión SQLite del hilo actual con la interfaz que usan los modelos"""
+    dialecto = 'sqlite'
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def cursor(self, name=None, **kwargs):
+        # name pide un cursor de servidor en PostgreSQL; sqlite3 ya lee las filas bajo demanda
+        return CursorSqlite(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+        self._conn.ahora = None
+
+    def rollback(self):
+        self._conn.rollback()
+        self._conn.ahora = None
+
+    def close(self):
+        # La conexión pertenece al hilo y se reutiliza: solo se descarta la transacción abierta
+        if self._conn.in_transaction:
+            self._conn.rollback()
+        self._conn.ahora = None
+
+    def cerrar(self):
+        """Cierra de verdad la conexión (las de sqlite_en_memoria, que no son del hilo)"""
+        self._conn.close()
+
+    @property
+    def closed(self):
+        return False
+
+
+_locales = threading.local()
+
+
+def _abrir_sqlite(ruta):
+    conn = sqlite3.connect(
+        ruta,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        # BEGIN IMMEDIATE antes de la primera escritura: evita el interbloqueo al
+        # pasar de lectura a escritura con varios hilos escribiendo
+        isolation_level='IMMEDIATE',
+        check_same_thread=False,
+        factory=_Sqlite3,
+    )
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_MB * 1024}")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}")
+    conn.create_function('NOW', 0, conn.now)
+    conn.create_function('TO_CHAR', 2, _to_char, deterministic=True)
+    return conn
+
+
+def conexion_sqlite(ruta=None):
+    """Conexión SQLite propia del hilo (y del proceso) actual para la base indicada"""
+    ruta = ruta or SQLITE_PATH
+    conexiones = getattr(_locales, 'conexiones', None)
+    if conexiones is None or _locales.pid != os.getpid():
+        # Las conexiones heredadas de un fork no se pueden usar en el hijo
+        conexiones = _locales.conexiones = {}
+        _locales.pid = os.getpid()
+    conn = conexiones.get(ruta)
+    if conn is None:
+        conn = conexiones[ruta] = _abrir_sqlite(ruta)
+    return ConexionSqlite(conn)
+
+
+def sqlite_en_memoria():
+    """Base SQLite en memoria nueva y solo de quien la abre; desaparece con cerrar()"""
+    return ConexionSqlite(_abrir_sqlite(':memory:'))
+
+
+def dialecto(conn):
+    """'sqlite' o 'postgres' según la conexión (o cursor) recibida"""
+    if isinstance(conn, (sqlite3.Connection, sqlite3.Cursor)):
+        return 'sqlite'
+    return getattr(conn, 'dialecto', 'postgres')
+
+
+def insertar_valores(cur, sql, filas, template, page_size=1000, fetch=False):
+    """INSERT multi-fila ('... VALUES %s') en ambos backends; con fetch devuelve las filas de RETURNING"""
+    if dialecto(cur) == 'postgres':
+        from psycopg2.extras import execute_values
+        return execute_values(cur, sql, filas, template=template, page_size=page_size, fetch=fetch)
+    # SQLite está en proceso: una sentencia por fila no cuesta idas y vueltas y
+    # conserva el orden de RETURNING
+    sql = sql.replace('VALUES %s', 'VALUES ' + template, 1)
+    devueltas = []
+    for fila in filas:
+        cur.execute(sql, fila)
+        if fetch:
+            devueltas.extend(cur.fetchall())
+    return devueltas
@@ -0,0 +1,142 @@
+"""Caché en memoria (LRU con caducidad) de username -> (id, username, tipo).
+
+Todas las rutas *_by_username empiezan resolviendo el username: con la caché
+esa consulta solo llega a la base de datos la primera vez. Los usernames que
+no existen también se guardan (como None), con una caducidad más corta porque
+otro proceso puede registrarlos. El alta y la actualización de usuarios
+invalidan sus entradas al confirmarse la transacción.
+"""
+import threading
+import time
+from collections import OrderedDict
+from config import CACHE_USUARIOS_MAX, CACHE_USUARIOS_TTL_S, CACHE_USUARIOS_TTL_NEGATIVO_S
+from modelo.metricas import Metricas
+from modelo.unidad_trabajo import al_confirmar
+
+# Marca de "no está en la caché" (None es un resultado válido: el usuario no existe)
+AUSENTE = object()
+
+
+class CacheUsuarios:
+    """LRU acotada y segura entre hilos, compartida por las vistas síncronas y las async"""
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, maximo=CACHE_USUARIOS_MAX, ttl=CACHE_USUARIOS_TTL_S, ttl_negativo=CACHE_USUARIOS_TTL_NEGATIVO_S):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        # Sube con cada invalidación: una consulta que empezó antes no guarda su resultado
+        self._version = 0
+        self._aciertos = 0
+        self._fallos = 0
+        self._desalojos = 0
+        self._caducadas = 0
+        self._invalidaciones = 0
+
+    @classmethod
+    def global_(cls):
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = CacheUsuarios()
+                    Metricas.registrar('cache_usuarios', cls._global.estadisticas)
+        return cls._global
+
+    @property
+    def activa(self):
+        return self.maximo > 0
+
+    def obtener(self, username):
+        """(id, username, tipo), None si no existe, o AUSENTE si hay que consultarlo"""
+        if not self.activa:
+            return AUSENTE
+        with self._lock:
+            entrada = self._entradas.get(username)
+            if entrada is not None:
+                usuario, vence = entrada
+                if vence > time.monotonic():
+                    self._entradas.move_to_end(username)
+                    self._aciertos += 1
+                    return usuario
+                del self._entradas[username]
+                self._caducadas += 1
+            self._fallos += 1
+        return AUSENTE
+
+    def version(self):
+        return self._version
+
+    def guardar(self, username, usuario, version):
+        """Guarda el resultado de una consulta empezada en version (ver version())"""
+        if not self.activa:
+            return
+        vence = time.monotonic() + (self.ttl if usuario is not None else self.ttl_negativo)
+        with self._lock:
+            if version != self._version:
+                return
+            self._entradas[username] = (usuario, vence)
+            self._entradas.move_to_end(username)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+                self._desalojos += 1
+
+    def invalidar(self, *usernames):
+        with self._lock:
+            self._version += 1
+            self._invalidaciones += 1
+            for username in usernames:
+                self._entradas.pop(username, None)
+
+    def invalidar_id(self, usuario_id):
+        with self._lock:
+            self._version += 1
+            self._invalidaciones += 1
+            for username in [username for username, (usuario, _) in self._entradas.items()
+                             if usuario is not None and usuario[0] == usuario_id]:
+                del self._entradas[username]
+
+    def invalidar_desconocidos(self):
+        """Quita los usernames guardados como inexistentes (altas masivas)"""
+        with self._lock:
+            self._version += 1
+            self._invalidaciones += 1
+            for username in [username for username, (usuario, _) in self._entradas.items() if usuario is None]:
+                del self._entradas[username]
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                'activa': self.activa,
+                'entradas': len(self._entradas),
+                'maximo': self.maximo,
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'tasa_aciertos': round(self._aciertos / consultas, 4) if consultas else None,
+                'desalojos': self._desalojos,
+                'caducadas': self._caducadas,
+                'invalidaciones': self._invalidaciones,
+            }
+
+
+def invalidar_usuarios(usernames=(), usuario_id=None):
+    """Invalida lo que cambió una escritura en usuarios: ahora y otra vez al confirmarse.
+
+    Sin usernames ni usuario_id (altas masivas) se quitan los usernames inexistentes.
+    """
+    cache = CacheUsuarios.global_()
+
+    def invalidar():
+        if usuario_id is not None:
+            cache.invalidar_id(usuario_id)
+        if usernames:
+            cache.invalidar(*usernames)
+        elif usuario_id is None:
+            cache.invalidar_desconocidos()
+
+    invalidar()
+    # Una lectura concurrente anterior al commit pudo volver a guardar la fila antigua
+    al_confirmar(invalidar)
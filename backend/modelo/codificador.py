@@ -0,0 +1,161 @@
+import bisect
+import numpy as np
+
+# Campos de un registro de diagnóstico y el tipo al que se convierten
+CAMPOS_NUMERICOS = {
+    'edad': int,
+    'ps': int,
+    'pd': int,
+    'colesterol': float,
+    'glucosa': float,
+    'peso': float,
+    'estatura': int,
+}
+CAMPOS_TEXTO = ('genero', 'fuma', 'alcohol', 'actividad')
+
+
+# A partir de este número de valores distintos conviene ordenar la columna
+MAX_CATEGORIAS_SIN_ORDENAR = 32
+
+
+def _codificar_texto(textos, codificar_valor):
+    """Aplica codificar_valor a una columna de texto evaluándolo una vez por valor distinto.
+
+    Las columnas categóricas tienen muy pocos valores distintos, así que se
+    separan con comparaciones vectorizadas en vez de ordenar toda la columna;
+    si aparecen demasiados valores se recurre a np.unique.
+    """
+    codigos = np.empty(textos.shape, dtype=np.int8)
+    pendientes = np.ones(textos.shape, dtype=bool)
+    for _ in range(MAX_CATEGORIAS_SIN_ORDENAR):
+        if not pendientes.any():
+            return codigos
+        valor = textos[np.argmax(pendientes)]
+        filas = textos == valor
+        codigos[filas] = codificar_valor(str(valor))
+        pendientes &= ~filas
+    restantes = np.flatnonzero(pendientes)
+    unicos, inversa = np.unique(textos[restantes], return_inverse=True)
+    por_valor = np.array([codificar_valor(str(valor)) for valor in unicos], dtype=np.int8)
+    codigos[restantes] = por_valor[inversa.reshape(-1)]
+    return codigos
+
+
+class Intervalos:
+    """Variable numérica discretizada por cortes.
+
+    Cada corte es (limite, inclusivo): con inclusivo=False el límite abre el
+    tramo siguiente (x < limite queda abajo); con inclusivo=True pertenece al
+    tramo inferior (x <= limite queda abajo). valores asigna el código de cada
+    tramo; por defecto 0, 1, 2...
+    """
+
+    def __init__(self, campo, cortes, valores=None):
+        self.campo = campo
+        # Un corte inclusivo equivale a uno no inclusivo en el siguiente float64
+        self.limites = np.array([
+            np.nextafter(limite, np.inf) if inclusivo else limite
+            for limite, inclusivo in cortes
+        ], dtype=np.float64)
+        self._limites = self.limites.tolist()
+        self.valores = np.array(valores if valores is not None else range(len(cortes) + 1), dtype=np.int8)
+        self._valores = self.valores.tolist()
+
+    def escalar(self, valor):
+        return self._valores[bisect.bisect_right(self._limites, valor)]
+
+    def columnar(self, valores):
+        return self.valores[np.digitize(np.asarray(valores, dtype=np.float64), self.limites)]
+
+
+class Contiene:
+    """Variable de texto: el primer fragmento encontrado (sin distinguir mayúsculas) decide el código"""
+
+    def __init__(self, campo, reglas, defecto):
+        self.campo = campo
+        self.reglas = [(tuple(fragmentos), valor) for fragmentos, valor in reglas]
+        self.defecto = defecto
+
+    def escalar(self, valor):
+        texto = valor.lower()
+        for fragmentos, codigo in self.reglas:
+            if any(fragmento in texto for fragmento in fragmentos):
+                return codigo
+        return self.defecto
+
+    def columnar(self, valores):
+        return _codificar_texto(np.asarray(valores, dtype=str), self.escalar)
+
+
+class Igual:
+    """Variable binaria: 1 si el valor es exactamente el indicado, 0 en otro caso"""
+
+    def __init__(self, campo, valor):
+        self.campo = campo
+        self.valor = valor
+
+    def escalar(self, valor):
+        return 1 if valor == self.valor else 0
+
+    def columnar(self, valores):
+        return (np.asarray(valores, dtype=str) == self.valor).astype(np.int8)
+
+
+# Codificación de entrada del modelo, en el orden que espera modeloDEC.tflite
+ESPECIFICACION = (
+    Intervalos('edad', [(45, False), (59, True)]),
+    Contiene('genero', [(('femenino',), 0)], defecto=1),
+    Intervalos('ps', [(120, False), (139, True)]),
+    Intervalos('pd', [(80, False), (89, True)]),
+    Intervalos('colesterol', [(200, False), (239, True)]),
+    Intervalos('glucosa', [(100, False), (125, True)]),
+    Igual('fuma', 's'),
+    Igual('alcohol', 's'),
+    Contiene('actividad', [(('no',), 2), (('1', '2'), 1)], defecto=0),
+    Intervalos('imc', [(18.5, False), (25, False), (30, False)], valores=[1, 0, 1, 2]),
+)
+
+
+def leer_registro(registro):
+    """Valida y convierte un registro crudo (JSON o fila CSV) con las mismas reglas que /api/diagnostico"""
+    datos = {}
+    for campo, tipo in CAMPOS_NUMERICOS.items():
+        valor = registro.get(campo)
+        if valor is None or valor == '':
+            raise ValueError(f"Falta el campo '{campo}'")
+        try:
+            datos[campo] = tipo(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valor inválido para '{campo}': {valor}")
+    for campo in CAMPOS_TEXTO:
+        valor = registro.get(campo)
+        if not isinstance(valor, str) or not valor:
+            raise ValueError(f"Falta el campo '{campo}'")
+        datos[campo] = valor
+    if datos['estatura'] <= 0:
+        raise ValueError("La estatura debe ser mayor que cero")
+    datos['imc'] = datos['peso'] / ((datos['estatura'] / 100) ** 2)
+    return datos
+
+
+def codificar(datos):
+    """Ruta escalar: codifica un registro validado en una matriz (1, 10) para el modelo"""
+    return np.array([[variable.escalar(datos[variable.campo]) for variable in ESPECIFICACION]], dtype=np.float32)
+
+
+def codificar_columnas(columnas):
+    """Ruta columnar: codifica {campo: array} con n filas en una matriz (n, 10) para el modelo"""
+    n = len(columnas[ESPECIFICACION[0].campo])
+    entrada = np.empty((n, len(ESPECIFICACION)), dtype=np.float32)
+    for posicion, variable in enumerate(ESPECIFICACION):
+        entrada[:, posicion] = variable.columnar(columnas[variable.campo])
+    return entrada
+
+
+def codificar_lote(registros):
+    """Codifica una lista de registros validados en una matriz (n, 10) para el modelo"""
+    columnas = {
+        variable.campo: [registro[variable.campo] for registro in registros]
+        for variable in ESPECIFICACION
+    }
+    return codificar_columnas(columnas)
@@ -0,0 +1,292 @@
+import atexit
+import glob
+import json
+import os
+import shlex
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from config import (
+    PERSISTENCIA_ARCHIVO, PERSISTENCIA_LOTE_MAX, PERSISTENCIA_INTERVALO_MS, PERSISTENCIA_REINTENTO_S
+)
+from modelo.metricas import Histograma, Metricas
+from modelo.almacenamiento import ErrorConexion
+
+# Errores que indican que la base de datos no está disponible (el lote se reintenta);
+# cualquier otro error de la base de datos rechaza el lote
+ERRORES_CONEXION = ErrorConexion
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _workers(valor, origen):
+    try:
+        return int(valor)
+    except ValueError:
+        print(f"Número de workers no válido en {origen} ({valor!r}): se ignora")
+        return None
+
+
+def workers_configurados():
+    """Workers de gunicorn o uvicorn: -w/--workers (línea de órdenes o GUNICORN_CMD_ARGS) o WEB_CONCURRENCY.
+
+    Los valores que no son un entero se ignoran con un aviso y se pasa a la
+    siguiente fuente; sin ninguna válida se supone un solo worker.
+    """
+    argumentos = sys.argv[1:] + shlex.split(os.environ.get('GUNICORN_CMD_ARGS', ''))
+    for indice, argumento in enumerate(argumentos):
+        workers = None
+        if argumento in ('-w', '--workers') and indice + 1 < len(argumentos):
+            workers = _workers(argumentos[indice + 1], argumento)
+        elif argumento.startswith('--workers='):
+            workers = _workers(argumento.split('=', 1)[1], '--workers')
+        elif argumento.startswith('-w') and argumento[2:].isdigit():
+            workers = int(argumento[2:])
+        if workers is not None:
+            return workers
+    if os.environ.get('WEB_CONCURRENCY'):
+        workers = _workers(os.environ['WEB_CONCURRENCY'], 'WEB_CONCURRENCY')
+        if workers is not None:
+            return workers
+    return 1
+
+
+def drenar_al_terminar(cola):
+    """Drena la cola al recibir SIGTERM antes de seguir con el manejador anterior o salir.
+
+    Con `python app.py` (Procfile, start.sh) el SIGTERM del despliegue mata el
+    proceso sin pasar por atexit y se perderían los pendientes. Solo el hilo
+    principal puede instalar manejadores de señales.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    anterior = signal.getsignal(signal.SIGTERM)
+
+    def _al_terminar(numero, marco):
+        cola.drenar()
+        if callable(anterior):
+            anterior(numero, marco)
+        elif anterior != signal.SIG_IGN:
+            sys.exit(128 + numero)
+
+    signal.signal(signal.SIGTERM, _al_terminar)
+
+
+class ColaPersistencia:
+    """Persistencia diferida (write-behind) de diagnósticos.
+
+    encolar() vuelve de inmediato; un hilo en segundo plano inserta los
+    pendientes con INSERTs multi-fila cuando se juntan lote_max filas o pasan
+    intervalo_ms. Si la base de datos no responde, el lote se anexa a un archivo
+    JSONL que se reproduce al arrancar y cada reintento_s segundos.
+
+    Los pendientes solo los ve el proceso que los encoló: con varios workers una
+    lectura servida por otro no encontraría el diagnóstico recién hecho, así que
+    la cola se niega a arrancar si hay más de un worker configurado.
+    """
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, guardar_lote, archivo=PERSISTENCIA_ARCHIVO, lote_max=PERSISTENCIA_LOTE_MAX,
+                 intervalo_ms=PERSISTENCIA_INTERVALO_MS, reintento_s=PERSISTENCIA_REINTENTO_S):
+        # guardar_lote(filas, fechas) inserta en una transacción y lanza la excepción si falla
+        self.guardar_lote = guardar_lote
+        self.archivo = archivo
+        self.lote_max = lote_max
+        self.intervalo = intervalo_ms / 1000
+        self.reintento = reintento_s
+        self._condicion = threading.Condition()
+        self._pendientes = []
+        self._ultimos = {}
+        self._detener = False
+        self._pid = os.getpid()
+        self._hilo = None
+        self._escritas = 0
+        self._volcadas = 0
+        self._reproducidas = 0
+        self._rechazadas = 0
+        self.histograma_lote = Histograma([1, 10, 50, 100, 200, 500, 1000])
+
+    @classmethod
+    def global_(cls):
+        """Cola única del proceso; arranca su hilo y reproduce lo volcado al crearse"""
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    workers = workers_configurados()
+                    if workers > 1:
+                        raise RuntimeError(
+                            f"PERSISTENCIA_DIFERIDA=1 necesita un solo worker ({workers} configurados): "
+                            "los diagnósticos pendientes no son visibles desde los demás procesos"
+                        )
+                    from modelo.modelo_resultados import ModeloResultados
+                    cola = ColaPersistencia(ModeloResultados.insertar_diagnosticos_lote)
+                    cola._arrancar()
+                    atexit.register(cola.drenar)
+                    drenar_al_terminar(cola)
+                    Metricas.registrar('persistencia_diferida', cola.estadisticas)
+                    cls._global = cola
+        return cls._global
+
+    def _arrancar(self):
+        self._hilo = threading.Thread(target=self._trabajar, name='cola-persistencia', daemon=True)
+        self._hilo.start()
+
+    def encolar(self, fila):
+        """Encola (usuario_id, edad, ..., imc, riesgo, confianza) con la fecha actual"""
+        fecha = datetime.now()
+        with self._condicion:
+            self._pendientes.append((tuple(fila), fecha))
+            self._ultimos[fila[0]] = (fila[13], fila[14], fecha)
+            # Despierta al hilo para abrir la ventana de agrupación o vaciar un lote lleno
+            if len(self._pendientes) == 1 or len(self._pendientes) >= self.lote_max:
+                self._condicion.notify()
+
+    def ultimo(self, usuario_id):
+        """(riesgo, confianza, fecha) del último diagnóstico del usuario aún sin confirmar, o None"""
+        with self._condicion:
+            return self._ultimos.get(usuario_id)
+
+    def _olvidar(self, lote):
+        with self._condicion:
+            for fila, fecha in lote:
+                ultimo = self._ultimos.get(fila[0])
+                if ultimo is not None and ultimo[2] == fecha:
+                    del self._ultimos[fila[0]]
+
+    def _trabajar(self):
+        self.reproducir()
+        proximo_reintento = time.monotonic() + self.reintento
+        while True:
+            with self._condicion:
+                if not self._pendientes and not self._detener:
+                    self._condicion.wait(timeout=self.reintento)
+                if self._pendientes and not self._detener:
+                    # Ventana de agrupación desde la primera fila pendiente
+                    self._condicion.wait_for(
+                        lambda: len(self._pendientes) >= self.lote_max or self._detener, timeout=self.intervalo)
+                lote = self._pendientes[:self.lote_max]
+                del self._pendientes[:self.lote_max]
+                detener = self._detener and not self._pendientes
+            if lote:
+                self._vaciar(lote)
+            if time.monotonic() >= proximo_reintento:
+                self.reproducir()
+                proximo_reintento = time.monotonic() + self.reintento
+            if detener:
+                return
+
+    def _vaciar(self, lote):
+        """Inserta el lote; devuelve False si la base de datos no estaba disponible y se volcó a disco"""
+        try:
+            self.guardar_lote([fila for fila, _ in lote], [fecha for _, fecha in lote])
+        except ERRORES_CONEXION as e:
+            print(f"Base de datos no disponible, {len(lote)} diagnósticos volcados a {self.archivo}: {e}")
+            self._volcar(self.archivo, lote)
+            self._volcadas += len(lote)
+            return False
+        except Exception as e:
+            print(f"Lote de {len(lote)} diagnósticos rechazado por la base de datos: {e}")
+            self._volcar(self.archivo + '.rechazados', lote)
+            self._rechazadas += len(lote)
+        else:
+            self._escritas += len(lote)
+            self.histograma_lote.observar(len(lote))
+        self._olvidar(lote)
+        return True
+
+    def _volcar(self, ruta, lote):
+        lineas = ''.join(
+            json.dumps({'fila': list(fila), 'fecha': fecha.isoformat()}) + '\n'
+            for fila, fecha in lote
+        )
+        # Una sola escritura en modo anexado: varios workers pueden compartir el archivo
+        with open(ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write(lineas)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def reproducir(self):
+        """Reinserta lo volcado a disco (por este u otros procesos); devuelve las filas guardadas"""
+        tomados = []
+        for huerfano in glob.glob(glob.escape(self.archivo) + '.*.reproduciendo'):
+            # Reproducción interrumpida de un proceso que ya no existe
+            pid = huerfano[len(self.archivo) + 1:-len('.reproduciendo')]
+            if pid.isdigit() and not _proceso_vivo(int(pid)):
+                tomados.append(huerfano)
+        if os.path.exists(self.archivo):
+            # El rename es atómico: solo un proceso se queda con el archivo
+            tomado = f"{self.archivo}.{os.getpid()}.reproduciendo"
+            try:
+                os.rename(self.archivo, tomado)
+                tomados.append(tomado)
+            except FileNotFoundError:
+                pass
+
+        guardadas = 0
+        for tomado in tomados:
+            lote = []
+            with open(tomado, encoding='utf-8') as archivo:
+                for linea in archivo:
+                    try:
+                        registro = json.loads(linea)
+                        lote.append((tuple(registro['fila']), datetime.fromisoformat(registro['fecha'])))
+                    except (ValueError, KeyError, TypeError):
+                        # Última línea truncada por una caída a mitad de escritura
+                        print(f"Línea inválida en {tomado}: {linea!r}")
+            for inicio in range(0, len(lote), self.lote_max):
+                if not self._vaciar(lote[inicio:inicio + self.lote_max]):
+                    self._volcar(self.archivo, lote[inicio + self.lote_max:])
+                    break
+                guardadas += len(lote[inicio:inicio + self.lote_max])
+            os.remove(tomado)
+        self._reproducidas += guardadas
+        return guardadas
+
+    def drenar(self, timeout=30):
+        """Detiene el hilo tras escribir (o volcar) todo lo pendiente; se llama al salir"""
+        if self._pid != os.getpid():
+            return
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        with self._condicion:
+            restantes, self._pendientes = self._pendientes, []
+        if restantes:
+            self._volcar(self.archivo, restantes)
+            self._volcadas += len(restantes)
+
+    def estadisticas(self):
+        with self._condicion:
+            pendientes = len(self._pendientes)
+        return {
+            'pendientes': pendientes,
+            'escritas': self._escritas,
+            'volcadas': self._volcadas,
+            'reproducidas': self._reproducidas,
+            'rechazadas': self._rechazadas,
+            'tamano_lote': self.histograma_lote.exportar(),
+        }
+
+    @classmethod
+    def _despues_de_fork(cls):
+        # El hilo no sobrevive al fork y las filas copiadas pertenecen al padre:
+        # el hijo crea su propia cola (drenar() de la copia no hace nada por el pid)
+        cls._global = None
+        cls._lock_global = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ColaPersistencia._despues_de_fork)
@@ -0,0 +1,171 @@
+"""Hash de contraseñas (werkzeug.security) en un pool de hilos acotado.
+
+Un hash lento (CONTRASENA_METODO) cuesta decenas de milisegundos de CPU: los
+hashes del login y del registro se calculan en CONTRASENA_HILOS hilos
+dedicados, de modo que una ráfaga de logins ocupa como mucho esos núcleos y
+las peticiones de diagnóstico siguen atendiéndose. Con más de
+CONTRASENA_COLA_MAX hashes pendientes el login responde 503 en vez de
+acumular espera.
+
+Las filas antiguas guardan la contraseña en claro: se aceptan y se rehashean
+al iniciar sesión, igual que las de un método o coste distinto del actual.
+"""
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as EsperaAgotada
+from flask import jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import CONTRASENA_METODO, CONTRASENA_HILOS, CONTRASENA_COLA_MAX, POOL_MODO
+from modelo.metricas import Histograma, Metricas
+from modelo.plazos import plazo_restante
+
+_PREFIJOS_HASH = ('scrypt:', 'pbkdf2:')
+
+
+class HashesSaturados(Exception):
+    """Demasiados hashes de contraseña pendientes"""
+
+
+def es_hash(almacenada):
+    return almacenada.startswith(_PREFIJOS_HASH) and almacenada.count('$') == 2
+
+
+def generar_hash(contrasena):
+    return generate_password_hash(contrasena, method=CONTRASENA_METODO)
+
+
+def comprobar(almacenada, contrasena):
+    """Compara con el hash guardado o, en las filas antiguas, con la contraseña en claro"""
+    # Una contraseña que no es texto (un número del JSON, por ejemplo) no coincide con nada
+    if almacenada is None or not isinstance(contrasena, str):
+        return False
+    if es_hash(almacenada):
+        return check_password_hash(almacenada, contrasena)
+    return hmac.compare_digest(almacenada.encode(), contrasena.encode())
+
+
+def necesita_rehash(almacenada):
+    """Contraseña en claro o con otro método/coste que CONTRASENA_METODO"""
+    return not es_hash(almacenada) or almacenada.split('$', 1)[0] != CONTRASENA_METODO
+
+
+class PoolContrasenas:
+    """Hilos dedicados a los hashes de contraseñas, con la cola acotada"""
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, hilos=CONTRASENA_HILOS, cola_max=CONTRASENA_COLA_MAX, modo=POOL_MODO):
+        self.hilos = hilos
+        self.cola_max = cola_max
+        self.modo = modo
+        self._lock = threading.Lock()
+        self._pid = None
+        self._ejecutor = None
+        self._espera_agotada = EsperaAgotada
+        self._pendientes = 0
+        self._completados = 0
+        self._rechazados = 0
+        self.histograma_espera_ms = Histograma([1, 5, 10, 50, 100, 250, 500, 1000, 5000])
+        self.histograma_hash_ms = Histograma([1, 5, 10, 25, 50, 100, 250, 500, 1000])
+        # Hash de referencia para los usernames inexistentes (mismo tiempo de respuesta)
+        self._hash_ficticio = None
+
+    @classmethod
+    def global_(cls):
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = PoolContrasenas()
+                    Metricas.registrar('contrasenas', cls._global.estadisticas)
+        return cls._global
+
+    def _asegurar_ejecutor(self):
+        # Los hilos no sobreviven a un fork (gunicorn --preload): un ejecutor por proceso
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.modo == 'gevent':
+                # Hilos reales del sistema: los de threading están parcheados como greenlets
+                from gevent import Timeout
+                from gevent.threadpool import ThreadPool
+                self._ejecutor = ThreadPool(self.hilos)
+                self._espera_agotada = Timeout
+            else:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='contrasenas')
+            self._pendientes = 0
+            self._pid = os.getpid()
+
+    def ejecutar(self, funcion, *args, acotado=True):
+        """Resultado de funcion(*args) calculado en el pool, esperando como mucho el plazo de la petición.
+
+        Con acotado=False no se rechaza con la cola llena (importación masiva: un
+        hash cada vez, que no debe fallar por una ráfaga de logins).
+        """
+        self._asegurar_ejecutor()
+        with self._lock:
+            if acotado and self._pendientes >= self.cola_max:
+                self._rechazados += 1
+                raise HashesSaturados("Demasiados inicios de sesión simultáneos")
+            self._pendientes += 1
+        encolada = time.perf_counter()
+
+        def medida():
+            inicio = time.perf_counter()
+            self.histograma_espera_ms.observar((inicio - encolada) * 1000)
+            try:
+                return funcion(*args)
+            finally:
+                self.histograma_hash_ms.observar((time.perf_counter() - inicio) * 1000)
+                with self._lock:
+                    self._pendientes -= 1
+                    self._completados += 1
+
+        restante = plazo_restante()
+        espera = None if restante is None else max(restante, 0)
+        try:
+            if self.modo == 'gevent':
+                return self._ejecutor.spawn(medida).get(timeout=espera)
+            return self._ejecutor.submit(medida).result(timeout=espera)
+        except self._espera_agotada:
+            raise HashesSaturados("El hash de la contraseña no terminó dentro del plazo")
+
+    def comprobar(self, almacenada, contrasena):
+        if almacenada is None:
+            # Username inexistente: se hace el mismo trabajo para no delatarlo por el tiempo
+            if self._hash_ficticio is None:
+                self._hash_ficticio = self.generar_hash('')
+            self.ejecutar(comprobar, self._hash_ficticio, contrasena or '')
+            return False
+        return self.ejecutar(comprobar, almacenada, contrasena)
+
+    def generar_hash(self, contrasena, acotado=True):
+        return self.ejecutar(generar_hash, contrasena, acotado=acotado)
+
+    def estadisticas(self):
+        with self._lock:
+            pendientes, completados, rechazados = self._pendientes, self._completados, self._rechazados
+        return {
+            'metodo': CONTRASENA_METODO,
+            'hilos': self.hilos,
+            'cola_max': self.cola_max,
+            'pendientes': pendientes,
+            'completados': completados,
+            'rechazados': rechazados,
+            'espera_ms': self.histograma_espera_ms.exportar(),
+            'hash_ms': self.histograma_hash_ms.exportar(),
+        }
+
+
+def registrar_contrasenas(app):
+    PoolContrasenas.global_()
+
+    @app.errorhandler(HashesSaturados)
+    def _hashes_saturados(error):
+        respuesta = jsonify({'message': 'Demasiados inicios de sesión, intente de nuevo en unos segundos'})
+        respuesta.status_code = 503
+        respuesta.headers['Retry-After'] = '1'
+        return respuesta
@@ -0,0 +1,207 @@
+"""Instrumentación de las consultas de cada petición y registro de consultas lentas.
+
+Cada petición lleva una MedicionPeticion en g: los cursores de la unidad de
+trabajo y el pool async suman en ella las sentencias, su duración, las filas
+devueltas y la espera para obtener la conexión. Al terminar la petición se
+acumula en el agregado de su endpoint. Las sentencias que superan
+CONSULTA_LENTA_MS se registran con el SQL normalizado. Todo se expone en
+/api/metricas bajo 'consultas'.
+"""
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from flask import g, has_app_context, has_request_context, request
+from config import INSTRUMENTACION_ACTIVA, CONSULTA_LENTA_MS, CONSULTAS_LENTAS_MAX
+from modelo.metricas import Histograma, Metricas
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|\?")
+_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def _normalizar(sql):
+    sql = _LITERAL.sub('?', _ESPACIOS.sub(' ', sql).strip())
+    return _LISTA.sub('(...)', sql)
+
+
+def normalizar_sql(sql):
+    """SQL en una línea con literales y marcadores como ?: agrupa las sentencias de la misma forma"""
+    if isinstance(sql, bytes):
+        sql = sql.decode()
+    return _normalizar(str(sql))
+
+
+class MedicionPeticion:
+    """Sentencias, filas y tiempos de base de datos de una petición"""
+    __slots__ = ('endpoint', 'inicio', 'consultas', 'conexiones', 'filas', 'ms_bd', 'ms_conexion', 'en_streaming')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint or 'sin_endpoint'
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.conexiones = 0
+        self.filas = 0
+        self.ms_bd = 0.0
+        self.ms_conexion = 0.0
+        self.en_streaming = False
+
+    def consulta(self, sql, inicio, filas=None, veces=1):
+        """Suma una sentencia que empezó en inicio (perf_counter); filas solo se usa en el registro de lentas"""
+        ms = (time.perf_counter() - inicio) * 1000
+        self.consultas += veces
+        self.ms_bd += ms
+        if ms >= CONSULTA_LENTA_MS:
+            Instrumentacion.consulta_lenta(sql, ms, filas, self.endpoint)
+
+    def espera(self, inicio):
+        """Tiempo de base de datos que no es una sentencia (lectura de filas de un cursor de servidor)"""
+        self.ms_bd += (time.perf_counter() - inicio) * 1000
+
+    def conexion(self, inicio):
+        self.conexiones += 1
+        self.ms_conexion += (time.perf_counter() - inicio) * 1000
+
+
+def medicion_actual():
+    """Medición de la petición en curso, o None fuera de una petición o con la instrumentación apagada"""
+    if not has_app_context():
+        return None
+    medicion = g.get('medicion_bd')
+    if medicion is None and has_request_context():
+        # stream_with_context genera la respuesta en otro contexto de aplicación (otro g)
+        medicion = request.environ.get('medicion_bd')
+        if medicion is not None:
+            g.medicion_bd = medicion
+    return medicion
+
+
+class _AgregadoEndpoint:
+    def __init__(self):
+        self.peticiones = 0
+        self.consultas = 0
+        self.consultas_max = 0
+        self.conexiones = 0
+        self.filas = 0
+        self.ms_peticion = 0.0
+        self.ms_bd = 0.0
+        self.ms_conexion = 0.0
+        self.histograma_ms = Histograma([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+
+    def sumar(self, medicion, ms_peticion):
+        self.peticiones += 1
+        self.consultas += medicion.consultas
+        self.consultas_max = max(self.consultas_max, medicion.consultas)
+        self.conexiones += medicion.conexiones
+        self.filas += medicion.filas
+        self.ms_peticion += ms_peticion
+        self.ms_bd += medicion.ms_bd
+        self.ms_conexion += medicion.ms_conexion
+        self.histograma_ms.observar(ms_peticion)
+
+    def exportar(self):
+        n = self.peticiones
+        return {
+            'peticiones': n,
+            'consultas_promedio': round(self.consultas / n, 2),
+            'consultas_max': self.consultas_max,
+            'conexiones_promedio': round(self.conexiones / n, 2),
+            'filas_promedio': round(self.filas / n, 1),
+            'ms_peticion_promedio': round(self.ms_peticion / n, 3),
+            'ms_bd_promedio': round(self.ms_bd / n, 3),
+            'ms_conexion_promedio': round(self.ms_conexion / n, 3),
+            # Parte del tiempo de la petición que se pasa esperando a la base de datos
+            'fraccion_bd': round((self.ms_bd + self.ms_conexion) / self.ms_peticion, 3) if self.ms_peticion else None,
+            'ms_peticion': self.histograma_ms.exportar(),
+        }
+
+
+class Instrumentacion:
+    """Agregados por endpoint y registro de consultas lentas del proceso"""
+    _lock = threading.Lock()
+    _endpoints = {}
+    _lentas = deque(maxlen=CONSULTAS_LENTAS_MAX)
+    _lentas_por_sql = {}
+
+    @classmethod
+    def registrar_peticion(cls, medicion):
+        ms_peticion = (time.perf_counter() - medicion.inicio) * 1000
+        with cls._lock:
+            agregado = cls._endpoints.get(medicion.endpoint)
+            if agregado is None:
+                agregado = cls._endpoints[medicion.endpoint] = _AgregadoEndpoint()
+            agregado.sumar(medicion, ms_peticion)
+
+    @classmethod
+    def consulta_lenta(cls, sql, ms, filas, endpoint):
+        normalizada = normalizar_sql(sql)
+        print(f"Consulta lenta ({ms:.1f} ms) en {endpoint}: {normalizada}")
+        with cls._lock:
+            cls._lentas.append({
+                'sql': normalizada,
+                'ms': round(ms, 3),
+                'filas': filas if filas is not None and filas >= 0 else None,
+                'endpoint': endpoint,
+                'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            agregada = cls._lentas_por_sql.get(normalizada)
+            if agregada is None:
+                # Formas distintas acotadas: SQL generado con valores literales no llena la memoria
+                if len(cls._lentas_por_sql) >= CONSULTAS_LENTAS_MAX:
+                    return
+                agregada = cls._lentas_por_sql[normalizada] = {'sql': normalizada, 'veces': 0, 'ms_total': 0.0, 'ms_max': 0.0}
+            agregada['veces'] += 1
+            agregada['ms_total'] += ms
+            agregada['ms_max'] = max(agregada['ms_max'], ms)
+
+    @classmethod
+    def exportar(cls):
+        with cls._lock:
+            endpoints = {nombre: agregado.exportar() for nombre, agregado in cls._endpoints.items()}
+            lentas = list(cls._lentas)
+            por_sql = [dict(agregada) for agregada in cls._lentas_por_sql.values()]
+        for agregada in por_sql:
+            agregada['ms_total'] = round(agregada['ms_total'], 3)
+            agregada['ms_max'] = round(agregada['ms_max'], 3)
+        return {
+            'activa': INSTRUMENTACION_ACTIVA,
+            'umbral_lenta_ms': CONSULTA_LENTA_MS,
+            'endpoints': endpoints,
+            'lentas_recientes': lentas[::-1],
+            'lentas_por_consulta': sorted(por_sql, key=lambda agregada: agregada['ms_total'], reverse=True),
+        }
+
+
+def registrar_instrumentacion(app):
+    """Abre la medición de cada petición y la acumula en su endpoint al terminar.
+
+    Se registra antes que la unidad de trabajo: los after_request y los teardown
+    se ejecutan en orden inverso y así el ROLLBACK final de la unidad también se mide.
+    """
+    if not INSTRUMENTACION_ACTIVA:
+        return
+
+    @app.before_request
+    def _abrir_medicion():
+        g.medicion_bd = request.environ['medicion_bd'] = MedicionPeticion(request.endpoint)
+
+    @app.after_request
+    def _medicion_en_streaming(respuesta):
+        medicion = g.get('medicion_bd')
+        if medicion is not None and respuesta.is_streamed:
+            # Se acumula al cerrar la respuesta, con las consultas hechas mientras se generaba
+            medicion.en_streaming = True
+            respuesta.call_on_close(lambda: Instrumentacion.registrar_peticion(medicion))
+        return respuesta
+
+    @app.teardown_appcontext
+    def _cerrar_medicion(error):
+        medicion = g.pop('medicion_bd', None)
+        if medicion is not None and not medicion.en_streaming:
+            Instrumentacion.registrar_peticion(medicion)
+
+
+Metricas.registrar('consultas', Instrumentacion.exportar)
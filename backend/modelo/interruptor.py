@@ -0,0 +1,147 @@
+"""Interruptor de circuito de la base de datos (PostgreSQL).
+
+Tras INTERRUPTOR_FALLOS fallos seguidos (timeouts o errores de conexión) el
+interruptor se abre: durante INTERRUPTOR_ESPERA_S las peticiones responden 503
+al pedir la conexión, en vez de quedarse bloqueadas esperando a un servidor
+que no responde. Pasado ese tiempo deja pasar una sola petición de prueba: si
+su consulta funciona el interruptor se cierra y, si falla, vuelve a abrirse.
+"""
+import math
+import threading
+import time
+from datetime import datetime
+from flask import jsonify
+from config import BD_MOTOR, INTERRUPTOR_FALLOS, INTERRUPTOR_ESPERA_S
+from modelo.almacenamiento import ErrorConexion
+from modelo.metricas import Metricas
+
+try:
+    # psycopg 3 (pool async del modo ASGI); su PoolTimeout también es un OperationalError
+    from psycopg import OperationalError as _ErrorConexionAsync
+    _ERRORES_CONEXION = ErrorConexion + (_ErrorConexionAsync,)
+except ImportError:
+    _ERRORES_CONEXION = ErrorConexion
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+
+class BDNoDisponible(Exception):
+    """La petición no puede usar la base de datos: interruptor abierto o plazo agotado"""
+
+
+class PlazoAgotado(BDNoDisponible):
+    """Se acabó el plazo de la petición antes de terminar sus operaciones de base de datos"""
+
+
+def es_fallo_bd(error):
+    """Timeouts y errores de conexión; los conflictos de transacción (SQLSTATE 40xxx) no cuentan"""
+    if isinstance(error, (BDNoDisponible, TimeoutError)):
+        return True
+    if not isinstance(error, _ERRORES_CONEXION):
+        return False
+    codigo = getattr(error, 'pgcode', None) or getattr(error, 'sqlstate', None) or ''
+    return not codigo.startswith('40')
+
+
+class InterruptorCircuito:
+    """Estado compartido por todas las peticiones del proceso"""
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, fallos_max=INTERRUPTOR_FALLOS, espera=INTERRUPTOR_ESPERA_S):
+        # Con SQLite no hay red ni servidor que pueda dejar de responder
+        self.activo = fallos_max > 0 and BD_MOTOR == 'postgres'
+        self.fallos_max = fallos_max
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._estado = CERRADO
+        self._fallos = 0
+        self._abierto_desde = 0.0
+        self._prueba_desde = None
+        self._aperturas = 0
+        self._rechazadas = 0
+        self._fallos_total = 0
+        self._ultimo_cambio = None
+
+    @classmethod
+    def global_(cls):
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = InterruptorCircuito()
+                    Metricas.registrar('interruptor_bd', cls._global.estadisticas)
+        return cls._global
+
+    def permitir(self):
+        """Lanza BDNoDisponible si el interruptor no deja pasar la petición"""
+        if self._estado == CERRADO or not self.activo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            if self._estado == ABIERTO and ahora - self._abierto_desde >= self.espera:
+                self._cambiar(SEMIABIERTO)
+                self._prueba_desde = None
+            if self._estado == CERRADO:
+                return
+            # Una sola petición de prueba a la vez; otra si la anterior no informó a tiempo
+            if self._estado == SEMIABIERTO and (self._prueba_desde is None or ahora - self._prueba_desde >= self.espera):
+                self._prueba_desde = ahora
+                return
+            self._rechazadas += 1
+        raise BDNoDisponible("Base de datos no disponible (interruptor abierto)")
+
+    def exito(self):
+        if self._estado == CERRADO and self._fallos == 0:
+            return
+        with self._lock:
+            # Abierto, los éxitos de peticiones anteriores a la apertura no cuentan: decide la prueba
+            if self._estado == ABIERTO:
+                return
+            self._fallos = 0
+            if self._estado == SEMIABIERTO:
+                self._cambiar(CERRADO)
+
+    def fallo(self):
+        if not self.activo:
+            return
+        with self._lock:
+            self._fallos_total += 1
+            if self._estado == ABIERTO:
+                return
+            self._fallos += 1
+            if self._estado == SEMIABIERTO or self._fallos >= self.fallos_max:
+                self._abierto_desde = time.monotonic()
+                self._aperturas += 1
+                self._cambiar(ABIERTO)
+                print(f"Interruptor de la base de datos abierto tras {self._fallos} fallos seguidos")
+
+    def _cambiar(self, estado):
+        self._estado = estado
+        self._ultimo_cambio = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def reintentar_en(self):
+        """Segundos hasta la próxima petición de prueba (para Retry-After)"""
+        if self._estado != ABIERTO:
+            return 1
+        return max(self.espera - (time.monotonic() - self._abierto_desde), 1)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'activo': self.activo,
+                'estado': self._estado,
+                'fallos_seguidos': self._fallos,
+                'fallos_total': self._fallos_total,
+                'aperturas': self._aperturas,
+                'rechazadas': self._rechazadas,
+                'ultimo_cambio': self._ultimo_cambio,
+            }
+
+
+def respuesta_no_disponible():
+    respuesta = jsonify({'message': 'Base de datos no disponible, intente de nuevo más tarde'})
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = str(math.ceil(InterruptorCircuito.global_().reintentar_en()))
+    return respuesta
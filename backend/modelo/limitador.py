@@ -0,0 +1,224 @@
+"""Limitador de tasa con cubetas de fichas por IP y por username.
+
+Las vistas marcadas con limitar_tasa('grupo') se comprueban en un
+before_request, antes de abrir la conexión de la petición: una petición
+rechazada responde 429 con Retry-After sin ningún trabajo de base de datos.
+Los límites de cada grupo (LIMITES_TASA) son 'fichas/segundos': la ráfaga
+máxima y el periodo en que la cubeta se vuelve a llenar.
+
+Las cubetas se guardan en memoria, repartidas en fragmentos con su propio
+lock, o en un archivo SQLite local (LIMITADOR_ALMACEN='sqlite') que comparten
+todos los workers de gunicorn de la máquina. Si el almacén falla se deja pasar
+la petición: el limitador no debe tumbar el login.
+"""
+import math
+import sqlite3
+import threading
+import time
+import zlib
+from flask import jsonify, request, session
+from config import (
+    LIMITADOR_ACTIVO, LIMITES_TASA, LIMITADOR_ALMACEN, LIMITADOR_SQLITE_PATH,
+    LIMITADOR_FRAGMENTOS, LIMITADOR_CLAVES_MAX
+)
+from modelo.metricas import Metricas
+from modelo.sqlite_local import SqliteLocal
+
+
+class TasaExcedida(Exception):
+    """Cubeta sin fichas; espera son los segundos hasta la siguiente"""
+
+    def __init__(self, espera):
+        super().__init__("Demasiadas peticiones")
+        self.espera = espera
+
+
+def limitar_tasa(grupo):
+    """Marca una vista cuyas peticiones consumen fichas de las cubetas de grupo"""
+    def marcar(vista):
+        vista.grupo_tasa = grupo
+        return vista
+    return marcar
+
+
+def leer_limites(texto):
+    """'login.ip=20/60,login.usuario=5/60' -> {'login': {'ip': (20.0, 60.0), 'usuario': (5.0, 60.0)}}"""
+    limites = {}
+    for parte in filter(None, (parte.strip() for parte in texto.split(','))):
+        clave, _, valor = parte.partition('=')
+        grupo, _, por = clave.strip().partition('.')
+        fichas, _, segundos = valor.partition('/')
+        if por not in ('ip', 'usuario') or float(fichas) <= 0 or float(segundos) <= 0:
+            raise ValueError(f"Límite de tasa no válido: {parte}")
+        limites.setdefault(grupo, {})[por] = (float(fichas), float(segundos))
+    return limites
+
+
+class AlmacenMemoria:
+    """Cubetas del proceso, en fragmentos con su propio lock para no serializar los hilos"""
+
+    def __init__(self, fragmentos=LIMITADOR_FRAGMENTOS, claves_max=LIMITADOR_CLAVES_MAX):
+        self._fragmentos = [({}, threading.Lock()) for _ in range(fragmentos)]
+        self._claves_max = max(claves_max // fragmentos, 1)
+
+    def consumir(self, clave, capacidad, ritmo, ahora):
+        """(aceptada, fichas) tras intentar gastar una ficha de la cubeta clave"""
+        cubetas, lock = self._fragmentos[zlib.crc32(clave.encode()) % len(self._fragmentos)]
+        with lock:
+            fichas, ultima = cubetas.pop(clave, (capacidad, ahora))
+            fichas = min(capacidad, fichas + (ahora - ultima) * ritmo)
+            aceptada = fichas >= 1
+            if aceptada:
+                fichas -= 1
+            # Reinsertada al final: el dict queda ordenado de la menos a la más reciente
+            cubetas[clave] = (fichas, ahora)
+            while len(cubetas) > self._claves_max:
+                # Una IP que rota direcciones no agota la memoria: se olvidan las más antiguas
+                del cubetas[next(iter(cubetas))]
+        return aceptada, fichas
+
+    def claves(self):
+        return sum(len(cubetas) for cubetas, _ in self._fragmentos)
+
+
+class AlmacenSqlite:
+    """Cubetas en un archivo SQLite local compartido por los workers de la máquina"""
+
+    # Una sola sentencia: leer, rellenar y gastar la ficha es atómico entre procesos
+    _CONSUMIR = """
+        INSERT INTO cubetas (clave, fichas, ultima, aceptada) VALUES (:clave, :capacidad - 1, :ahora, 1)
+        ON CONFLICT (clave) DO UPDATE SET
+            aceptada = MIN(:capacidad, fichas + (:ahora - ultima) * :ritmo) >= 1,
+            fichas = MIN(:capacidad, fichas + (:ahora - ultima) * :ritmo)
+                     - (MIN(:capacidad, fichas + (:ahora - ultima) * :ritmo) >= 1),
+            ultima = :ahora
+        RETURNING aceptada, fichas
+    """
+
+    def __init__(self, ruta=LIMITADOR_SQLITE_PATH, claves_max=LIMITADOR_CLAVES_MAX, caducidad_s=3600):
+        self.archivo = SqliteLocal(
+            ruta,
+            "CREATE TABLE IF NOT EXISTS cubetas ("
+            "clave TEXT PRIMARY KEY, fichas REAL NOT NULL, ultima REAL NOT NULL, aceptada INTEGER NOT NULL)"
+        )
+        self.claves_max = claves_max
+        # Tras el periodo más largo de los límites una cubeta está llena: equivale a no tenerla
+        self.caducidad_s = caducidad_s
+        self._proxima_purga = 0
+
+    def consumir(self, clave, capacidad, ritmo, ahora):
+        conn = self.archivo.conexion()
+        aceptada, fichas = conn.execute(
+            self._CONSUMIR, {'clave': clave, 'capacidad': capacidad, 'ritmo': ritmo, 'ahora': ahora}
+        ).fetchone()
+        if ahora >= self._proxima_purga:
+            self._proxima_purga = ahora + 60
+            self._purgar(conn, ahora)
+        return bool(aceptada), fichas
+
+    def _purgar(self, conn, ahora):
+        conn.execute("DELETE FROM cubetas WHERE ultima < ?", (ahora - self.caducidad_s,))
+        # Por encima del máximo se olvidan las más antiguas
+        conn.execute("""
+            DELETE FROM cubetas WHERE clave IN (
+                SELECT clave FROM cubetas ORDER BY ultima DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.claves_max,))
+
+    def claves(self):
+        return self.archivo.conexion().execute("SELECT COUNT(*) FROM cubetas").fetchone()[0]
+
+
+class Limitador:
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, limites=None, almacen=None):
+        self.limites = leer_limites(LIMITES_TASA) if limites is None else limites
+        if almacen is None and LIMITADOR_ALMACEN == 'sqlite':
+            caducidad = max((segundos for por in self.limites.values() for _, segundos in por.values()), default=0)
+            almacen = AlmacenSqlite(caducidad_s=caducidad)
+        elif almacen is None:
+            almacen = AlmacenMemoria()
+        self.almacen = almacen
+        self._lock = threading.Lock()
+        self._aceptadas = {}
+        self._rechazadas = {}
+        self._errores = 0
+
+    @classmethod
+    def global_(cls):
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = Limitador()
+                    Metricas.registrar('limitador', cls._global.estadisticas)
+        return cls._global
+
+    def comprobar(self, grupo, ip, username=None):
+        """Gasta una ficha de cada cubeta del grupo; lanza TasaExcedida si alguna está vacía"""
+        ahora = time.time()
+        for por, valor in (('ip', ip), ('usuario', username)):
+            limite = self.limites.get(grupo, {}).get(por)
+            if limite is None or not valor:
+                continue
+            capacidad, segundos = limite
+            ritmo = capacidad / segundos
+            try:
+                aceptada, fichas = self.almacen.consumir(f"{grupo}:{por}:{valor}", capacidad, ritmo, ahora)
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._errores += 1
+                print(f"Limitador de tasa no disponible, se deja pasar la petición: {e}")
+                return
+            if not aceptada:
+                self._contar(self._rechazadas, grupo)
+                raise TasaExcedida((1 - fichas) / ritmo)
+        self._contar(self._aceptadas, grupo)
+
+    def _contar(self, contadores, grupo):
+        with self._lock:
+            contadores[grupo] = contadores.get(grupo, 0) + 1
+
+    def estadisticas(self):
+        with self._lock:
+            estadisticas = {
+                'almacen': type(self.almacen).__name__,
+                'aceptadas': dict(self._aceptadas),
+                'rechazadas': dict(self._rechazadas),
+                'errores': self._errores,
+            }
+        try:
+            estadisticas['claves'] = self.almacen.claves()
+        except sqlite3.Error:
+            estadisticas['claves'] = None
+        return estadisticas
+
+
+def _username_peticion():
+    """Username al que va dirigida la petición: el de la ruta, el del cuerpo o el de la sesión"""
+    if request.view_args and request.view_args.get('username'):
+        return request.view_args['username']
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict) and isinstance(datos.get('username'), str):
+        return datos['username']
+    return session.get('username')
+
+
+def registrar_limitador(app):
+    if not LIMITADOR_ACTIVO:
+        return
+    limitador = Limitador.global_()
+
+    @app.before_request
+    def _limitar_tasa():
+        grupo = getattr(app.view_functions.get(request.endpoint), 'grupo_tasa', None)
+        if grupo is not None:
+            limitador.comprobar(grupo, request.remote_addr, _username_peticion())
+
+    @app.errorhandler(TasaExcedida)
+    def _tasa_excedida(error):
+        respuesta = jsonify({'message': 'Demasiadas peticiones, intente de nuevo más tarde'})
+        respuesta.status_code = 429
+        respuesta.headers['Retry-After'] = str(max(math.ceil(error.espera), 1))
+        return respuesta
@@ -0,0 +1,47 @@
+import bisect
+import threading
+
+
+class Histograma:
+    """Histograma acumulativo con límites fijos, seguro entre hilos"""
+
+    def __init__(self, limites):
+        self.limites = list(limites)
+        self._conteos = [0] * (len(self.limites) + 1)
+        self._total = 0
+        self._suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        posicion = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self._conteos[posicion] += 1
+            self._total += 1
+            self._suma += valor
+
+    def exportar(self):
+        with self._lock:
+            conteos = list(self._conteos)
+            total = self._total
+            suma = self._suma
+        return {
+            'limites': self.limites + ['+Inf'],
+            'conteos': conteos,
+            'total': total,
+            'suma': round(suma, 6),
+            'promedio': round(suma / total, 6) if total else None,
+        }
+
+
+class Metricas:
+    """Registro de fuentes de métricas que se exponen en /api/metricas"""
+    _fuentes = {}
+
+    @classmethod
+    def registrar(cls, nombre, fuente):
+        """fuente es una función sin argumentos que devuelve un diccionario serializable"""
+        cls._fuentes[nombre] = fuente
+
+    @classmethod
+    def exportar(cls):
+        return {nombre: fuente() for nombre, fuente in list(cls._fuentes.items())}
@@ -0,0 +1,565 @@
+"""Migraciones versionadas del esquema de la base de datos.
+
+Cada migración tiene un número de versión y su SQL por dialecto ('postgres' y
+'sqlite'); las versiones aplicadas se registran en la tabla esquema_migraciones.
+Todas las sentencias son idempotentes (IF NOT EXISTS), así que también pueden
+aplicarse sobre una base creada a mano con el antiguo script_DEC.sql. Un paso
+puede ser también una función que recibe el cursor (cambios que dependen de los
+datos, como el particionado de la migración 5).
+
+Uso (desde backend/):
+    python -m modelo.migraciones [aplicar|estado] [--sqlite ruta.db]
+    python -m modelo.migraciones verificar [pacientes] [diagnosticos_por_paciente] [--sqlite]
+    python -m modelo.migraciones reconstruir-resumen|verificar-resumen [--sqlite ruta.db]
+"""
+import os
+import sys
+from modelo.almacenamiento import dialecto, conexion_sqlite, sqlite_en_memoria
+from modelo.particiones import particionar_diagnosticos
+
+# Índices que necesitan las consultas calientes de los modelos:
+#  - usuario_id: obtener_ultimo_diagnostico, obtener_historial_diagnosticos, obtener_pacientes
+#  - (datos_id, fecha_diagnostico): join datos -> resultados ordenado por fecha
+#  - fecha_diagnostico: listados globales por fecha
+#  - username único: login y todos los endpoints /<username>
+#  - (tipo, nombre): listado de pacientes ordenado por nombre
+_INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_diagnostico_datos_usuario ON diagnostico_datos (usuario_id)",
+    "CREATE INDEX IF NOT EXISTS idx_diagnostico_resultados_datos_fecha ON diagnostico_resultados (datos_id, fecha_diagnostico)",
+    "CREATE INDEX IF NOT EXISTS idx_diagnostico_resultados_fecha ON diagnostico_resultados (fecha_diagnostico)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS usuarios_username_key ON usuarios (username)",
+    "CREATE INDEX IF NOT EXISTS idx_usuarios_tipo_nombre ON usuarios (tipo, nombre)",
+]
+
+# Resumen de cada paciente calculado a partir del historial (versión de la
+# migración 3, anterior al archivo de meses antiguos)
+_SQL_RESUMEN_HISTORIAL = """
+    SELECT usuario_id, total, ultimo, riesgo, confianza
+    FROM (
+        SELECT
+            d.usuario_id,
+            COUNT(*) OVER (PARTITION BY d.usuario_id) AS total,
+            r.fecha_diagnostico AS ultimo,
+            r.riesgo,
+            r.confianza,
+            ROW_NUMBER() OVER (
+                PARTITION BY d.usuario_id ORDER BY r.fecha_diagnostico DESC, r.id DESC
+            ) AS orden
+        FROM diagnostico_resultados r
+        JOIN diagnostico_datos d ON r.datos_id = d.id
+    ) historial
+    WHERE orden = 1
+"""
+# Resumen esperado con el historial vivo más los meses archivados
+# (SQL común a PostgreSQL y SQLite: funciones de ventana)
+SQL_RESUMEN_ESPERADO = """
+    SELECT usuario_id, total, ultimo, riesgo, confianza
+    FROM (
+        SELECT
+            usuario_id,
+            SUM(total) OVER (PARTITION BY usuario_id) AS total,
+            ultimo,
+            riesgo,
+            confianza,
+            ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY ultimo DESC, ultimo_id DESC) AS orden
+        FROM (
+            SELECT d.usuario_id, 1 AS total, r.fecha_diagnostico AS ultimo, r.riesgo, r.confianza, r.id AS ultimo_id
+            FROM diagnostico_resultados r
+            JOIN diagnostico_datos d ON r.datos_id = d.id
+            UNION ALL
+            SELECT usuario_id, total, ultimo_diagnostico, ultimo_riesgo, ultima_confianza, ultimo_id
+            FROM diagnostico_archivo_resumen
+        ) fuentes
+    ) historial
+    WHERE orden = 1
+"""
+_INSERTAR_RESUMEN = """
+    INSERT INTO paciente_resumen (usuario_id, total_diagnosticos, ultimo_diagnostico, ultimo_riesgo, ultima_confianza)
+"""
+SQL_RECONSTRUIR_RESUMEN = _INSERTAR_RESUMEN + SQL_RESUMEN_ESPERADO
+
+# Catálogo de los meses archivados (modelo/particiones.py) y su resumen por paciente
+_ARCHIVO = [
+    """
+    CREATE TABLE IF NOT EXISTS diagnostico_archivo (
+        mes DATE PRIMARY KEY,
+        archivo VARCHAR(200) NOT NULL,
+        filas INTEGER NOT NULL,
+        fecha_archivado TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS diagnostico_archivo_resumen (
+        usuario_id INTEGER NOT NULL,
+        mes DATE NOT NULL,
+        total INTEGER NOT NULL,
+        ultimo_diagnostico TIMESTAMP,
+        ultimo_riesgo INTEGER,
+        ultima_confianza REAL,
+        ultimo_id INTEGER,
+        PRIMARY KEY (usuario_id, mes)
+    )
+    """,
+]
+
+_RESUMEN = {
+    'postgres': """
+        CREATE TABLE IF NOT EXISTS paciente_resumen (
+            usuario_id INTEGER PRIMARY KEY REFERENCES usuarios(id) ON DELETE CASCADE,
+            total_diagnosticos INTEGER NOT NULL DEFAULT 0,
+            ultimo_diagnostico TIMESTAMP,
+            ultimo_riesgo INTEGER,
+            ultima_confianza REAL
+        )
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS paciente_resumen (
+            usuario_id INTEGER PRIMARY KEY,
+            total_diagnosticos INTEGER NOT NULL DEFAULT 0,
+            ultimo_diagnostico TIMESTAMP,
+            ultimo_riesgo INTEGER,
+            ultima_confianza REAL,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+        )
+    """,
+}
+
+MIGRACIONES = [
+    (1, 'Esquema base', {
+        'postgres': [
+            """
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id SERIAL PRIMARY KEY,
+                username VARCHAR(50) NOT NULL,
+                password VARCHAR(100) NOT NULL,
+                tipo VARCHAR(20) NOT NULL,
+                nombre VARCHAR(100),
+                apellido VARCHAR(100),
+                fecha_nacimiento DATE,
+                genero VARCHAR(20),
+                telefono VARCHAR(20),
+                direccion TEXT,
+                dni VARCHAR(20),
+                fecha_registro TIMESTAMP DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS diagnostico_datos (
+                id SERIAL PRIMARY KEY,
+                usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                edad INTEGER NOT NULL,
+                genero VARCHAR(10) NOT NULL,
+                ps INTEGER NOT NULL,
+                pd INTEGER NOT NULL,
+                colesterol REAL NOT NULL,
+                glucosa REAL NOT NULL,
+                fuma VARCHAR(1) NOT NULL,
+                alcohol VARCHAR(1) NOT NULL,
+                actividad VARCHAR(20) NOT NULL,
+                peso REAL NOT NULL,
+                estatura REAL NOT NULL,
+                imc REAL NOT NULL,
+                fecha_ingreso TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS diagnostico_resultados (
+                id SERIAL PRIMARY KEY,
+                datos_id INTEGER NOT NULL REFERENCES diagnostico_datos(id) ON DELETE CASCADE,
+                riesgo INTEGER NOT NULL,
+                confianza REAL NOT NULL,
+                notas TEXT,
+                fecha_diagnostico TIMESTAMP
+            )
+            """,
+        ],
+        'sqlite': [
+            """
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username VARCHAR(50) NOT NULL,
+                password VARCHAR(100) NOT NULL,
+                tipo VARCHAR(20) NOT NULL,
+                nombre VARCHAR(100),
+                apellido VARCHAR(100),
+                fecha_nacimiento DATE,
+                genero VARCHAR(20),
+                telefono VARCHAR(20),
+                direccion TEXT,
+                dni VARCHAR(20),
+                fecha_registro TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS diagnostico_datos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                usuario_id INTEGER NOT NULL,
+                edad INTEGER NOT NULL,
+                genero VARCHAR(10) NOT NULL,
+                ps INTEGER NOT NULL,
+                pd INTEGER NOT NULL,
+                colesterol REAL NOT NULL,
+                glucosa REAL NOT NULL,
+                fuma VARCHAR(1) NOT NULL,
+                alcohol VARCHAR(1) NOT NULL,
+                actividad VARCHAR(20) NOT NULL,
+                peso REAL NOT NULL,
+                estatura REAL NOT NULL,
+                imc REAL NOT NULL,
+                fecha_ingreso TIMESTAMP,
+                FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS diagnostico_resultados (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                datos_id INTEGER NOT NULL,
+                riesgo INTEGER NOT NULL,
+                confianza REAL NOT NULL,
+                notas TEXT,
+                fecha_diagnostico TIMESTAMP,
+                FOREIGN KEY (datos_id) REFERENCES diagnostico_datos(id) ON DELETE CASCADE
+            )
+            """,
+        ],
+    }),
+    (2, 'Índices de las consultas calientes', {
+        'postgres': _INDICES,
+        'sqlite': _INDICES,
+    }),
+    (3, 'Resumen por paciente para el panel de administración', {
+        'postgres': [_RESUMEN['postgres'], "DELETE FROM paciente_resumen", _INSERTAR_RESUMEN + _SQL_RESUMEN_HISTORIAL],
+        'sqlite': [_RESUMEN['sqlite'], "DELETE FROM paciente_resumen", _INSERTAR_RESUMEN + _SQL_RESUMEN_HISTORIAL],
+    }),
+    (4, 'Índice para la paginación de pacientes por (nombre, id)', {
+        'postgres': ["CREATE INDEX IF NOT EXISTS idx_usuarios_tipo_nombre_id ON usuarios (tipo, (COALESCE(nombre, '')), id)"],
+        'sqlite': ["CREATE INDEX IF NOT EXISTS idx_usuarios_tipo_nombre_id ON usuarios (tipo, COALESCE(nombre, ''), id)"],
+    }),
+    # SQLite no tiene particiones: solo se crean las tablas del archivo (vacías)
+    (5, 'Particiones mensuales de los diagnósticos y archivo de meses antiguos', {
+        'postgres': _ARCHIVO + [particionar_diagnosticos],
+        'sqlite': _ARCHIVO,
+    }),
+    # Un hash scrypt de werkzeug ocupa unos 160 caracteres; SQLite no limita VARCHAR
+    (6, 'Contraseñas con hash', {
+        'postgres': ["ALTER TABLE usuarios ALTER COLUMN password TYPE VARCHAR(255)"],
+        'sqlite': [],
+    }),
+]
+
+
+# Consultas calientes de los modelos que deben resolverse con índices
+CONSULTAS_CALIENTES = [
+    ('obtener_ultimo_diagnostico', """
+        SELECT ultimo_riesgo, ultima_confianza, ultimo_diagnostico
+        FROM paciente_resumen
+        WHERE usuario_id = %s AND ultimo_diagnostico IS NOT NULL
+    """, ('usuario_id',)),
+    ('obtener_historial_diagnosticos', """
+        SELECT r.fecha_diagnostico, d.edad, d.imc, r.riesgo, r.confianza
+        FROM diagnostico_resultados r
+        JOIN diagnostico_datos d ON r.datos_id = d.id
+        WHERE d.usuario_id = %s
+        ORDER BY r.fecha_diagnostico DESC, r.id DESC
+    """, ('usuario_id',)),
+    ('obtener_historial_pagina', """
+        SELECT r.fecha_diagnostico, d.edad, d.imc, r.riesgo, r.confianza, r.id
+        FROM diagnostico_resultados r
+        JOIN diagnostico_datos d ON r.datos_id = d.id
+        WHERE d.usuario_id = %s AND (r.fecha_diagnostico, r.id) < (%s, %s)
+        ORDER BY r.fecha_diagnostico DESC, r.id DESC
+        LIMIT 50
+    """, ('usuario_id', 'fecha', 'resultado_id')),
+    ('obtener_pacientes_pagina', """
+        SELECT u.id, u.username, u.nombre, u.apellido, COALESCE(p.total_diagnosticos, 0), p.ultimo_diagnostico
+        FROM usuarios u
+        LEFT JOIN paciente_resumen p ON p.usuario_id = u.id
+        WHERE u.tipo = 'paciente' AND (COALESCE(u.nombre, ''), u.id) > (%s, %s)
+        ORDER BY COALESCE(u.nombre, ''), u.id
+        LIMIT 50
+    """, ('nombre', 'usuario_id')),
+    ('buscar_usuario_por_username', """
+        SELECT id, username, tipo FROM usuarios WHERE username = %s
+    """, ('username',)),
+    ('buscar_usuario', """
+        SELECT id, username, tipo, password FROM usuarios WHERE username = %s
+    """, ('username',)),
+]
+TABLAS_GRANDES = ('usuarios', 'diagnostico_datos', 'diagnostico_resultados')
+
+# Datos sintéticos para la verificación: pacientes x diagnósticos por paciente
+_SEMILLA = {
+    'postgres': [
+        """
+        INSERT INTO usuarios (username, password, tipo, nombre, apellido)
+        SELECT 'paciente' || g, 'clave' || g, 'paciente', 'Nombre' || g, 'Apellido' || g
+        FROM generate_series(1, %(pacientes)s) g
+        """,
+        """
+        INSERT INTO diagnostico_datos (
+            usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha_ingreso
+        )
+        SELECT u.id, 30 + g %% 50, 'Femenino', 110 + g %% 40, 70 + g %% 20, 180 + g %% 80, 90 + g %% 50,
+               'n', 'n', 'No realiza', 70, 170, 24.2, NOW() - g * INTERVAL '1 hour'
+        FROM usuarios u, generate_series(1, %(diagnosticos)s) g
+        """,
+        """
+        INSERT INTO diagnostico_resultados (datos_id, riesgo, confianza, fecha_diagnostico)
+        SELECT id, id %% 3, 0.9, fecha_ingreso FROM diagnostico_datos
+        """,
+        "ANALYZE",
+    ],
+    'sqlite': [
+        """
+        WITH RECURSIVE serie(g) AS (SELECT 1 UNION ALL SELECT g + 1 FROM serie WHERE g < :pacientes)
+        INSERT INTO usuarios (username, password, tipo, nombre, apellido)
+        SELECT 'paciente' || g, 'clave' || g, 'paciente', 'Nombre' || g, 'Apellido' || g FROM serie
+        """,
+        """
+        WITH RECURSIVE serie(g) AS (SELECT 1 UNION ALL SELECT g + 1 FROM serie WHERE g < :diagnosticos)
+        INSERT INTO diagnostico_datos (
+            usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha_ingreso
+        )
+        SELECT u.id, 30 + g % 50, 'Femenino', 110 + g % 40, 70 + g % 20, 180 + g % 80, 90 + g % 50,
+               'n', 'n', 'No realiza', 70, 170, 24.2, datetime('now', '-' || g || ' hours')
+        FROM usuarios u, serie
+        """,
+        """
+        INSERT INTO diagnostico_resultados (datos_id, riesgo, confianza, fecha_diagnostico)
+        SELECT id, id % 3, 0.9, fecha_ingreso FROM diagnostico_datos
+        """,
+        "ANALYZE",
+    ],
+}
+
+
+def _crear_tabla_control(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS esquema_migraciones (
+            version INTEGER PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            fecha_aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def versiones_aplicadas(conn):
+    cur = conn.cursor()
+    try:
+        _crear_tabla_control(cur)
+        cur.execute("SELECT version FROM esquema_migraciones")
+        versiones = {fila[0] for fila in cur.fetchall()}
+        conn.commit()
+        return versiones
+    finally:
+        cur.close()
+
+
+def aplicar_migraciones(conn, hasta=None):
+    """Aplica en orden las migraciones pendientes, cada una en su propia transacción.
+
+    Devuelve la lista de versiones aplicadas en esta llamada.
+    """
+    tipo = dialecto(conn)
+    aplicadas = []
+    for version, descripcion, sentencias in MIGRACIONES:
+        if hasta is not None and version > hasta:
+            break
+        cur = conn.cursor()
+        try:
+            if tipo == 'postgres':
+                # Serializa ejecuciones concurrentes (varios workers arrancando a la vez)
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('esquema_migraciones'))")
+            _crear_tabla_control(cur)
+            cur.execute("SELECT 1 FROM esquema_migraciones WHERE version = %s", (version,))
+            if cur.fetchone() is None:
+                for sentencia in sentencias[tipo]:
+                    if callable(sentencia):
+                        sentencia(cur)
+                    else:
+                        cur.execute(sentencia)
+                cur.execute(
+                    "INSERT INTO esquema_migraciones (version, descripcion) VALUES (%s, %s)",
+                    (version, descripcion)
+                )
+                aplicadas.append(version)
+                print(f"Migración {version} aplicada: {descripcion}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return aplicadas
+
+
+def reconstruir_resumen_pacientes(conn):
+    """Rehace paciente_resumen desde el historial; devuelve cuántos pacientes quedan resumidos"""
+    cur = conn.cursor()
+    try:
+        if dialecto(conn) == 'postgres':
+            # Los diagnósticos concurrentes esperan a que termine la reconstrucción
+            cur.execute("LOCK TABLE paciente_resumen IN EXCLUSIVE MODE")
+        cur.execute("DELETE FROM paciente_resumen")
+        cur.execute(SQL_RECONSTRUIR_RESUMEN)
+        pacientes = cur.rowcount
+        conn.commit()
+        return pacientes
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def diferencias_resumen_pacientes(conn):
+    """Pacientes cuyo resumen no coincide con el historial: [(usuario_id, guardado, esperado)]"""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            WITH esperado AS ({SQL_RESUMEN_ESPERADO})
+            SELECT
+                COALESCE(p.usuario_id, e.usuario_id),
+                p.total_diagnosticos, p.ultimo_diagnostico, p.ultimo_riesgo,
+                e.total, e.ultimo, e.riesgo
+            FROM paciente_resumen p
+            FULL OUTER JOIN esperado e ON e.usuario_id = p.usuario_id
+            WHERE p.usuario_id IS NULL OR e.usuario_id IS NULL
+               OR p.total_diagnosticos <> e.total
+               OR p.ultimo_diagnostico IS DISTINCT FROM e.ultimo
+               OR p.ultimo_riesgo IS DISTINCT FROM e.riesgo
+        """)
+        return [(fila[0], fila[1:4], fila[4:7]) for fila in cur.fetchall()]
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def _escaneos_completos_postgres(plan, vacias=()):
+    """Nodos Seq Scan sobre tablas grandes en un plan de EXPLAIN (FORMAT JSON)
+
+    vacias son las particiones sin filas (meses futuros, partición por defecto):
+    recorrerlas no cuesta nada.
+    """
+    escaneos = []
+    pendientes = [plan]
+    while pendientes:
+        nodo = pendientes.pop()
+        tabla = nodo.get('Relation Name', '')
+        # Con particiones el plan nombra cada partición (diagnostico_datos_p2025_01, ...)
+        if (nodo.get('Node Type') == 'Seq Scan' and tabla not in vacias
+                and any(tabla == grande or tabla.startswith(grande + '_') for grande in TABLAS_GRANDES)):
+            escaneos.append(f"Seq Scan on {tabla}")
+        pendientes.extend(nodo.get('Plans', []))
+    return escaneos
+
+
+def verificar_indices(conn, pacientes=2000, diagnosticos=50):
+    """Siembra datos de prueba aparte y comprueba con EXPLAIN que las consultas calientes usan índices.
+
+    La base de conn no se modifica: en PostgreSQL la semilla va a un esquema
+    temporal que se borra al terminar y en SQLite a una base en memoria propia
+    de la llamada. Devuelve {consulta: [escaneos completos]}; una lista vacía
+    significa que la consulta se resuelve solo con búsquedas por índice.
+    """
+    if dialecto(conn) == 'sqlite':
+        temporal = sqlite_en_memoria()
+        try:
+            return _verificar_indices(temporal, pacientes, diagnosticos)
+        finally:
+            temporal.cerrar()
+    return _verificar_indices(conn, pacientes, diagnosticos)
+
+
+def _verificar_indices(conn, pacientes, diagnosticos):
+    tipo = dialecto(conn)
+    cur = conn.cursor()
+    esquema = f"verificacion_indices_{os.getpid()}"
+    try:
+        if tipo == 'postgres':
+            cur.execute(f"CREATE SCHEMA {esquema}")
+            cur.execute(f"SET search_path TO {esquema}")
+            conn.commit()
+        aplicar_migraciones(conn)
+        for sentencia in _SEMILLA[tipo]:
+            cur.execute(sentencia, {'pacientes': pacientes, 'diagnosticos': diagnosticos})
+        conn.commit()
+
+        cur.execute("SELECT id, username, password, nombre FROM usuarios ORDER BY id LIMIT 1 OFFSET %d" % (pacientes // 2))
+        usuario_id, username, password, nombre = cur.fetchone()
+        cur.execute("SELECT MAX(fecha_diagnostico), MAX(id) FROM diagnostico_resultados")
+        fecha, resultado_id = cur.fetchone()
+        valores = {
+            'usuario_id': usuario_id, 'username': username, 'password': password, 'nombre': nombre,
+            'fecha': fecha, 'resultado_id': resultado_id,
+        }
+
+        vacias = set()
+        if tipo == 'postgres':
+            cur.execute("""
+                SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE c.relnamespace = %s::regnamespace AND c.reltuples = 0
+            """, (esquema,))
+            vacias = {fila[0] for fila in cur.fetchall()}
+
+        resultado = {}
+        for nombre, consulta, claves in CONSULTAS_CALIENTES:
+            parametros = tuple(valores[clave] for clave in claves)
+            if tipo == 'postgres':
+                cur.execute("EXPLAIN (FORMAT JSON) " + consulta, parametros)
+                resultado[nombre] = _escaneos_completos_postgres(cur.fetchone()[0][0]['Plan'], vacias)
+            else:
+                cur.execute("EXPLAIN QUERY PLAN " + consulta, parametros)
+                resultado[nombre] = [fila[3] for fila in cur.fetchall() if fila[3].startswith('SCAN ')]
+        return resultado
+    finally:
+        conn.rollback()
+        if tipo == 'postgres':
+            cur.execute(f"DROP SCHEMA IF EXISTS {esquema} CASCADE")
+            cur.execute("RESET search_path")
+            conn.commit()
+        cur.close()
+
+
+def _conectar(argumentos):
+    if '--sqlite' in argumentos:
+        posicion = argumentos.index('--sqlite')
+        ruta = argumentos[posicion + 1] if posicion + 1 < len(argumentos) else ':memory:'
+        del argumentos[posicion:posicion + 2]
+        return conexion_sqlite(ruta)
+    from modelo.modelo import abrir_conexion_bd
+    return abrir_conexion_bd()
+
+
+if __name__ == '__main__':
+    argumentos = sys.argv[1:]
+    conn = _conectar(argumentos)
+    orden = argumentos[0] if argumentos else 'aplicar'
+    try:
+        if orden == 'aplicar':
+            aplicadas = aplicar_migraciones(conn)
+            print(f"Esquema al día ({len(aplicadas)} migraciones aplicadas)")
+        elif orden == 'estado':
+            aplicadas = versiones_aplicadas(conn)
+            for version, descripcion, _ in MIGRACIONES:
+                print(f"{version:4d} {'aplicada ' if version in aplicadas else 'pendiente'} {descripcion}")
+        elif orden == 'verificar':
+            pacientes = int(argumentos[1]) if len(argumentos) > 1 else 2000
+            diagnosticos = int(argumentos[2]) if len(argumentos) > 2 else 50
+            resultado = verificar_indices(conn, pacientes, diagnosticos)
+            for nombre, escaneos in resultado.items():
+                print(f"{'OK   ' if not escaneos else 'FALLA'} {nombre}: {', '.join(escaneos) or 'solo índices'}")
+            sys.exit(0 if not any(resultado.values()) else 1)
+        elif orden == 'reconstruir-resumen':
+            print(f"Resumen reconstruido para {reconstruir_resumen_pacientes(conn)} pacientes")
+        elif orden == 'verificar-resumen':
+            diferencias = diferencias_resumen_pacientes(conn)
+            for usuario_id, guardado, esperado in diferencias:
+                print(f"Paciente {usuario_id}: resumen {guardado}, historial {esperado}")
+            print(f"{len(diferencias)} pacientes con el resumen desactualizado")
+            sys.exit(0 if not diferencias else 1)
+        else:
+            print(__doc__)
+            sys.exit(2)
+    finally:
+        conn.close()
@@ -1,34 +1,40 @@
-import numpy as np
-import tensorflow as tf
-import psycopg2
-import os
-from config import get_db_config
-from config import get_db_config
-
-def cargar_interprete():
-    interprete = tf.lite.Interpreter(model_path="modeloDEC.tflite")
-    interprete.allocate_tensors()
-    return interprete
-
-interprete = cargar_interprete()
-detalles_entrada = interprete.get_input_details()
-detalles_salida = interprete.get_output_details()
-
-def predecir_con_tflite(datos_entrada):
-    datos_entrada = datos_entrada.astype(np.float32)
-    interprete.set_tensor(detalles_entrada[0]['index'], datos_entrada)
-    interprete.invoke()
-    datos_salida = interprete.get_tensor(detalles_salida[0]['index'])
-    return datos_salida[0]
-
-# Modelo para conexión a base de datos
-def obtener_conexion_bd():
-    # Usar configuración centralizada de config.py
-    db_config = get_db_config()
-    return psycopg2.connect(
-        host=db_config['host'],
-        database=db_config['database'],
-        user=db_config['user'],
-        password=db_config['password'],
-        port=db_config.get('port', 5432)
+import os
+from config import get_db_config
+from config import get_db_config
+from config import POOL_CONEXIONES_ACTIVO, BD_MOTOR
+from modelo.registro_modelos import RegistroModelos
+from modelo.unidad_trabajo import conexion_de_peticion
+from modelo.plazos import timeout_conexion
+
+def predecir_con_tflite(datos_entrada):
+    return RegistroModelos.obtener('diagnostico').predecir(datos_entrada)
+
+# Modelo para conexión a base de datos
+def obtener_conexion_bd():
+    # Dentro de una petición HTTP todos los modelos comparten la conexión de la
+    # unidad de trabajo; commit y close se resuelven al terminar la petición
+    conn = conexion_de_peticion(abrir_conexion_bd)
+    if conn is not None:
+        return conn
+    return abrir_conexion_bd()
+
+def abrir_conexion_bd():
+    # SQLite: conexión propia de cada hilo, sin red ni pool
+    if BD_MOTOR == 'sqlite':
+        from modelo.almacenamiento import conexion_sqlite
+        return conexion_sqlite()
+    # Con el pool activo, close() devuelve la conexión al pool en vez de cerrarla
+    if POOL_CONEXIONES_ACTIVO:
+        from modelo.pool_conexiones import PoolConexiones
+        return PoolConexiones.global_().tomar()
+    # Usar configuración centralizada de config.py
+    import psycopg2
+    db_config = get_db_config()
+    return psycopg2.connect(
+        host=db_config['host'],
+        database=db_config['database'],
+        user=db_config['user'],
+        password=db_config['password'],
+        port=db_config.get('port', 5432),
+        connect_timeout=timeout_conexion()
     )
\ No newline at end of file
@@ -1,70 +1,240 @@
-import psycopg2
-from modelo.modelo import obtener_conexion_bd
-
-class ModeloAdmin:
-    @staticmethod
-    def obtener_pacientes(filtro=''):
-        """Obtiene lista de pacientes con filtro opcional"""
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        
-        consulta = """
-            SELECT 
-                u.id, 
-                u.username, 
-                u.nombre, 
-                u.apellido,
-                COUNT(r.id) as total_diagnosticos,
-                TO_CHAR(MAX(r.fecha_diagnostico), 'YYYY-MM-DD HH24:MI:SS') as ultimo_diagnostico
-            FROM usuarios u
-            LEFT JOIN diagnostico_datos d ON d.usuario_id = u.id
-            LEFT JOIN diagnostico_resultados r ON r.datos_id = d.id
-            WHERE u.tipo = 'paciente'
-        """
-        params = []
-        
-        if filtro:
-            consulta += """
-                AND (
-                    LOWER(u.username) LIKE %s OR
-                    LOWER(u.nombre) LIKE %s OR
-                    LOWER(u.apellido) LIKE %s
-                )
-            """
-            params = [f"%{filtro}%"] * 3
-        
-        consulta += " GROUP BY u.id, u.username, u.nombre, u.apellido ORDER BY u.nombre"
-        
-        cur.execute(consulta, params)
-        pacientes = cur.fetchall()
-        cur.close()
-        conn.close()
-        
-        return pacientes
-    
-    @staticmethod
-    def obtener_historial_diagnosticos(usuario_id):
-        """Obtiene todos los diagnósticos con datos completos para un paciente"""
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-
-        try:
-            cur.execute("""
-                SELECT 
-                    r.fecha_diagnostico, d.edad, d.genero, d.ps, d.pd,
-                    d.colesterol, d.glucosa, d.fuma, d.alcohol, d.actividad,
-                    d.peso, d.estatura, d.imc, r.riesgo, r.confianza
-                FROM diagnostico_resultados r
-                JOIN diagnostico_datos d ON r.datos_id = d.id
-                WHERE d.usuario_id = %s
-                ORDER BY r.fecha_diagnostico DESC
-            """, (usuario_id,))
-            
-            columnas = [desc[0] for desc in cur.description]
-            resultados = cur.fetchall()
-
-            historial = [dict(zip(columnas, fila)) for fila in resultados]
-            return historial
-        finally:
-            cur.close()
-            conn.close()
\ No newline at end of file
+from modelo.modelo import obtener_conexion_bd
+from modelo.particiones import SQL_ARCHIVOS_USUARIO, leer_historial
+from config import EXPORTACION_BLOQUE
+
+# Columnas de la exportación de historiales, en el orden de cada fila
+COLUMNAS_EXPORTACION = (
+    'usuario_id', 'username', 'diagnostico_id', 'fecha_diagnostico', 'edad', 'genero', 'ps', 'pd',
+    'colesterol', 'glucosa', 'fuma', 'alcohol', 'actividad', 'peso', 'estatura', 'imc', 'riesgo', 'confianza'
+)
+
+def _condicion_filtro(filtro):
+    """Condición SQL y parámetros del filtro de texto sobre username, nombre y apellido"""
+    if not filtro:
+        return "", []
+    condicion = """
+        AND (
+            LOWER(u.username) LIKE %s OR
+            LOWER(u.nombre) LIKE %s OR
+            LOWER(u.apellido) LIKE %s
+        )
+    """
+    return condicion, [f"%{filtro}%"] * 3
+
+SQL_PACIENTES = """
+    SELECT 
+        u.id, 
+        u.username, 
+        u.nombre, 
+        u.apellido,
+        COALESCE(p.total_diagnosticos, 0) as total_diagnosticos,
+        TO_CHAR(p.ultimo_diagnostico, 'YYYY-MM-DD HH24:MI:SS') as ultimo_diagnostico
+    FROM usuarios u
+    LEFT JOIN paciente_resumen p ON p.usuario_id = u.id
+    WHERE u.tipo = 'paciente'
+"""
+
+SQL_HISTORIAL = """
+    SELECT 
+        r.fecha_diagnostico, d.edad, d.genero, d.ps, d.pd,
+        d.colesterol, d.glucosa, d.fuma, d.alcohol, d.actividad,
+        d.peso, d.estatura, d.imc, r.riesgo, r.confianza, r.id
+    FROM diagnostico_resultados r
+    JOIN diagnostico_datos d ON r.datos_id = d.id
+    WHERE d.usuario_id = %s
+"""
+
+SQL_TOTAL_DIAGNOSTICOS = "SELECT total_diagnosticos FROM paciente_resumen WHERE usuario_id = %s"
+# Total sin los meses archivados (el resumen los sigue contando)
+SQL_TOTAL_DIAGNOSTICOS_VIVOS = """
+    SELECT p.total_diagnosticos - COALESCE(
+        (SELECT SUM(a.total) FROM diagnostico_archivo_resumen a WHERE a.usuario_id = p.usuario_id), 0)
+    FROM paciente_resumen p
+    WHERE p.usuario_id = %s
+"""
+
+def consulta_pacientes(filtro=''):
+    condicion, params = _condicion_filtro(filtro)
+    return SQL_PACIENTES + condicion + " ORDER BY u.nombre", params
+
+def consulta_pacientes_pagina(filtro, limite, despues_de):
+    """Consulta de una página de pacientes por (nombre, id); pide una fila de más para saber si hay otra"""
+    condicion, params = _condicion_filtro(filtro)
+    consulta = SQL_PACIENTES + condicion
+    if despues_de is not None:
+        # Los nombres NULL se ordenan como '' para que la clave sea comparable
+        consulta += " AND (COALESCE(u.nombre, ''), u.id) > (%s, %s)"
+        params += list(despues_de)
+    consulta += " ORDER BY COALESCE(u.nombre, ''), u.id LIMIT %s"
+    return consulta, params + [limite + 1]
+
+def pagina_pacientes(pacientes, limite):
+    """(pacientes, clave de la última fila o None si no hay más páginas)"""
+    if len(pacientes) <= limite:
+        return pacientes, None
+    pacientes = pacientes[:limite]
+    return pacientes, (pacientes[-1][2] or '', pacientes[-1][0])
+
+def consulta_contar_pacientes(filtro=''):
+    condicion, params = _condicion_filtro(filtro)
+    return "SELECT COUNT(*) FROM usuarios u WHERE u.tipo = 'paciente'" + condicion, params
+
+def consulta_historial_pagina(usuario_id, limite, antes_de):
+    """Consulta de una página del historial por (fecha_diagnostico, id) descendente"""
+    consulta = SQL_HISTORIAL
+    params = [usuario_id]
+    if antes_de is not None:
+        consulta += " AND (r.fecha_diagnostico, r.id) < (%s, %s)"
+        params += list(antes_de)
+    consulta += " ORDER BY r.fecha_diagnostico DESC, r.id DESC LIMIT %s"
+    return consulta, params + [limite + 1]
+
+def consulta_total_diagnosticos(usuario_id, incluir_archivo=False):
+    return (SQL_TOTAL_DIAGNOSTICOS if incluir_archivo else SQL_TOTAL_DIAGNOSTICOS_VIVOS), (usuario_id,)
+
+def completar_con_archivo(filas, archivos, usuario_id, limite=None, antes_de=None):
+    """Añade a las filas vivas de SQL_HISTORIAL las archivadas, que siempre son más antiguas.
+
+    Con limite solo se leen los archivos si la página de limite+1 filas no está completa.
+    """
+    if limite is None:
+        return list(filas) + leer_historial(archivos, usuario_id)
+    if len(filas) > limite:
+        return filas
+    return list(filas) + leer_historial(archivos, usuario_id, limite + 1 - len(filas), antes_de)
+
+def historial_con_columnas(columnas, filas):
+    """Filas de SQL_HISTORIAL como diccionarios, sin la columna r.id final"""
+    return [dict(zip(columnas[:-1], fila[:-1])) for fila in filas]
+
+def pagina_historial(columnas, filas, limite):
+    """(historial, clave de la última fila o None si no hay más páginas)"""
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = (filas[-1][0], filas[-1][-1])
+    return historial_con_columnas(columnas, filas), siguiente
+
+class ModeloAdmin:
+    @staticmethod
+    def obtener_pacientes(filtro=''):
+        """Obtiene lista de pacientes con filtro opcional (totales leídos de paciente_resumen)"""
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        
+        cur.execute(*consulta_pacientes(filtro))
+        pacientes = cur.fetchall()
+        cur.close()
+        conn.close()
+        
+        return pacientes
+    
+    @staticmethod
+    def obtener_historial_diagnosticos(usuario_id, incluir_archivo=False):
+        """Obtiene todos los diagnósticos con datos completos para un paciente (y los archivados con incluir_archivo)"""
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+
+        try:
+            cur.execute(SQL_HISTORIAL + " ORDER BY r.fecha_diagnostico DESC, r.id DESC", (usuario_id,))
+            
+            columnas = [desc[0] for desc in cur.description]
+            filas = cur.fetchall()
+            if incluir_archivo:
+                cur.execute(SQL_ARCHIVOS_USUARIO, (usuario_id,))
+                filas = completar_con_archivo(filas, [fila[0] for fila in cur.fetchall()], usuario_id)
+            return historial_con_columnas(columnas, filas)
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def obtener_pacientes_pagina(filtro='', limite=50, despues_de=None):
+        """Página de pacientes ordenada por (nombre, id) a partir del cursor despues_de=(nombre, id).
+
+        Devuelve (pacientes, clave de la última fila o None si no hay más páginas).
+        """
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            cur.execute(*consulta_pacientes_pagina(filtro, limite, despues_de))
+            return pagina_pacientes(cur.fetchall(), limite)
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def contar_pacientes(filtro=''):
+        """Número de pacientes que cumplen el filtro (recorre usuarios, no el historial)"""
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            cur.execute(*consulta_contar_pacientes(filtro))
+            return cur.fetchone()[0]
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def obtener_historial_pagina(usuario_id, limite=50, antes_de=None, incluir_archivo=False):
+        """Página del historial ordenada por (fecha_diagnostico, id) descendente a partir de antes_de.
+
+        Con incluir_archivo la paginación continúa por los meses archivados.
+        Devuelve (historial, clave de la última fila o None, total de diagnósticos del paciente).
+        """
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            cur.execute(*consulta_historial_pagina(usuario_id, limite, antes_de))
+            columnas = [desc[0] for desc in cur.description]
+            filas = cur.fetchall()
+            if incluir_archivo and len(filas) <= limite:
+                cur.execute(SQL_ARCHIVOS_USUARIO, (usuario_id,))
+                archivos = [fila[0] for fila in cur.fetchall()]
+                filas = completar_con_archivo(filas, archivos, usuario_id, limite, antes_de)
+            historial, siguiente = pagina_historial(columnas, filas, limite)
+
+            # El total sale del resumen: no depende del tamaño del historial
+            cur.execute(*consulta_total_diagnosticos(usuario_id, incluir_archivo))
+            total = cur.fetchone()
+            return historial, siguiente, total[0] if total else 0
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def exportar_diagnosticos(usuario_id=None, filtro='', bloque=EXPORTACION_BLOQUE):
+        """Genera el historial en bloques de filas (COLUMNAS_EXPORTACION) desde un cursor del servidor.
+
+        Sin usuario_id exporta todos los pacientes que cumplen el filtro; la
+        memoria usada no depende del número de filas exportadas.
+        """
+        conn = obtener_conexion_bd()
+        # Cursor con nombre: PostgreSQL guarda el resultado y se lee por bloques
+        cur = conn.cursor(name='exportacion_diagnosticos')
+        try:
+            consulta = """
+                SELECT
+                    u.id, u.username, r.id, r.fecha_diagnostico, d.edad, d.genero, d.ps, d.pd,
+                    d.colesterol, d.glucosa, d.fuma, d.alcohol, d.actividad,
+                    d.peso, d.estatura, d.imc, r.riesgo, r.confianza
+                FROM diagnostico_resultados r
+                JOIN diagnostico_datos d ON r.datos_id = d.id
+                JOIN usuarios u ON u.id = d.usuario_id
+                WHERE u.tipo = 'paciente'
+            """
+            params = []
+            if usuario_id is not None:
+                consulta += " AND d.usuario_id = %s"
+                params.append(usuario_id)
+            condicion, params_filtro = _condicion_filtro(filtro)
+            consulta += condicion + " ORDER BY d.usuario_id, r.fecha_diagnostico DESC, r.id DESC"
+            cur.execute(consulta, params + params_filtro)
+            while True:
+                filas = cur.fetchmany(bloque)
+                if not filas:
+                    break
+                yield filas
+        finally:
+            cur.close()
+            conn.close()
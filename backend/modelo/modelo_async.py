@@ -0,0 +1,73 @@
+import asyncio
+from modelo.pool_async import PoolAsync
+from modelo.cola_persistencia import ColaPersistencia
+from modelo.modelo_resultados import SQL_ULTIMO_DIAGNOSTICO
+from modelo.modelo_autenticacion import SQL_INFO_SESION
+from modelo.modelo_configuracion import SQL_DATOS_USUARIO, CAMPOS_DATOS_USUARIO
+from modelo.modelo_admin import (
+    SQL_HISTORIAL, consulta_pacientes, consulta_pacientes_pagina, pagina_pacientes, consulta_contar_pacientes,
+    consulta_historial_pagina, consulta_total_diagnosticos, completar_con_archivo, historial_con_columnas,
+    pagina_historial
+)
+from modelo.particiones import SQL_ARCHIVOS_USUARIO
+from config import PERSISTENCIA_DIFERIDA
+
+class ModeloAsync:
+    """Lecturas de los Modelo* para las vistas async: mismo SQL y mismos resultados, con PoolAsync"""
+
+    @staticmethod
+    async def obtener_ultimo_diagnostico(usuario_id):
+        if PERSISTENCIA_DIFERIDA:
+            pendiente = ColaPersistencia.global_().ultimo(usuario_id)
+            if pendiente is not None:
+                return pendiente
+        return await PoolAsync.consultar_uno(SQL_ULTIMO_DIAGNOSTICO, (usuario_id,))
+
+    @staticmethod
+    async def obtener_info_sesion(usuario_id):
+        return await PoolAsync.consultar_uno(SQL_INFO_SESION, (usuario_id,))
+
+    @staticmethod
+    async def obtener_datos_usuario(usuario_id):
+        resultado = await PoolAsync.consultar_uno(SQL_DATOS_USUARIO, (usuario_id,))
+        if not resultado:
+            return None
+        return dict(zip(CAMPOS_DATOS_USUARIO, resultado))
+
+    @staticmethod
+    async def obtener_pacientes(filtro=''):
+        _, pacientes = await PoolAsync.consultar(*consulta_pacientes(filtro))
+        return pacientes
+
+    @staticmethod
+    async def obtener_pacientes_pagina(filtro='', limite=50, despues_de=None):
+        _, pacientes = await PoolAsync.consultar(*consulta_pacientes_pagina(filtro, limite, despues_de))
+        return pagina_pacientes(pacientes, limite)
+
+    @staticmethod
+    async def contar_pacientes(filtro=''):
+        return (await PoolAsync.consultar_uno(*consulta_contar_pacientes(filtro)))[0]
+
+    @staticmethod
+    async def obtener_historial_diagnosticos(usuario_id, incluir_archivo=False):
+        columnas, filas = await PoolAsync.consultar(SQL_HISTORIAL + " ORDER BY r.fecha_diagnostico DESC, r.id DESC", (usuario_id,))
+        if incluir_archivo:
+            filas = await ModeloAsync._completar_con_archivo(filas, usuario_id)
+        return historial_con_columnas(columnas, filas)
+
+    @staticmethod
+    async def obtener_historial_pagina(usuario_id, limite=50, antes_de=None, incluir_archivo=False):
+        columnas, filas = await PoolAsync.consultar(*consulta_historial_pagina(usuario_id, limite, antes_de))
+        if incluir_archivo and len(filas) <= limite:
+            filas = await ModeloAsync._completar_con_archivo(filas, usuario_id, limite, antes_de)
+        historial, siguiente = pagina_historial(columnas, filas, limite)
+        total = await PoolAsync.consultar_uno(*consulta_total_diagnosticos(usuario_id, incluir_archivo))
+        return historial, siguiente, total[0] if total else 0
+
+    @staticmethod
+    async def _completar_con_archivo(filas, usuario_id, limite=None, antes_de=None):
+        # La lectura de los CSV comprimidos va a un hilo: no bloquea el bucle de eventos
+        _, archivos = await PoolAsync.consultar(SQL_ARCHIVOS_USUARIO, (usuario_id,))
+        return await asyncio.to_thread(
+            completar_con_archivo, filas, [fila[0] for fila in archivos], usuario_id, limite, antes_de
+        )
@@ -1,37 +1,27 @@
-import psycopg2
-from modelo.modelo import obtener_conexion_bd
-
-class ModeloAutenticacion:
-    @staticmethod
-    def verificar_credenciales(username, password):
-        """Verifica las credenciales del usuario"""
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        
-        try:
-            cur.execute("""
-                SELECT id, username, tipo 
-                FROM usuarios 
-                WHERE username = %s AND password = %s
-            """, (username, password))
-            return cur.fetchone()
-        finally:
-            cur.close()
-            conn.close()
-
-    @staticmethod
-    def obtener_info_sesion(usuario_id):
-        """Obtiene información básica del usuario para la sesión"""
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        
-        try:
-            cur.execute("""
-                SELECT id, username, tipo 
-                FROM usuarios 
-                WHERE id = %s
-            """, (usuario_id,))
-            return cur.fetchone()
-        finally:
-            cur.close()
+from modelo.modelo import obtener_conexion_bd
+from modelo.modelo_usuario import ModeloUsuario
+
+SQL_INFO_SESION = """
+    SELECT id, username, tipo 
+    FROM usuarios 
+    WHERE id = %s
+"""
+
+class ModeloAutenticacion:
+    @staticmethod
+    def verificar_credenciales(username, password):
+        """Verifica las credenciales del usuario (hash y rehash en ModeloUsuario.buscar_usuario)"""
+        return ModeloUsuario.buscar_usuario(username, password)
+
+    @staticmethod
+    def obtener_info_sesion(usuario_id):
+        """Obtiene información básica del usuario para la sesión"""
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        
+        try:
+            cur.execute(SQL_INFO_SESION, (usuario_id,))
+            return cur.fetchone()
+        finally:
+            cur.close()
             conn.close()
\ No newline at end of file
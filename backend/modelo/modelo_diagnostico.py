@@ -1,16 +1,61 @@
-import numpy as np
-import tensorflow as tf
-
-class ModeloDiagnostico:
-    def __init__(self):
-        self.interprete = tf.lite.Interpreter(model_path="modeloDEC.tflite")
-        self.interprete.allocate_tensors()
-        self.detalles_entrada = self.interprete.get_input_details()
-        self.detalles_salida = self.interprete.get_output_details()
-
-    def predecir(self, datos_entrada):
-        datos_entrada = datos_entrada.astype(np.float32)
-        self.interprete.set_tensor(self.detalles_entrada[0]['index'], datos_entrada)
-        self.interprete.invoke()
-        datos_salida = self.interprete.get_tensor(self.detalles_salida[0]['index'])
-        return datos_salida[0]
+import numpy as np
+from config import MODELO_PATH, TABLA_RIESGO_PATH, USAR_TABLA_RIESGO, MOTOR_INFERENCIA, MICROLOTES_ACTIVO
+from modelo.tabla_riesgo import TablaRiesgo
+from modelo.planificador_lotes import PlanificadorLotes
+from modelo.metricas import Metricas
+
+class ModeloDiagnostico:
+    def __init__(self, ruta_modelo=MODELO_PATH, motor=MOTOR_INFERENCIA):
+        self.motor = motor
+        # El motor NumPy no tiene hilos propios y puede compartirse tras un fork
+        self.seguro_para_fork = motor == 'numpy'
+        if motor == 'numpy':
+            from modelo.motor_numpy import MotorNumpy
+            self.motor_numpy = MotorNumpy(ruta_modelo)
+        else:
+            from modelo.pool_interpretes import PoolInterpretes
+            self.pool = PoolInterpretes(ruta_modelo)
+            Metricas.registrar('pool_interpretes', self.pool.estadisticas)
+        self.tabla = None
+        if USAR_TABLA_RIESGO:
+            self.tabla = TablaRiesgo.cargar_o_construir(ruta_modelo, TABLA_RIESGO_PATH, self.predecir_lote)
+        self.planificador = None
+        if MICROLOTES_ACTIVO:
+            self.planificador = PlanificadorLotes(self.predecir_lote)
+            Metricas.registrar('microlotes', self.planificador.estadisticas)
+
+    def predecir(self, datos_entrada):
+        if self.tabla is not None:
+            pred = self.tabla.buscar(datos_entrada)
+            if pred is not None:
+                return pred
+        return self._inferir(datos_entrada)
+
+    def predecir_lote(self, datos_entrada):
+        if self.motor == 'numpy':
+            return self.motor_numpy.predecir_lote(datos_entrada)
+        return self.pool.predecir_lote(datos_entrada)
+
+    def _inferir(self, datos_entrada):
+        """Pasa una fila por el modelo, agrupándola en microlotes si están activos"""
+        if self.planificador is not None:
+            return self.planificador.predecir(datos_entrada)
+        return self.predecir_lote(datos_entrada)[0]
+
+    def diagnosticar(self, datos_entrada):
+        """Devuelve (riesgo, confianza) para una entrada codificada"""
+        if self.tabla is not None:
+            resultado = self.tabla.resultado(datos_entrada)
+            if resultado is not None:
+                return resultado
+        pred = self._inferir(datos_entrada)
+        return int(np.argmax(pred)), float(np.max(pred))
+
+    def diagnosticar_lote(self, datos_entrada):
+        """Devuelve arrays (riesgos, confianzas) para un lote de entradas codificadas"""
+        if self.tabla is not None:
+            resultado = self.tabla.resultados_lote(datos_entrada)
+            if resultado is not None:
+                return resultado
+        pred = self.predecir_lote(datos_entrada)
+        return np.argmax(pred, axis=1), np.max(pred, axis=1)
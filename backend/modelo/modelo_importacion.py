@@ -0,0 +1,423 @@
+"""Importación masiva de pacientes y diagnósticos históricos desde un CSV.
+
+Cada fila es un paciente (username, password, nombre, apellido,
+fecha_nacimiento, genero, telefono, direccion, dni) y, opcionalmente, una
+medición con sus campos de /api/diagnostico y fecha_diagnostico. Un paciente
+con varias mediciones ocupa varias filas; sus datos se toman de la primera.
+
+El archivo se lee por bloques de IMPORTACION_BLOQUE filas: cada bloque se
+valida, se codifica y diagnostica de forma vectorizada y se carga con COPY en
+una tabla temporal. Después, unas pocas sentencias sobre toda la tabla
+resuelven los duplicados (mismo DNI o username que un paciente existente),
+crean los pacientes nuevos e insertan los diagnósticos y el resumen por
+paciente, todo en una transacción.
+
+Uso (desde backend/):
+    python -m modelo.modelo_importacion pacientes.csv [--simular]
+"""
+import csv
+import io
+import itertools
+import sys
+from datetime import date, datetime
+from modelo.modelo import obtener_conexion_bd
+from modelo.cache_usuarios import invalidar_usuarios
+from modelo.contrasenas import PoolContrasenas
+from modelo.almacenamiento import dialecto
+from modelo.codificador import CAMPOS_NUMERICOS, leer_registro, codificar_lote
+from modelo.registro_modelos import RegistroModelos
+from modelo.modelo_resultados import SQL_RESUMEN_EN_CONFLICTO
+from modelo.particiones import crear_particiones, diagnosticos_particionados
+from config import IMPORTACION_BLOQUE, IMPORTACION_MAX_ERRORES
+
+CAMPOS_PACIENTE = ('username', 'password', 'nombre', 'apellido', 'fecha_nacimiento', 'genero', 'telefono', 'direccion', 'dni')
+# Campos que indican que la fila trae una medición (genero también es del paciente)
+CAMPOS_MEDICION = tuple(CAMPOS_NUMERICOS) + ('fuma', 'alcohol', 'actividad')
+CAMPOS_DIAGNOSTICO = (
+    'edad', 'ps', 'pd', 'colesterol', 'glucosa', 'fuma', 'alcohol', 'actividad', 'peso', 'estatura', 'imc'
+)
+COLUMNAS_CARGA = ('linea',) + CAMPOS_PACIENTE + CAMPOS_DIAGNOSTICO + ('riesgo', 'confianza', 'fecha')
+
+# Longitudes de las columnas de usuarios y diagnostico_datos: un valor más largo
+# haría fallar el COPY de todo el bloque
+_LONGITUDES_PACIENTE = {'username': 50, 'password': 100, 'nombre': 100, 'apellido': 100, 'genero': 20, 'telefono': 20, 'dni': 20}
+_LONGITUDES_MEDICION = {'genero': 10, 'fuma': 1, 'alcohol': 1, 'actividad': 20}
+_ENTERO_MAX = 2 ** 31
+
+_TABLA_CARGA = """
+    CREATE TEMP TABLE importacion_filas (
+        linea INTEGER PRIMARY KEY,
+        username VARCHAR(50) NOT NULL,
+        password VARCHAR(255),
+        nombre VARCHAR(100),
+        apellido VARCHAR(100),
+        fecha_nacimiento DATE,
+        genero VARCHAR(20),
+        telefono VARCHAR(20),
+        direccion TEXT,
+        dni VARCHAR(20),
+        edad INTEGER,
+        ps INTEGER,
+        pd INTEGER,
+        colesterol REAL,
+        glucosa REAL,
+        fuma VARCHAR(1),
+        alcohol VARCHAR(1),
+        actividad VARCHAR(20),
+        peso REAL,
+        estatura REAL,
+        imc REAL,
+        riesgo INTEGER,
+        confianza REAL,
+        fecha TIMESTAMP,
+        usuario_id INTEGER,
+        datos_id INTEGER,
+        error TEXT
+    )
+"""
+_CREAR_CARGA = {
+    # La tabla desaparece con la transacción, se confirme o no
+    'postgres': [_TABLA_CARGA + " ON COMMIT DROP"],
+    # En SQLite la conexión del hilo se reutiliza: se descarta la de una importación anterior
+    'sqlite': ["DROP TABLE IF EXISTS temp.importacion_filas", _TABLA_CARGA],
+}
+_INDICES_CARGA = [
+    "CREATE INDEX importacion_filas_username ON importacion_filas (username, fecha)",
+    "CREATE INDEX importacion_filas_dni ON importacion_filas (dni)",
+]
+
+# Resolución de duplicados y rechazos, en orden. El DNI identifica a la persona:
+# una fila con el DNI de un paciente existente se asigna a ese paciente, y dentro
+# del archivo todas las filas de un DNI van al username de su primera fila
+_RESOLVER = [
+    """
+    UPDATE importacion_filas SET username = u.username
+    FROM usuarios u
+    WHERE u.dni = importacion_filas.dni AND u.tipo = 'paciente' AND u.username <> importacion_filas.username
+    """,
+    """
+    UPDATE importacion_filas SET username = primera.username
+    FROM (
+        SELECT f.dni, f.username
+        FROM importacion_filas f
+        JOIN (SELECT dni, MIN(linea) AS linea FROM importacion_filas WHERE dni IS NOT NULL GROUP BY dni) m
+            ON m.linea = f.linea
+    ) primera
+    WHERE importacion_filas.dni = primera.dni AND importacion_filas.username <> primera.username
+    """,
+    """
+    UPDATE importacion_filas SET error = 'El usuario ya existe y no es un paciente'
+    WHERE EXISTS (
+        SELECT 1 FROM usuarios u WHERE u.username = importacion_filas.username AND u.tipo <> 'paciente'
+    )
+    """,
+    """
+    UPDATE importacion_filas SET error = 'El DNI no coincide con el del paciente existente'
+    WHERE error IS NULL AND dni IS NOT NULL AND EXISTS (
+        SELECT 1 FROM usuarios u
+        WHERE u.username = importacion_filas.username AND u.dni IS NOT NULL AND u.dni <> importacion_filas.dni
+    )
+    """,
+]
+# Pacientes nuevos: los datos de la primera fila con contraseña de cada username
+_INSERTAR_PACIENTES = """
+    INSERT INTO usuarios (
+        username, password, tipo, nombre, apellido, fecha_nacimiento, genero, telefono, direccion, dni, fecha_registro
+    )
+    SELECT f.username, f.password, 'paciente', f.nombre, f.apellido, f.fecha_nacimiento, f.genero, f.telefono,
+           f.direccion, f.dni, NOW()
+    FROM importacion_filas f
+    WHERE f.linea IN (
+        SELECT MIN(linea) FROM importacion_filas WHERE error IS NULL AND password IS NOT NULL GROUP BY username
+    )
+    AND NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.username = f.username)
+    ON CONFLICT (username) DO NOTHING
+"""
+# Las filas cuya contraseña acabará en usuarios (las mismas que elige _INSERTAR_PACIENTES)
+_CONTRASENAS_NUEVAS = """
+    SELECT f.linea, f.password
+    FROM importacion_filas f
+    WHERE f.linea IN (
+        SELECT MIN(linea) FROM importacion_filas WHERE error IS NULL AND password IS NOT NULL GROUP BY username
+    )
+    AND NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.username = f.username)
+"""
+_RESOLVER_MEDICIONES = [
+    """
+    UPDATE importacion_filas SET error = 'Paciente nuevo sin contraseña'
+    WHERE error IS NULL AND NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.username = importacion_filas.username)
+    """,
+    """
+    UPDATE importacion_filas SET usuario_id = u.id
+    FROM usuarios u
+    WHERE u.username = importacion_filas.username AND importacion_filas.error IS NULL
+    """,
+    # Reimportar el mismo archivo no duplica el historial
+    """
+    UPDATE importacion_filas SET error = 'Diagnóstico ya registrado para el paciente en esa fecha'
+    WHERE error IS NULL AND edad IS NOT NULL AND fecha IS NOT NULL AND EXISTS (
+        SELECT 1 FROM diagnostico_datos d
+        WHERE d.usuario_id = importacion_filas.usuario_id AND d.fecha_ingreso = importacion_filas.fecha
+    )
+    """,
+    """
+    UPDATE importacion_filas SET error = 'Diagnóstico repetido en el archivo'
+    WHERE error IS NULL AND edad IS NOT NULL AND fecha IS NOT NULL AND EXISTS (
+        SELECT 1 FROM importacion_filas f
+        WHERE f.username = importacion_filas.username AND f.fecha = importacion_filas.fecha
+          AND f.linea < importacion_filas.linea AND f.edad IS NOT NULL AND f.error IS NULL
+    )
+    """,
+    "UPDATE importacion_filas SET fecha = NOW() WHERE error IS NULL AND edad IS NOT NULL AND fecha IS NULL",
+]
+# Ids de diagnostico_datos reservados antes de insertar: los resultados los referencian
+_RESERVAR_IDS = {
+    'postgres': """
+        UPDATE importacion_filas
+        SET datos_id = nextval((SELECT pg_get_serial_sequence('diagnostico_datos', 'id'))::regclass)
+        WHERE error IS NULL AND edad IS NOT NULL
+    """,
+    # Una sola escritura a la vez (BEGIN IMMEDIATE): los ids siguientes están libres
+    'sqlite': """
+        UPDATE importacion_filas SET datos_id = nuevos.base + nuevos.orden
+        FROM (
+            SELECT linea, ROW_NUMBER() OVER (ORDER BY linea) AS orden,
+                   (SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'diagnostico_datos') AS base
+            FROM importacion_filas
+            WHERE error IS NULL AND edad IS NOT NULL
+        ) nuevos
+        WHERE importacion_filas.linea = nuevos.linea
+    """,
+}
+_INSERTAR_DIAGNOSTICOS = [
+    """
+    INSERT INTO diagnostico_datos (
+        id, usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha_ingreso
+    )
+    SELECT datos_id, usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha
+    FROM importacion_filas
+    WHERE datos_id IS NOT NULL
+    """,
+    """
+    INSERT INTO diagnostico_resultados (datos_id, riesgo, confianza, fecha_diagnostico)
+    SELECT datos_id, riesgo, confianza, fecha
+    FROM importacion_filas
+    WHERE datos_id IS NOT NULL
+    """,
+    """
+    INSERT INTO paciente_resumen (usuario_id, total_diagnosticos, ultimo_diagnostico, ultimo_riesgo, ultima_confianza)
+    SELECT usuario_id, total, fecha, riesgo, confianza
+    FROM (
+        SELECT usuario_id, COUNT(*) OVER (PARTITION BY usuario_id) AS total, fecha, riesgo, confianza,
+               ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY fecha DESC, datos_id DESC) AS orden
+        FROM importacion_filas
+        WHERE datos_id IS NOT NULL
+    ) importados
+    WHERE orden = 1
+    """ + SQL_RESUMEN_EN_CONFLICTO,
+]
+
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _comprobar_longitudes(valores, longitudes):
+    for campo, maximo in longitudes.items():
+        if valores.get(campo) is not None and len(valores[campo]) > maximo:
+            raise ValueError(f"Valor demasiado largo para '{campo}' (máximo {maximo} caracteres)")
+
+
+def leer_fila(registro):
+    """Valida una fila del CSV; devuelve (datos del paciente, medición validada o None, fecha o None)"""
+    paciente = {campo: _texto(registro, campo) for campo in CAMPOS_PACIENTE}
+    if paciente['username'] is None:
+        raise ValueError("Falta el campo 'username'")
+    _comprobar_longitudes(paciente, _LONGITUDES_PACIENTE)
+    if paciente['fecha_nacimiento'] is not None:
+        try:
+            paciente['fecha_nacimiento'] = date.fromisoformat(paciente['fecha_nacimiento'])
+        except ValueError:
+            raise ValueError(f"Fecha inválida para 'fecha_nacimiento': {paciente['fecha_nacimiento']}")
+
+    if not any(_texto(registro, campo) for campo in CAMPOS_MEDICION):
+        return paciente, None, None
+    datos = leer_registro({campo: _texto(registro, campo) for campo in CAMPOS_MEDICION + ('genero',)})
+    _comprobar_longitudes(datos, _LONGITUDES_MEDICION)
+    for campo, tipo in CAMPOS_NUMERICOS.items():
+        if tipo is int and not -_ENTERO_MAX <= datos[campo] < _ENTERO_MAX:
+            raise ValueError(f"Valor fuera de rango para '{campo}': {datos[campo]}")
+    fecha = _texto(registro, 'fecha_diagnostico')
+    if fecha is not None:
+        try:
+            fecha = datetime.fromisoformat(fecha)
+        except ValueError:
+            raise ValueError(f"Fecha inválida para 'fecha_diagnostico': {fecha}")
+    return paciente, datos, fecha
+
+
+def _lector_csv(archivo):
+    """DictReader sobre el archivo de texto; admite ',' o ';' como separador (exportaciones de Excel)"""
+    primera = archivo.readline()
+    separador = ';' if primera.count(';') > primera.count(',') else ','
+    lector = csv.DictReader(itertools.chain([primera], archivo), delimiter=separador)
+    if primera and 'username' not in (lector.fieldnames or []):
+        raise ValueError("El CSV debe tener una cabecera con la columna 'username'")
+    return lector
+
+
+def _bloques(lector, tamano):
+    while True:
+        bloque = list(itertools.islice(((lector.line_num, registro) for registro in lector), tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+def _preparar_bloque(bloque, errores):
+    """Filas de COLUMNAS_CARGA del bloque, con el riesgo calculado de una vez para todas sus mediciones"""
+    filas = []
+    mediciones = []
+    for linea, registro in bloque:
+        try:
+            paciente, datos, fecha = leer_fila(registro)
+        except ValueError as e:
+            errores.append((linea, str(e)))
+            continue
+        if datos is not None:
+            mediciones.append((len(filas), datos))
+        filas.append([linea] + [paciente[campo] for campo in CAMPOS_PACIENTE] + [None] * (len(CAMPOS_DIAGNOSTICO) + 2) + [fecha])
+
+    if mediciones:
+        entrada = codificar_lote([datos for _, datos in mediciones])
+        riesgos, confianzas = RegistroModelos.obtener('diagnostico').diagnosticar_lote(entrada)
+        inicio = 1 + len(CAMPOS_PACIENTE)
+        for (posicion, datos), riesgo, confianza in zip(mediciones, riesgos.tolist(), confianzas.tolist()):
+            filas[posicion][inicio:inicio + len(CAMPOS_DIAGNOSTICO) + 2] = (
+                [datos[campo] for campo in CAMPOS_DIAGNOSTICO] + [riesgo, confianza]
+            )
+    return filas
+
+
+def _cargar_bloque(cur, filas):
+    columnas = ', '.join(COLUMNAS_CARGA)
+    if dialecto(cur) == 'postgres':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        buffer.seek(0)
+        # En formato csv un campo vacío sin comillas es NULL
+        cur.copy_expert(f"COPY importacion_filas ({columnas}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        marcadores = ', '.join(['%s'] * len(COLUMNAS_CARGA))
+        cur.executemany(f"INSERT INTO importacion_filas ({columnas}) VALUES ({marcadores})", filas)
+
+
+def _hashear_contrasenas(cur):
+    """Sustituye en la tabla de carga las contraseñas de los pacientes nuevos por su hash"""
+    cur.execute(_CONTRASENAS_NUEVAS)
+    pool = PoolContrasenas.global_()
+    # De uno en uno por el pool compartido: los logins concurrentes esperan como mucho un hash
+    hashes = [(pool.generar_hash(password, acotado=False), linea) for linea, password in cur.fetchall()]
+    if hashes:
+        cur.executemany("UPDATE importacion_filas SET password = %s WHERE linea = %s", hashes)
+
+
+class ModeloImportacion:
+    @staticmethod
+    def importar_csv(archivo, simular=False, bloque=IMPORTACION_BLOQUE):
+        """Importa pacientes y diagnósticos de un archivo CSV de texto abierto.
+
+        Con simular=True valida y resuelve los duplicados sin guardar nada.
+        Devuelve el informe: filas, pacientes_nuevos, diagnosticos, rechazadas y
+        errores (los primeros IMPORTACION_MAX_ERRORES, con su línea del archivo).
+        Un CSV sin la columna username lanza ValueError.
+        """
+        lector = _lector_csv(archivo)
+        conn = obtener_conexion_bd()
+        tipo = dialecto(conn)
+        cur = conn.cursor()
+        errores = []
+        try:
+            for sentencia in _CREAR_CARGA[tipo]:
+                cur.execute(sentencia)
+            filas = 0
+            for registros in _bloques(lector, bloque):
+                filas += len(registros)
+                cargadas = _preparar_bloque(registros, errores)
+                if cargadas:
+                    _cargar_bloque(cur, cargadas)
+            for sentencia in _INDICES_CARGA:
+                cur.execute(sentencia)
+            # Las tablas temporales no las analiza autovacuum
+            cur.execute("ANALYZE importacion_filas")
+
+            for sentencia in _RESOLVER:
+                cur.execute(sentencia)
+            if not simular:
+                _hashear_contrasenas(cur)
+            cur.execute(_INSERTAR_PACIENTES)
+            pacientes_nuevos = cur.rowcount
+            for sentencia in _RESOLVER_MEDICIONES:
+                cur.execute(sentencia)
+            cur.execute(_RESERVAR_IDS[tipo])
+
+            if tipo == 'postgres' and diagnosticos_particionados(cur):
+                # Las mediciones antiguas van a su partición mensual, no a la de por defecto
+                cur.execute("SELECT MIN(fecha) FROM importacion_filas WHERE datos_id IS NOT NULL")
+                desde = cur.fetchone()[0]
+                if desde is not None:
+                    crear_particiones(cur, desde=desde.date())
+            cur.execute(_INSERTAR_DIAGNOSTICOS[0])
+            diagnosticos = cur.rowcount
+            for sentencia in _INSERTAR_DIAGNOSTICOS[1:]:
+                cur.execute(sentencia)
+
+            cur.execute("SELECT COUNT(*) FROM importacion_filas WHERE error IS NOT NULL")
+            rechazadas = len(errores) + cur.fetchone()[0]
+            cur.execute(
+                "SELECT linea, error FROM importacion_filas WHERE error IS NOT NULL ORDER BY linea LIMIT %s",
+                (IMPORTACION_MAX_ERRORES,)
+            )
+            errores = sorted(errores[:IMPORTACION_MAX_ERRORES] + cur.fetchall())[:IMPORTACION_MAX_ERRORES]
+
+            if simular:
+                conn.rollback()
+            else:
+                conn.commit()
+                if pacientes_nuevos:
+                    invalidar_usuarios()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+        return {
+            'filas': filas,
+            'pacientes_nuevos': pacientes_nuevos,
+            'diagnosticos': diagnosticos,
+            'rechazadas': rechazadas,
+            'errores': [{'linea': linea, 'message': mensaje} for linea, mensaje in errores],
+            'simulada': simular,
+        }
+
+
+if __name__ == '__main__':
+    argumentos = [argumento for argumento in sys.argv[1:] if argumento != '--simular']
+    if len(argumentos) != 1:
+        print(__doc__)
+        sys.exit(2)
+    with open(argumentos[0], encoding='utf-8-sig', newline='') as archivo:
+        informe = ModeloImportacion.importar_csv(archivo, simular='--simular' in sys.argv[1:])
+    print(
+        f"{informe['filas']} filas: {informe['pacientes_nuevos']} pacientes nuevos, "
+        f"{informe['diagnosticos']} diagnósticos, {informe['rechazadas']} filas rechazadas"
+        + (" (simulación: no se guardó nada)" if informe['simulada'] else "")
+    )
+    for error in informe['errores']:
+        print(f"  línea {error['linea']}: {error['message']}")
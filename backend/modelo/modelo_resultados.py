@@ -1,51 +1,145 @@
-import psycopg2
-from modelo.modelo import obtener_conexion_bd
-
-class ModeloResultados:
-    @staticmethod
-    def obtener_ultimo_diagnostico(usuario_id):
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT r.riesgo, r.confianza, r.fecha_diagnostico 
-            FROM diagnostico_resultados r
-            JOIN diagnostico_datos d ON r.datos_id = d.id
-            WHERE d.usuario_id = %s 
-            ORDER BY r.fecha_diagnostico DESC 
-            LIMIT 1
-        """, (usuario_id,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        return row
-
-    @staticmethod
-    def guardar_diagnostico(usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, riesgo, confianza):
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        try:
-            # Primero insertar en diagnostico_datos
-            cur.execute("""
-                INSERT INTO diagnostico_datos (
-                    usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc))
-            
-            datos_id = cur.fetchone()[0]
-            
-            # Luego insertar en diagnostico_resultados
-            cur.execute("""
-                INSERT INTO diagnostico_resultados (datos_id, riesgo, confianza, fecha_diagnostico)
-                VALUES (%s, %s, %s, NOW())
-            """, (datos_id, riesgo, confianza))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print(f"Error al guardar diagnóstico: {e}")
-            return False
-        finally:
-            cur.close()
-            conn.close()
+from modelo.modelo import obtener_conexion_bd
+from modelo.almacenamiento import insertar_valores
+from modelo.cola_persistencia import ColaPersistencia
+from config import PERSISTENCIA_DIFERIDA
+
+# Suma los diagnósticos nuevos al resumen del paciente; el último diagnóstico
+# solo se reemplaza si el nuevo no es más antiguo (lotes reproducidos fuera de orden)
+SQL_RESUMEN_EN_CONFLICTO = """
+    ON CONFLICT (usuario_id) DO UPDATE SET
+        total_diagnosticos = paciente_resumen.total_diagnosticos + EXCLUDED.total_diagnosticos,
+        ultimo_diagnostico = CASE WHEN paciente_resumen.ultimo_diagnostico > EXCLUDED.ultimo_diagnostico
+            THEN paciente_resumen.ultimo_diagnostico ELSE EXCLUDED.ultimo_diagnostico END,
+        ultimo_riesgo = CASE WHEN paciente_resumen.ultimo_diagnostico > EXCLUDED.ultimo_diagnostico
+            THEN paciente_resumen.ultimo_riesgo ELSE EXCLUDED.ultimo_riesgo END,
+        ultima_confianza = CASE WHEN paciente_resumen.ultimo_diagnostico > EXCLUDED.ultimo_diagnostico
+            THEN paciente_resumen.ultima_confianza ELSE EXCLUDED.ultima_confianza END
+"""
+SQL_ACTUALIZAR_RESUMEN = """
+    INSERT INTO paciente_resumen (usuario_id, total_diagnosticos, ultimo_diagnostico, ultimo_riesgo, ultima_confianza)
+    VALUES %s
+""" + SQL_RESUMEN_EN_CONFLICTO
+
+# El último diagnóstico sale del resumen: una fila por paciente, sin recorrer las
+# particiones mensuales y también cuando ese mes ya está archivado
+SQL_ULTIMO_DIAGNOSTICO = """
+    SELECT ultimo_riesgo, ultima_confianza, ultimo_diagnostico
+    FROM paciente_resumen
+    WHERE usuario_id = %s AND ultimo_diagnostico IS NOT NULL
+"""
+
+class ModeloResultados:
+    @staticmethod
+    def obtener_ultimo_diagnostico(usuario_id):
+        if PERSISTENCIA_DIFERIDA:
+            # Leer las escrituras propias que siguen en la cola de persistencia
+            pendiente = ColaPersistencia.global_().ultimo(usuario_id)
+            if pendiente is not None:
+                return pendiente
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        cur.execute(SQL_ULTIMO_DIAGNOSTICO, (usuario_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return row
+
+    @staticmethod
+    def guardar_diagnostico(usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, riesgo, confianza):
+        if PERSISTENCIA_DIFERIDA:
+            ColaPersistencia.global_().encolar((usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, riesgo, confianza))
+            return True
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            # Primero insertar en diagnostico_datos
+            cur.execute("""
+                INSERT INTO diagnostico_datos (
+                    usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha_ingreso
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                RETURNING id
+            """, (usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc))
+            
+            datos_id = cur.fetchone()[0]
+            
+            # Luego insertar en diagnostico_resultados
+            cur.execute("""
+                INSERT INTO diagnostico_resultados (datos_id, riesgo, confianza, fecha_diagnostico)
+                VALUES (%s, %s, %s, NOW())
+            """, (datos_id, riesgo, confianza))
+            
+            # Y mantener el resumen del paciente en la misma transacción
+            cur.execute(SQL_ACTUALIZAR_RESUMEN % "(%s, 1, NOW(), %s, %s)", (usuario_id, riesgo, confianza))
+            
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Error al guardar diagnóstico: {e}")
+            return False
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def guardar_diagnosticos_lote(filas, fechas=None):
+        """Guarda muchos diagnósticos en una sola transacción con INSERTs multi-fila.
+
+        Cada fila es (usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma,
+        alcohol, actividad, peso, estatura, imc, riesgo, confianza).
+        """
+        try:
+            ModeloResultados.insertar_diagnosticos_lote(filas, fechas)
+            return True
+        except Exception as e:
+            print(f"Error al guardar el lote de diagnósticos: {e}")
+            return False
+
+    @staticmethod
+    def insertar_diagnosticos_lote(filas, fechas=None):
+        """Como guardar_diagnosticos_lote pero propaga el error; fechas sustituye a NOW() fila a fila"""
+        if not filas:
+            return
+        if fechas is None:
+            datos = [fila[:13] for fila in filas]
+            resultados = lambda ids: [(datos_id[0], fila[13], fila[14]) for datos_id, fila in zip(ids, filas)]
+            plantilla_fecha = "NOW()"
+        else:
+            datos = [fila[:13] + (fecha,) for fila, fecha in zip(filas, fechas)]
+            resultados = lambda ids: [(datos_id[0], fila[13], fila[14], fecha) for datos_id, fila, fecha in zip(ids, filas, fechas)]
+            plantilla_fecha = "%s"
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            ids = insertar_valores(cur, """
+                INSERT INTO diagnostico_datos (
+                    usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha_ingreso
+                ) VALUES %s
+                RETURNING id
+            """, datos,
+                template=f"(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, {plantilla_fecha})",
+                page_size=1000, fetch=True)
+
+            insertar_valores(cur, """
+                INSERT INTO diagnostico_resultados (datos_id, riesgo, confianza, fecha_diagnostico)
+                VALUES %s
+            """, resultados(ids),
+                template=f"(%s, %s, %s, {plantilla_fecha})", page_size=1000)
+
+            # Una fila de resumen por paciente: total del lote y su último diagnóstico
+            resumen = {}
+            for posicion, fila in enumerate(filas):
+                total = resumen[fila[0]][0] + 1 if fila[0] in resumen else 1
+                resumen[fila[0]] = (total, posicion)
+            insertar_valores(cur, SQL_ACTUALIZAR_RESUMEN % "%s", [
+                (usuario_id, total) + (() if fechas is None else (fechas[posicion],)) + (filas[posicion][13], filas[posicion][14])
+                for usuario_id, (total, posicion) in sorted(resumen.items())
+            ], template=f"(%s, %s, {plantilla_fecha}, %s, %s)", page_size=1000)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
@@ -1,61 +1,124 @@
-import psycopg2
-from modelo.modelo import obtener_conexion_bd
-
-class ModeloUsuario:
-    @staticmethod
-    def buscar_usuario(username, password):
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, username, tipo 
-            FROM usuarios 
-            WHERE username = %s AND password = %s
-        """, (username, password))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        return user
-
-    @staticmethod
-    def buscar_usuario_por_username(username):
-        """Buscar usuario solo por username (para endpoints alternativos)"""
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, username, tipo 
-            FROM usuarios 
-            WHERE username = %s
-        """, (username,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        return user
-
-    @staticmethod
-    def registrar_usuario(username, password, tipo, nombre, apellido, fecha_nacimiento, genero, telefono, direccion, dni):
-        conn = obtener_conexion_bd()
-        cur = conn.cursor()
-        try:
-            cur.execute("""
-                INSERT INTO usuarios (
-                    username, password, tipo,
-                    nombre, apellido, fecha_nacimiento,
-                    genero, telefono, direccion, dni
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                username, password, tipo,
-                nombre, apellido, fecha_nacimiento,
-                genero, telefono, direccion, dni
-            ))
-            conn.commit()
-            return True, None
-        except psycopg2.IntegrityError:
-            conn.rollback()
-            return False, 'El nombre de usuario o DNI ya existe'
-        except Exception as e:
-            conn.rollback()
-            return False, f'Error en el registro: {str(e)}'
-        finally:
-            cur.close()
-            conn.close()
+from modelo.modelo import obtener_conexion_bd
+from modelo.almacenamiento import ErrorIntegridad
+from modelo.cache_usuarios import CacheUsuarios, AUSENTE, invalidar_usuarios
+from modelo.contrasenas import PoolContrasenas, necesita_rehash
+
+SQL_CREDENCIALES = """
+    SELECT id, username, tipo, password
+    FROM usuarios
+    WHERE username = %s
+"""
+SQL_USUARIO_POR_USERNAME = """
+    SELECT id, username, tipo 
+    FROM usuarios 
+    WHERE username = %s
+"""
+
+class ModeloUsuario:
+    @staticmethod
+    def buscar_usuario(username, password):
+        """(id, username, tipo) si la contraseña es correcta, o None.
+
+        El hash se comprueba en el pool de contraseñas; una fila en claro o con
+        otro coste que CONTRASENA_METODO se rehashea en el mismo login.
+        """
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_CREDENCIALES, (username,))
+            fila = cur.fetchone()
+            pool = PoolContrasenas.global_()
+            if not pool.comprobar(fila[3] if fila else None, password):
+                return None
+            if necesita_rehash(fila[3]):
+                # Solo si nadie la cambió entretanto
+                cur.execute(
+                    "UPDATE usuarios SET password = %s WHERE id = %s AND password = %s",
+                    (pool.generar_hash(password), fila[0], fila[3])
+                )
+                conn.commit()
+            return tuple(fila[:3])
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def buscar_usuario_por_username(username):
+        """Buscar usuario solo por username (para endpoints alternativos), pasando por la caché"""
+        cache = CacheUsuarios.global_()
+        user = cache.obtener(username)
+        if user is not AUSENTE:
+            return user
+        version = cache.version()
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        cur.execute(SQL_USUARIO_POR_USERNAME, (username,))
+        user = cur.fetchone()
+        cur.close()
+        conn.close()
+        cache.guardar(username, user, version)
+        return user
+
+    @staticmethod
+    def buscar_usuarios_por_username(usernames):
+        """Resuelve muchos usernames con una sola consulta; devuelve {username: (id, username, tipo)}"""
+        cache = CacheUsuarios.global_()
+        usuarios = {}
+        pendientes = []
+        for username in set(usernames):
+            user = cache.obtener(username)
+            if user is AUSENTE:
+                pendientes.append(username)
+            elif user is not None:
+                usuarios[username] = user
+        if not pendientes:
+            return usuarios
+        version = cache.version()
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, username, tipo 
+            FROM usuarios 
+            WHERE username IN %s
+        """, (tuple(pendientes),))
+        encontrados = {fila[1]: fila for fila in cur.fetchall()}
+        cur.close()
+        conn.close()
+        for username in pendientes:
+            cache.guardar(username, encontrados.get(username), version)
+        usuarios.update(encontrados)
+        return usuarios
+
+    @staticmethod
+    def registrar_usuario(username, password, tipo, nombre, apellido, fecha_nacimiento, genero, telefono, direccion, dni):
+        if password is not None:
+            password = PoolContrasenas.global_().generar_hash(password)
+        conn = obtener_conexion_bd()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT INTO usuarios (
+                    username, password, tipo,
+                    nombre, apellido, fecha_nacimiento,
+                    genero, telefono, direccion, dni
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                username, password, tipo,
+                nombre, apellido, fecha_nacimiento,
+                genero, telefono, direccion, dni
+            ))
+            # Antes del commit: invalida ya y, vía al_confirmar, otra vez tras el COMMIT, por si una
+            # búsqueda concurrente guardó el username como inexistente mientras tanto
+            invalidar_usuarios([username])
+            conn.commit()
+            return True, None
+        except ErrorIntegridad:
+            conn.rollback()
+            return False, 'El nombre de usuario o DNI ya existe'
+        except Exception as e:
+            conn.rollback()
+            return False, f'Error en el registro: {str(e)}'
+        finally:
+            cur.close()
+            conn.close()
@@ -0,0 +1,183 @@
+import struct
+import numpy as np
+from config import MODELO_PATH
+
+# Códigos de operación del esquema TFLite (schema.fbs, enum BuiltinOperator)
+OP_ADD = 0
+OP_FULLY_CONNECTED = 9
+OP_LOGISTIC = 14
+OP_RELU = 19
+OP_RELU6 = 21
+OP_RESHAPE = 22
+OP_SOFTMAX = 25
+OP_TANH = 28
+
+# Tipos de tensor soportados (enum TensorType)
+TIPOS_TENSOR = {
+    0: np.float32,
+    2: np.int32,
+    4: np.int64,
+}
+
+# Funciones de activación fusionadas (enum ActivationFunctionType)
+ACTIVACIONES = {
+    0: lambda x: x,
+    1: lambda x: np.maximum(x, 0),
+    3: lambda x: np.clip(x, 0, 6),
+    4: np.tanh,
+}
+
+
+class _Tabla:
+    """Acceso mínimo de solo lectura a una tabla de un flatbuffer"""
+
+    def __init__(self, buf, pos):
+        self.buf = buf
+        self.pos = pos
+        self.vtable = pos - struct.unpack_from('<i', buf, pos)[0]
+        self.tamano_vtable = struct.unpack_from('<H', buf, self.vtable)[0]
+
+    def _campo(self, indice):
+        desplazamiento = 4 + 2 * indice
+        if desplazamiento >= self.tamano_vtable:
+            return 0
+        return struct.unpack_from('<H', self.buf, self.vtable + desplazamiento)[0]
+
+    def escalar(self, indice, formato, por_defecto=0):
+        campo = self._campo(indice)
+        if not campo:
+            return por_defecto
+        return struct.unpack_from('<' + formato, self.buf, self.pos + campo)[0]
+
+    def _referencia(self, indice):
+        campo = self._campo(indice)
+        if not campo:
+            return None
+        pos = self.pos + campo
+        return pos + struct.unpack_from('<I', self.buf, pos)[0]
+
+    def tabla(self, indice):
+        pos = self._referencia(indice)
+        return _Tabla(self.buf, pos) if pos is not None else None
+
+    def vector(self, indice, formato):
+        pos = self._referencia(indice)
+        if pos is None:
+            return []
+        largo = struct.unpack_from('<I', self.buf, pos)[0]
+        return list(struct.unpack_from(f'<{largo}{formato}', self.buf, pos + 4))
+
+    def vector_bytes(self, indice):
+        pos = self._referencia(indice)
+        if pos is None:
+            return b''
+        largo = struct.unpack_from('<I', self.buf, pos)[0]
+        return self.buf[pos + 4:pos + 4 + largo]
+
+    def vector_tablas(self, indice):
+        pos = self._referencia(indice)
+        if pos is None:
+            return []
+        largo = struct.unpack_from('<I', self.buf, pos)[0]
+        tablas = []
+        for i in range(largo):
+            elemento = pos + 4 + 4 * i
+            tablas.append(_Tabla(self.buf, elemento + struct.unpack_from('<I', self.buf, elemento)[0]))
+        return tablas
+
+
+def _softmax(x, beta):
+    x = x * beta
+    x = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return x / np.sum(x, axis=-1, keepdims=True)
+
+
+class MotorNumpy:
+    """Ejecuta modeloDEC.tflite con NumPy, sin depender de TensorFlow"""
+
+    def __init__(self, ruta_modelo=MODELO_PATH):
+        with open(ruta_modelo, 'rb') as archivo:
+            buf = archivo.read()
+        modelo = _Tabla(buf, struct.unpack_from('<I', buf, 0)[0])
+        # OperatorCode: 0 deprecated_builtin_code (int8), 3 builtin_code (int32)
+        codigos = [
+            max(codigo.escalar(0, 'b'), codigo.escalar(3, 'i'))
+            for codigo in modelo.vector_tablas(1)
+        ]
+        buffers = modelo.vector_tablas(4)
+        subgrafo = modelo.vector_tablas(2)[0]
+
+        self.constantes = {}
+        for indice, tensor in enumerate(subgrafo.vector_tablas(0)):
+            datos = buffers[tensor.escalar(2, 'I')].vector_bytes(0)
+            if not datos:
+                continue
+            tipo = TIPOS_TENSOR.get(tensor.escalar(1, 'b'))
+            if tipo is None:
+                raise ValueError(f"Tipo de tensor no soportado en el tensor {indice}")
+            forma = tensor.vector(0, 'i')
+            self.constantes[indice] = np.frombuffer(datos, dtype=tipo).reshape(forma).copy()
+
+        self.entrada = subgrafo.vector(1, 'i')[0]
+        self.salida = subgrafo.vector(2, 'i')[0]
+        self.operaciones = [
+            self._compilar(codigos[op.escalar(0, 'I')], op)
+            for op in subgrafo.vector_tablas(3)
+        ]
+
+    def _compilar(self, codigo, op):
+        """Traduce un operador TFLite a (función, entradas, salida)"""
+        entradas = op.vector(1, 'i')
+        salida = op.vector(2, 'i')[0]
+        opciones = op.tabla(4)
+
+        if codigo == OP_FULLY_CONNECTED:
+            # FullyConnectedOptions: 0 fused_activation_function
+            activacion = ACTIVACIONES.get(opciones.escalar(0, 'b') if opciones else 0)
+            if activacion is None:
+                raise ValueError("Activación fusionada no soportada en FULLY_CONNECTED")
+            pesos = self.constantes[entradas[1]].T.copy()
+            sesgo = self.constantes.get(entradas[2]) if len(entradas) > 2 and entradas[2] >= 0 else None
+
+            def fully_connected(x):
+                y = x.reshape(-1, pesos.shape[0]) @ pesos
+                if sesgo is not None:
+                    y += sesgo
+                return activacion(y)
+            return fully_connected, entradas[:1], salida
+
+        if codigo == OP_SOFTMAX:
+            # SoftmaxOptions: 0 beta
+            beta = opciones.escalar(0, 'f', 1.0) if opciones else 1.0
+            return (lambda x: _softmax(x, beta)), entradas[:1], salida
+
+        if codigo == OP_ADD:
+            # AddOptions: 0 fused_activation_function
+            activacion = ACTIVACIONES[opciones.escalar(0, 'b') if opciones else 0]
+            return (lambda a, b: activacion(a + b)), entradas, salida
+
+        if codigo == OP_RESHAPE:
+            forma = self.constantes[entradas[1]].tolist() if len(entradas) > 1 else opciones.vector(0, 'i')
+            return (lambda x: x.reshape([-1] + list(forma[1:]))), entradas[:1], salida
+
+        elementales = {
+            OP_RELU: ACTIVACIONES[1],
+            OP_RELU6: ACTIVACIONES[3],
+            OP_TANH: ACTIVACIONES[4],
+            OP_LOGISTIC: lambda x: 1 / (1 + np.exp(-x)),
+        }
+        if codigo in elementales:
+            return elementales[codigo], entradas[:1], salida
+
+        raise ValueError(f"Operación TFLite no soportada: {codigo}")
+
+    def predecir_lote(self, datos_entrada):
+        tensores = dict(self.constantes)
+        tensores[self.entrada] = np.asarray(datos_entrada, dtype=np.float32)
+        for funcion, entradas, salida in self.operaciones:
+            tensores[salida] = funcion(*(tensores[i] for i in entradas)).astype(np.float32, copy=False)
+        return tensores[self.salida]
+
+    def predecir(self, datos_entrada):
+        return self.predecir_lote(datos_entrada)[0]
+
@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+from config import PAGINA_MAX
+
+
+def codificar_cursor(*valores):
+    """Cursor opaco con la clave de la última fila entregada"""
+    valores = [valor.isoformat() if isinstance(valor, datetime) else valor for valor in valores]
+    return base64.urlsafe_b64encode(json.dumps(valores, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, tipos):
+    """Devuelve la clave guardada en el cursor convertida con tipos; ValueError si no es válido"""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(valores, list) or len(valores) != len(tipos):
+        raise ValueError("Cursor inválido")
+    try:
+        return tuple(
+            datetime.fromisoformat(valor) if tipo is datetime else tipo(valor)
+            for valor, tipo in zip(valores, tipos)
+        )
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+
+
+def leer_paginacion(args, tipos):
+    """Lee limit y cursor de la query string: (limite, clave) o (None, None) sin paginación"""
+    limite = args.get('limit')
+    cursor = args.get('cursor')
+    if limite is None and cursor is None:
+        return None, None
+    try:
+        limite = int(limite) if limite is not None else PAGINA_MAX
+    except ValueError:
+        raise ValueError("El parámetro limit debe ser un entero")
+    if limite < 1:
+        raise ValueError("El parámetro limit debe ser mayor que cero")
+    return min(limite, PAGINA_MAX), decodificar_cursor(cursor, tipos) if cursor else None
@@ -0,0 +1,434 @@
+"""Particiones mensuales de los diagnósticos y archivo de los meses antiguos (solo PostgreSQL).
+
+diagnostico_datos (por fecha_ingreso) y diagnostico_resultados (por
+fecha_diagnostico) están particionadas por rango mensual; las dos fechas son la
+misma para cada diagnóstico, así que cada mes vive en un par de particiones. Las
+consultas recientes y el VACUUM solo tocan los meses vivos.
+
+El archivo vuelca cada mes más antiguo que ARCHIVO_RETENCION_MESES a un CSV
+comprimido en ARCHIVO_DIR, guarda un resumen por paciente y mes en
+diagnostico_archivo_resumen, y separa y borra las dos particiones. El historial
+puede seguir leyendo esos meses desde los archivos (incluir_archivo).
+
+Uso (desde backend/):
+    python -m modelo.particiones estado
+    python -m modelo.particiones crear [meses_futuros]
+    python -m modelo.particiones archivar [retencion_meses]
+    python -m modelo.particiones mantener      # crear + archivar, para un cron diario
+"""
+import csv
+import gzip
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime
+from config import PARTICIONES_MESES_FUTUROS, PARTICIONES_INTERVALO_H, ARCHIVO_RETENCION_MESES, ARCHIVO_DIR
+from modelo.almacenamiento import dialecto
+
+# Tabla particionada -> columna de la partición
+TABLAS_PARTICIONADAS = (
+    ('diagnostico_datos', 'fecha_ingreso'),
+    ('diagnostico_resultados', 'fecha_diagnostico'),
+)
+_PARTICION_MES = re.compile(r"^diagnostico_datos_p(\d{4})_(\d{2})$")
+
+# Columnas de cada fila archivada (un diagnóstico: datos y resultado unidos)
+COLUMNAS_ARCHIVO = (
+    'usuario_id', 'datos_id', 'resultado_id', 'fecha_diagnostico', 'edad', 'genero', 'ps', 'pd', 'colesterol',
+    'glucosa', 'fuma', 'alcohol', 'actividad', 'peso', 'estatura', 'imc', 'fecha_ingreso', 'riesgo', 'confianza', 'notas'
+)
+# Conversión de las columnas de SQL_HISTORIAL al leer el CSV ('' es NULL)
+_TIPOS_HISTORIAL = (
+    ('fecha_diagnostico', datetime.fromisoformat), ('edad', int), ('genero', str), ('ps', int), ('pd', int),
+    ('colesterol', float), ('glucosa', float), ('fuma', str), ('alcohol', str), ('actividad', str),
+    ('peso', float), ('estatura', float), ('imc', float), ('riesgo', int), ('confianza', float), ('resultado_id', int),
+)
+
+# Archivos de los meses archivados con diagnósticos del paciente, del más reciente al más antiguo
+SQL_ARCHIVOS_USUARIO = """
+    SELECT a.archivo
+    FROM diagnostico_archivo_resumen ar
+    JOIN diagnostico_archivo a ON a.mes = ar.mes
+    WHERE ar.usuario_id = %s
+    ORDER BY a.mes DESC
+"""
+
+
+def _mes_siguiente(mes, meses=1):
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _sufijo(mes):
+    return f"p{mes.year:04d}_{mes.month:02d}"
+
+
+def _apartar_de_defecto(cur, mes):
+    """Saca de las particiones por defecto las filas del mes (escritas con fechas
+    pasadas o importadas); PostgreSQL no crea la partición del mes mientras sigan ahí"""
+    cur.execute(
+        "SELECT EXISTS (SELECT 1 FROM diagnostico_datos_defecto WHERE fecha_ingreso >= %s AND fecha_ingreso < %s)",
+        (mes, _mes_siguiente(mes))
+    )
+    if not cur.fetchone()[0]:
+        return False
+    # Primero los resultados: referencian a los datos del mismo mes
+    for tabla, columna in reversed(TABLAS_PARTICIONADAS):
+        cur.execute(f"CREATE TEMP TABLE {tabla}_apartadas (LIKE {tabla})")
+        cur.execute(f"""
+            WITH apartadas AS (
+                DELETE FROM {tabla}_defecto WHERE {columna} >= %s AND {columna} < %s RETURNING *
+            )
+            INSERT INTO {tabla}_apartadas SELECT * FROM apartadas
+        """, (mes, _mes_siguiente(mes)))
+    return True
+
+
+def _devolver_apartadas(cur):
+    for tabla, _ in TABLAS_PARTICIONADAS:
+        cur.execute(f"INSERT INTO {tabla} SELECT * FROM {tabla}_apartadas")
+        cur.execute(f"DROP TABLE {tabla}_apartadas")
+
+
+def crear_particiones(cur, desde=None, meses_futuros=PARTICIONES_MESES_FUTUROS):
+    """Crea las particiones de cada mes desde `desde` (o el mes actual) hasta meses_futuros después.
+
+    Idempotente; devuelve los meses creados. No confirma la transacción.
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('particiones_diagnostico'))")
+    cur.execute("SELECT date_trunc('month', NOW())::date")
+    actual = cur.fetchone()[0]
+    mes = desde.replace(day=1) if desde is not None else actual
+    creados = []
+    while mes <= _mes_siguiente(actual, meses_futuros):
+        cur.execute("SELECT to_regclass(%s)", (f"diagnostico_datos_{_sufijo(mes)}",))
+        if cur.fetchone()[0] is None:
+            cur.execute("SAVEPOINT particion_mes")
+            try:
+                movidas = _apartar_de_defecto(cur, mes)
+                for tabla, _ in TABLAS_PARTICIONADAS:
+                    cur.execute(
+                        f"CREATE TABLE {tabla}_{_sufijo(mes)} PARTITION OF {tabla} FOR VALUES FROM (%s) TO (%s)",
+                        (mes, _mes_siguiente(mes))
+                    )
+                if movidas:
+                    _devolver_apartadas(cur)
+                cur.execute("RELEASE SAVEPOINT particion_mes")
+                creados.append(mes)
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT particion_mes")
+                print(f"No se pudo crear la partición de {mes:%Y-%m}: {e}")
+        mes = _mes_siguiente(mes)
+    return creados
+
+
+def diagnosticos_particionados(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('diagnostico_datos')")
+    fila = cur.fetchone()
+    return fila is not None and fila[0] == 'p'
+
+
+def particionar_diagnosticos(cur):
+    """Migración: convierte diagnostico_datos y diagnostico_resultados en tablas particionadas por mes"""
+    if diagnosticos_particionados(cur):
+        return
+    cur.execute("LOCK TABLE diagnostico_datos, diagnostico_resultados IN ACCESS EXCLUSIVE MODE")
+    cur.execute("SELECT pg_get_serial_sequence('diagnostico_datos', 'id'), pg_get_serial_sequence('diagnostico_resultados', 'id')")
+    secuencia_datos, secuencia_resultados = cur.fetchone()
+    cur.execute(f"ALTER SEQUENCE {secuencia_datos} OWNED BY NONE")
+    cur.execute(f"ALTER SEQUENCE {secuencia_resultados} OWNED BY NONE")
+    cur.execute("ALTER TABLE diagnostico_datos RENAME TO diagnostico_datos_sin_particionar")
+    cur.execute("ALTER TABLE diagnostico_resultados RENAME TO diagnostico_resultados_sin_particionar")
+
+    # La clave primaria de una tabla particionada debe incluir la columna de la
+    # partición; el resultado referencia a sus datos por (id, fecha)
+    cur.execute(f"""
+        CREATE TABLE diagnostico_datos (
+            id INTEGER NOT NULL DEFAULT nextval('{secuencia_datos}'),
+            usuario_id INTEGER NOT NULL,
+            edad INTEGER NOT NULL,
+            genero VARCHAR(10) NOT NULL,
+            ps INTEGER NOT NULL,
+            pd INTEGER NOT NULL,
+            colesterol REAL NOT NULL,
+            glucosa REAL NOT NULL,
+            fuma VARCHAR(1) NOT NULL,
+            alcohol VARCHAR(1) NOT NULL,
+            actividad VARCHAR(20) NOT NULL,
+            peso REAL NOT NULL,
+            estatura REAL NOT NULL,
+            imc REAL NOT NULL,
+            fecha_ingreso TIMESTAMP NOT NULL DEFAULT NOW()
+        ) PARTITION BY RANGE (fecha_ingreso)
+    """)
+    cur.execute(f"""
+        CREATE TABLE diagnostico_resultados (
+            id INTEGER NOT NULL DEFAULT nextval('{secuencia_resultados}'),
+            datos_id INTEGER NOT NULL,
+            riesgo INTEGER NOT NULL,
+            confianza REAL NOT NULL,
+            notas TEXT,
+            fecha_diagnostico TIMESTAMP NOT NULL DEFAULT NOW()
+        ) PARTITION BY RANGE (fecha_diagnostico)
+    """)
+    for tabla, _ in TABLAS_PARTICIONADAS:
+        # Red de seguridad para filas fuera de los meses creados
+        cur.execute(f"CREATE TABLE {tabla}_defecto PARTITION OF {tabla} DEFAULT")
+
+    cur.execute("""
+        SELECT date_trunc('month', MIN(fecha))::date FROM (
+            SELECT MIN(fecha_ingreso) AS fecha FROM diagnostico_datos_sin_particionar
+            UNION ALL
+            SELECT MIN(fecha_diagnostico) FROM diagnostico_resultados_sin_particionar
+        ) fechas
+    """)
+    crear_particiones(cur, desde=cur.fetchone()[0])
+
+    # Datos y resultado se guardan en la misma transacción con la misma fecha; en
+    # filas antiguas sin fecha de ingreso se toma la del diagnóstico
+    cur.execute("""
+        INSERT INTO diagnostico_datos (
+            id, usuario_id, edad, genero, ps, pd, colesterol, glucosa, fuma, alcohol, actividad, peso, estatura, imc, fecha_ingreso
+        )
+        SELECT d.id, d.usuario_id, d.edad, d.genero, d.ps, d.pd, d.colesterol, d.glucosa, d.fuma, d.alcohol,
+               d.actividad, d.peso, d.estatura, d.imc, COALESCE(r.fecha, d.fecha_ingreso, TIMESTAMP '1970-01-01')
+        FROM diagnostico_datos_sin_particionar d
+        LEFT JOIN (
+            SELECT datos_id, MAX(fecha_diagnostico) AS fecha
+            FROM diagnostico_resultados_sin_particionar
+            GROUP BY datos_id
+        ) r ON r.datos_id = d.id
+    """)
+    cur.execute("""
+        INSERT INTO diagnostico_resultados (id, datos_id, riesgo, confianza, notas, fecha_diagnostico)
+        SELECT r.id, r.datos_id, r.riesgo, r.confianza, r.notas, d.fecha_ingreso
+        FROM diagnostico_resultados_sin_particionar r
+        JOIN diagnostico_datos d ON d.id = r.datos_id
+    """)
+    cur.execute("DROP TABLE diagnostico_resultados_sin_particionar, diagnostico_datos_sin_particionar")
+
+    cur.execute("ALTER TABLE diagnostico_datos ADD PRIMARY KEY (id, fecha_ingreso)")
+    cur.execute("ALTER TABLE diagnostico_resultados ADD PRIMARY KEY (id, fecha_diagnostico)")
+    cur.execute("""
+        ALTER TABLE diagnostico_datos ADD FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    """)
+    cur.execute("""
+        ALTER TABLE diagnostico_resultados ADD FOREIGN KEY (datos_id, fecha_diagnostico)
+            REFERENCES diagnostico_datos (id, fecha_ingreso) ON DELETE CASCADE
+    """)
+    cur.execute("CREATE INDEX idx_diagnostico_datos_usuario ON diagnostico_datos (usuario_id)")
+    cur.execute("CREATE INDEX idx_diagnostico_resultados_datos_fecha ON diagnostico_resultados (datos_id, fecha_diagnostico)")
+    cur.execute("CREATE INDEX idx_diagnostico_resultados_fecha ON diagnostico_resultados (fecha_diagnostico)")
+    cur.execute(f"ALTER SEQUENCE {secuencia_datos} OWNED BY diagnostico_datos.id")
+    cur.execute(f"ALTER SEQUENCE {secuencia_resultados} OWNED BY diagnostico_resultados.id")
+
+
+def meses_particionados(cur):
+    """Meses con partición propia, del más antiguo al más reciente"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('diagnostico_datos')
+    """)
+    meses = []
+    for (nombre,) in cur.fetchall():
+        coincidencia = _PARTICION_MES.match(nombre)
+        if coincidencia:
+            meses.append(date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1))
+    return sorted(meses)
+
+
+def _archivar_mes(conn, mes, directorio):
+    """Vuelca el mes a un CSV comprimido, guarda su resumen por paciente y borra sus particiones"""
+    datos, resultados = (f"{tabla}_{_sufijo(mes)}" for tabla, _ in TABLAS_PARTICIONADAS)
+    nombre = f"diagnosticos_{mes.year:04d}_{mes.month:02d}.csv.gz"
+    ruta = os.path.join(directorio, nombre)
+    os.makedirs(directorio, exist_ok=True)
+    cur = conn.cursor()
+    try:
+        # Ordenado por paciente: la lectura de un historial se detiene al pasar su bloque
+        with gzip.open(ruta + '.tmp', 'wt', encoding='utf-8', newline='') as archivo:
+            cur.copy_expert(f"""
+                COPY (
+                    SELECT d.usuario_id, d.id, r.id, r.fecha_diagnostico, d.edad, d.genero, d.ps, d.pd, d.colesterol,
+                           d.glucosa, d.fuma, d.alcohol, d.actividad, d.peso, d.estatura, d.imc, d.fecha_ingreso,
+                           r.riesgo, r.confianza, r.notas
+                    FROM {datos} d
+                    LEFT JOIN {resultados} r ON r.datos_id = d.id
+                    ORDER BY d.usuario_id, r.fecha_diagnostico DESC, r.id DESC
+                ) TO STDOUT WITH (FORMAT csv, HEADER false)
+            """, archivo)
+        with open(ruta + '.tmp', 'rb') as archivo:
+            os.fsync(archivo.fileno())
+        os.replace(ruta + '.tmp', ruta)
+
+        cur.execute(f"SELECT COUNT(*) FROM {datos}")
+        filas = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO diagnostico_archivo (mes, archivo, filas, fecha_archivado) VALUES (%s, %s, %s, NOW())",
+            (mes, nombre, filas)
+        )
+        cur.execute(f"""
+            INSERT INTO diagnostico_archivo_resumen (
+                usuario_id, mes, total, ultimo_diagnostico, ultimo_riesgo, ultima_confianza, ultimo_id
+            )
+            SELECT DISTINCT ON (d.usuario_id)
+                d.usuario_id, %s, COUNT(*) OVER (PARTITION BY d.usuario_id),
+                r.fecha_diagnostico, r.riesgo, r.confianza, r.id
+            FROM {resultados} r
+            JOIN {datos} d ON d.id = r.datos_id
+            ORDER BY d.usuario_id, r.fecha_diagnostico DESC, r.id DESC
+        """, (mes,))
+        # Primero los resultados: sus filas referencian a los datos del mismo mes
+        cur.execute(f"ALTER TABLE diagnostico_resultados DETACH PARTITION {resultados}")
+        cur.execute(f"DROP TABLE {resultados}")
+        cur.execute(f"ALTER TABLE diagnostico_datos DETACH PARTITION {datos}")
+        cur.execute(f"DROP TABLE {datos}")
+        conn.commit()
+        return filas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def archivar_particiones(conn, retencion_meses=ARCHIVO_RETENCION_MESES, directorio=ARCHIVO_DIR):
+    """Archiva los meses anteriores a los últimos retencion_meses; devuelve {mes: filas}"""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT date_trunc('month', NOW())::date")
+        corte = _mes_siguiente(cur.fetchone()[0], -retencion_meses)
+        cur.execute("SELECT mes FROM diagnostico_archivo")
+        ya_archivados = {fila[0] for fila in cur.fetchall()}
+        meses = []
+        for mes in meses_particionados(cur):
+            if mes >= corte:
+                continue
+            if mes in ya_archivados:
+                # Se volvió a crear la partición de un mes archivado: no se pisa su archivo
+                print(f"El mes {mes:%Y-%m} ya está archivado; su partición se deja sin tocar")
+                continue
+            meses.append(mes)
+        conn.commit()
+    finally:
+        cur.close()
+    archivados = {}
+    for mes in meses:
+        archivados[mes] = _archivar_mes(conn, mes, directorio)
+        print(f"Mes {mes:%Y-%m} archivado: {archivados[mes]} diagnósticos")
+    return archivados
+
+
+def leer_historial(archivos, usuario_id, limite=None, antes_de=None, directorio=ARCHIVO_DIR):
+    """Filas archivadas del paciente con las columnas de SQL_HISTORIAL, de la más reciente a la más antigua.
+
+    archivos viene de SQL_ARCHIVOS_USUARIO; antes_de=(fecha, id) continúa una paginación.
+    """
+    filas = []
+    for nombre in archivos:
+        mes = []
+        with gzip.open(os.path.join(directorio, nombre), 'rt', encoding='utf-8', newline='') as archivo:
+            for valores in csv.reader(archivo):
+                registro = dict(zip(COLUMNAS_ARCHIVO, valores))
+                paciente = int(registro['usuario_id'])
+                if paciente < usuario_id or not registro['resultado_id']:
+                    continue
+                if paciente > usuario_id:
+                    break
+                fila = tuple(
+                    convertir(registro[columna]) if registro[columna] != '' else None
+                    for columna, convertir in _TIPOS_HISTORIAL
+                )
+                if antes_de is None or (fila[0], fila[-1]) < tuple(antes_de):
+                    mes.append(fila)
+        filas += mes
+        if limite is not None and len(filas) >= limite:
+            return filas[:limite]
+    return filas
+
+
+def estado(conn):
+    cur = conn.cursor()
+    try:
+        meses = meses_particionados(cur)
+        cur.execute("SELECT mes, archivo, filas FROM diagnostico_archivo ORDER BY mes")
+        archivados = cur.fetchall()
+        cur.execute("SELECT COUNT(*) FROM diagnostico_datos_defecto")
+        defecto = cur.fetchone()[0]
+        return meses, archivados, defecto
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def _crear_particiones_futuras(meses_futuros=PARTICIONES_MESES_FUTUROS):
+    from modelo.modelo import abrir_conexion_bd
+    conn = abrir_conexion_bd()
+    cur = conn.cursor()
+    try:
+        # Base sin la migración 5 todavía: no hay nada que crear
+        creados = crear_particiones(cur, meses_futuros=meses_futuros) if diagnosticos_particionados(cur) else []
+        conn.commit()
+        return creados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def iniciar_mantenimiento(intervalo_h=PARTICIONES_INTERVALO_H):
+    """Hilo que crea por adelantado las particiones de los próximos meses cada intervalo_h horas"""
+    def trabajar():
+        while True:
+            try:
+                creados = _crear_particiones_futuras()
+                if creados:
+                    print(f"Particiones creadas: {', '.join(f'{mes:%Y-%m}' for mes in creados)}")
+                espera = intervalo_h * 3600
+            except Exception as e:
+                # Base de datos no disponible: se reintenta pronto
+                print(f"No se pudieron crear las particiones de diagnósticos: {e}")
+                espera = min(intervalo_h * 3600, 60)
+            time.sleep(espera)
+
+    hilo = threading.Thread(target=trabajar, name='particiones-diagnostico', daemon=True)
+    hilo.start()
+    return hilo
+
+
+if __name__ == '__main__':
+    from modelo.modelo import abrir_conexion_bd
+    argumentos = sys.argv[1:]
+    orden = argumentos[0] if argumentos else 'estado'
+    conn = abrir_conexion_bd()
+    try:
+        if dialecto(conn) != 'postgres':
+            print("Las particiones y el archivo de diagnósticos solo existen en PostgreSQL")
+            sys.exit(2)
+        if orden in ('crear', 'mantener'):
+            cur = conn.cursor()
+            creados = crear_particiones(cur, meses_futuros=int(argumentos[1]) if orden == 'crear' and len(argumentos) > 1 else PARTICIONES_MESES_FUTUROS)
+            conn.commit()
+            cur.close()
+            print(f"{len(creados)} particiones mensuales creadas")
+        if orden in ('archivar', 'mantener'):
+            retencion = int(argumentos[1]) if orden == 'archivar' and len(argumentos) > 1 else ARCHIVO_RETENCION_MESES
+            archivados = archivar_particiones(conn, retencion)
+            print(f"{len(archivados)} meses archivados en {ARCHIVO_DIR}")
+        if orden == 'estado':
+            meses, archivados, defecto = estado(conn)
+            print(f"Meses particionados: {', '.join(f'{mes:%Y-%m}' for mes in meses) or 'ninguno'}")
+            for mes, archivo, filas in archivados:
+                print(f"Archivado {mes:%Y-%m}: {filas} diagnósticos en {archivo}")
+            print(f"Filas en la partición por defecto: {defecto}")
+        elif orden not in ('crear', 'archivar', 'mantener'):
+            print(__doc__)
+            sys.exit(2)
+    finally:
+        conn.close()
@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+from config import LOTE_MAX, LOTE_ESPERA_MS, PETICION_PLAZO_S
+from modelo.metricas import Histograma
+from modelo.plazos import plazo_restante
+
+
+class _Solicitud:
+    __slots__ = ('datos', 'encolada', 'listo', 'resultado', 'error')
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.encolada = time.perf_counter()
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class PlanificadorLotes:
+    """Agrupa predicciones concurrentes en un único invoke del modelo.
+
+    Cada petición encola su fila y espera; un hilo despachador junta las que
+    llegan dentro de la ventana (espera_max_ms o max_lote filas), ejecuta
+    predecir_lote una sola vez y reparte las salidas. La espera no pasa del
+    plazo de la petición: si el despachador no ha respondido, la fila se
+    predice directamente en el hilo de la petición.
+    """
+
+    def __init__(self, predecir_lote, max_lote=LOTE_MAX, espera_max_ms=LOTE_ESPERA_MS):
+        self.predecir_lote = predecir_lote
+        self.max_lote = max_lote
+        self.espera_max = espera_max_ms / 1000
+        self.histograma_lote = Histograma([1, 2, 4, 8, 16, 32, 64, 128])
+        self.histograma_espera_ms = Histograma([0.5, 1, 2, 5, 10, 20, 50, 100])
+        self._lock = threading.Lock()
+        self._pid = None
+        self._cola = None
+        self._esperas_agotadas = 0
+
+    def _asegurar_despachador(self):
+        # El hilo despachador no sobrevive a un fork: se arranca uno por proceso
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._cola = queue.Queue()
+            hilo = threading.Thread(target=self._despachar, args=(self._cola,), name='planificador-lotes', daemon=True)
+            hilo.start()
+            self._pid = os.getpid()
+
+    def predecir(self, datos_entrada):
+        """Devuelve la fila de salida del modelo para una entrada (1, n)"""
+        self._asegurar_despachador()
+        solicitud = _Solicitud(np.asarray(datos_entrada, dtype=np.float32).reshape(1, -1))
+        self._cola.put(solicitud)
+        espera = plazo_restante()
+        if espera is None:
+            espera = PETICION_PLAZO_S
+        # Con el plazo ya vencido se concede al menos la ventana de agrupación
+        if not solicitud.listo.wait(max(espera, self.espera_max)):
+            with self._lock:
+                self._esperas_agotadas += 1
+            return self.predecir_lote(solicitud.datos)[0]
+        if solicitud.error is not None:
+            raise solicitud.error
+        return solicitud.resultado
+
+    def _despachar(self, cola):
+        while True:
+            lote = [cola.get()]
+            limite = time.perf_counter() + self.espera_max
+            while len(lote) < self.max_lote:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._ejecutar(lote)
+
+    def _ejecutar(self, lote):
+        inicio = time.perf_counter()
+        self.histograma_lote.observar(len(lote))
+        for solicitud in lote:
+            self.histograma_espera_ms.observar((inicio - solicitud.encolada) * 1000)
+        try:
+            salida = self.predecir_lote(np.concatenate([s.datos for s in lote]))
+            for i, solicitud in enumerate(lote):
+                solicitud.resultado = salida[i]
+        except Exception as e:
+            for solicitud in lote:
+                solicitud.error = e
+        for solicitud in lote:
+            solicitud.listo.set()
+
+    def estadisticas(self):
+        return {
+            'max_lote': self.max_lote,
+            'espera_max_ms': self.espera_max * 1000,
+            'tamano_lote': self.histograma_lote.exportar(),
+            'espera_cola_ms': self.histograma_espera_ms.exportar(),
+            'esperas_agotadas': self._esperas_agotadas,
+        }
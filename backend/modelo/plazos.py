@@ -0,0 +1,51 @@
+"""Plazo de cada petición para sus operaciones de base de datos.
+
+El plazo se fija al empezar la petición (PETICION_PLAZO_S, o PETICION_PLAZO_LARGO_S
+en las vistas marcadas con con_plazo_largo) y se pasa hacia abajo: la espera
+del pool, el connect_timeout y el statement_timeout de PostgreSQL usan solo lo
+que queda, de modo que una base de datos lenta no retiene al worker más allá
+del plazo.
+"""
+import math
+import time
+from flask import request, has_request_context
+from config import PETICION_PLAZO_S, PETICION_PLAZO_LARGO_S, DB_CONEXION_TIMEOUT_S
+from modelo.interruptor import InterruptorCircuito, BDNoDisponible, respuesta_no_disponible
+
+
+def con_plazo_largo(vista):
+    """Marca una vista que recorre o carga muchas filas (exportación, importación)"""
+    vista.plazo_s = PETICION_PLAZO_LARGO_S
+    return vista
+
+
+def plazo_restante():
+    """Segundos que le quedan a la petición en curso, o None fuera de una petición"""
+    if not has_request_context():
+        return None
+    vence = request.environ.get('plazo_bd')
+    return None if vence is None else vence - time.monotonic()
+
+
+def timeout_conexion():
+    """connect_timeout de libpq: DB_CONEXION_TIMEOUT_S, recortado al plazo de la petición"""
+    restante = plazo_restante()
+    if restante is None:
+        return DB_CONEXION_TIMEOUT_S
+    # libpq trata 0 como "sin límite" y redondea por debajo de 2 a 2
+    return max(min(DB_CONEXION_TIMEOUT_S, math.ceil(restante)), 2)
+
+
+def registrar_plazos(app):
+    # El estado del interruptor aparece en /api/metricas desde el arranque
+    InterruptorCircuito.global_()
+
+    @app.before_request
+    def _fijar_plazo():
+        # Se guarda en el environ: la generación en streaming usa otro contexto de aplicación
+        vista = app.view_functions.get(request.endpoint)
+        request.environ['plazo_bd'] = time.monotonic() + getattr(vista, 'plazo_s', PETICION_PLAZO_S)
+
+    @app.errorhandler(BDNoDisponible)
+    def _bd_no_disponible(error):
+        return respuesta_no_disponible()
@@ -0,0 +1,127 @@
+import asyncio
+import select
+import time
+from config import (
+    get_db_config, POOL_ASYNC_MIN, POOL_ASYNC_MAX, POOL_VIDA_MAXIMA_S, POOL_ESPERA_MAX_S,
+    POOL_VERIFICAR_INACTIVA_S, DB_KEEPALIVES_IDLE_S, DB_CONEXION_TIMEOUT_S, PETICION_PLAZO_S
+)
+from modelo.metricas import Metricas
+from modelo.instrumentacion import medicion_actual
+from modelo.interruptor import InterruptorCircuito, BDNoDisponible, PlazoAgotado, es_fallo_bd
+from modelo.plazos import plazo_restante
+
+
+async def _verificar_conexion(conn):
+    """Como el pool síncrono: sin ida y vuelta, una conexión inactiva con el socket legible está rota"""
+    legible, _, _ = select.select([conn.fileno()], [], [], 0)
+    if conn.closed or legible:
+        from psycopg import OperationalError
+        raise OperationalError("Conexión cerrada por el servidor")
+
+
+class PoolAsync:
+    """Pool de conexiones asíncronas (psycopg 3) para las vistas async del modo ASGI.
+
+    Esperar una conexión o una consulta suspende la corrutina en el bucle de
+    eventos: ninguna petición ocupa un hilo mientras PostgreSQL responde.
+    """
+    _global = None
+    _lock_global = None
+
+    @classmethod
+    async def global_(cls):
+        """Pool único del proceso, abierto al primer uso (o en el arranque ASGI)"""
+        if cls._global is None:
+            if cls._lock_global is None:
+                cls._lock_global = asyncio.Lock()
+            async with cls._lock_global:
+                if cls._global is None:
+                    from psycopg.conninfo import make_conninfo
+                    from psycopg_pool import AsyncConnectionPool
+                    db_config = get_db_config()
+                    pool = AsyncConnectionPool(
+                        make_conninfo(
+                            host=db_config['host'],
+                            dbname=db_config['database'],
+                            user=db_config['user'],
+                            password=db_config['password'],
+                            port=db_config.get('port', 5432),
+                            keepalives=1,
+                            keepalives_idle=DB_KEEPALIVES_IDLE_S,
+                            keepalives_interval=max(DB_KEEPALIVES_IDLE_S // 3, 1),
+                            keepalives_count=3,
+                            connect_timeout=DB_CONEXION_TIMEOUT_S,
+                            # Solo atiende peticiones: ninguna consulta pasa del plazo en el servidor
+                            options=f"-c statement_timeout={int(PETICION_PLAZO_S * 1000)}",
+                        ),
+                        min_size=POOL_ASYNC_MIN,
+                        max_size=POOL_ASYNC_MAX,
+                        timeout=POOL_ESPERA_MAX_S,
+                        max_lifetime=POOL_VIDA_MAXIMA_S,
+                        max_idle=max(POOL_VERIFICAR_INACTIVA_S, 60),
+                        check=_verificar_conexion,
+                        # Solo lecturas: en autocommit no se envían BEGIN ni COMMIT (una ida y vuelta por consulta)
+                        kwargs={'autocommit': True},
+                        open=False,
+                    )
+                    # Sin esperar al mínimo: la base de datos puede no estar disponible al arrancar
+                    await pool.open(wait=False)
+                    Metricas.registrar('pool_async', pool.get_stats)
+                    cls._global = pool
+        return cls._global
+
+    @classmethod
+    async def cerrar(cls):
+        if cls._global is not None:
+            pool, cls._global = cls._global, None
+            await pool.close()
+
+    @classmethod
+    async def consultar(cls, sql, params=None):
+        """(nombres de columna, filas) de una consulta de solo lectura, dentro del plazo de la petición.
+
+        Un timeout o error de conexión cuenta para el interruptor y se lanza como
+        BDNoDisponible (503).
+        """
+        interruptor = InterruptorCircuito.global_()
+        interruptor.permitir()
+        restante = plazo_restante()
+        if restante is not None and restante <= 0:
+            raise PlazoAgotado("Se agotó el plazo de la petición")
+        try:
+            # Cancelar la espera abandona la conexión: el pool la descarta al devolverla
+            async with asyncio.timeout(restante):
+                resultado = await cls._consultar(sql, params)
+        except Exception as e:
+            if not es_fallo_bd(e):
+                raise
+            interruptor.fallo()
+            raise BDNoDisponible(str(e) or "La base de datos no respondió dentro del plazo") from e
+        interruptor.exito()
+        return resultado
+
+    @classmethod
+    async def _consultar(cls, sql, params):
+        pool = await cls.global_()
+        medicion = medicion_actual()
+        inicio = time.perf_counter()
+        async with pool.connection() as conn:
+            if medicion is None:
+                cur = await conn.execute(sql, params)
+                filas = await cur.fetchall()
+                return [desc.name for desc in cur.description], filas
+            medicion.conexion(inicio)
+            inicio = time.perf_counter()
+            cur = None
+            try:
+                cur = await conn.execute(sql, params)
+                filas = await cur.fetchall()
+            finally:
+                medicion.consulta(sql, inicio, cur.rowcount if cur is not None else None)
+            medicion.filas += len(filas)
+            return [desc.name for desc in cur.description], filas
+
+    @classmethod
+    async def consultar_uno(cls, sql, params=None):
+        _, filas = await cls.consultar(sql, params)
+        return filas[0] if filas else None
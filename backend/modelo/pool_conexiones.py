@@ -0,0 +1,246 @@
+import os
+import select
+import threading
+import time
+from collections import deque
+import psycopg2
+import psycopg2.extensions
+from config import (
+    get_db_config, POOL_CONEXIONES_MIN, POOL_CONEXIONES_MAX, POOL_VIDA_MAXIMA_S,
+    POOL_ESPERA_MAX_S, POOL_VERIFICAR_INACTIVA_S, POOL_MODO, DB_KEEPALIVES_IDLE_S
+)
+from modelo.metricas import Histograma, Metricas
+from modelo.plazos import plazo_restante, timeout_conexion
+
+
+class PoolAgotado(psycopg2.OperationalError):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+
+def _esperar_gevent(conn, timeout=None):
+    """Callback de espera de psycopg2 que cede el control al hub de gevent"""
+    from gevent.socket import wait_read, wait_write
+    while True:
+        estado = conn.poll()
+        if estado == psycopg2.extensions.POLL_OK:
+            break
+        elif estado == psycopg2.extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif estado == psycopg2.extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Estado de poll inesperado: {estado}")
+
+
+class ConexionPrestada:
+    """Conexión tomada del pool: close() la devuelve al pool en lugar de cerrarla"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *error):
+        return self._conn.__exit__(*error)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+
+class _Entrada:
+    __slots__ = ('conn', 'creada', 'usada')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.creada = time.monotonic()
+        self.usada = self.creada
+
+
+class PoolConexiones:
+    """Pool de conexiones PostgreSQL compartido por todas las clases Modelo*"""
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, minimo=POOL_CONEXIONES_MIN, maximo=POOL_CONEXIONES_MAX, vida_maxima=POOL_VIDA_MAXIMA_S,
+                 espera_maxima=POOL_ESPERA_MAX_S, verificar_inactiva=POOL_VERIFICAR_INACTIVA_S, modo=POOL_MODO):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.vida_maxima = vida_maxima
+        self.espera_maxima = espera_maxima
+        self.verificar_inactiva = verificar_inactiva
+        self.modo = modo
+        if modo == 'gevent':
+            import gevent.lock
+            psycopg2.extensions.set_wait_callback(_esperar_gevent)
+            self._capacidad = gevent.lock.BoundedSemaphore(maximo)
+            self._lock = gevent.lock.RLock()
+        else:
+            self._capacidad = threading.BoundedSemaphore(maximo)
+            self._lock = threading.Lock()
+        self._inactivas = deque()
+        self._prestadas = {}
+        self._creadas = 0
+        self._descartadas = 0
+        self._agotamientos = 0
+        self.histograma_espera_ms = Histograma([0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000])
+        self._llenar_minimo()
+
+    @classmethod
+    def global_(cls):
+        """Pool único del proceso, creado al primer uso"""
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = PoolConexiones()
+                    Metricas.registrar('pool_conexiones', cls._global.estadisticas)
+        return cls._global
+
+    def _conectar(self):
+        db_config = get_db_config()
+        conn = psycopg2.connect(
+            host=db_config['host'],
+            database=db_config['database'],
+            user=db_config['user'],
+            password=db_config['password'],
+            port=db_config.get('port', 5432),
+            keepalives=1,
+            keepalives_idle=DB_KEEPALIVES_IDLE_S,
+            keepalives_interval=max(DB_KEEPALIVES_IDLE_S // 3, 1),
+            keepalives_count=3,
+            connect_timeout=timeout_conexion()
+        )
+        with self._lock:
+            self._creadas += 1
+        return _Entrada(conn)
+
+    def _llenar_minimo(self):
+        try:
+            for _ in range(self.minimo):
+                entrada = self._conectar()
+                with self._lock:
+                    self._inactivas.append(entrada)
+        except psycopg2.Error as e:
+            # La base de datos puede no estar disponible al arrancar; se reintenta al usarla
+            print(f"No se pudo abrir el mínimo de conexiones del pool: {e}")
+
+    def _descartar(self, entrada):
+        with self._lock:
+            self._descartadas += 1
+        try:
+            entrada.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _esta_viva(self, entrada):
+        """Comprueba la conexión sin ida y vuelta salvo que lleve mucho tiempo inactiva"""
+        conn = entrada.conn
+        if conn.closed:
+            return False
+        try:
+            if time.monotonic() - entrada.usada > self.verificar_inactiva:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+                return True
+            # Una conexión inactiva no debería tener nada pendiente de leer: si el
+            # socket está legible, el servidor la cerró o envió un error fatal
+            legible, _, _ = select.select([conn.fileno()], [], [], 0)
+            return not legible
+        except (psycopg2.Error, OSError, ValueError):
+            return False
+
+    def tomar(self):
+        inicio = time.perf_counter()
+        # Dentro de una petición no se espera más de lo que le queda de plazo
+        espera = self.espera_maxima
+        restante = plazo_restante()
+        if restante is not None:
+            espera = max(min(espera, restante), 0)
+        if not self._capacidad.acquire(timeout=espera):
+            with self._lock:
+                self._agotamientos += 1
+            raise PoolAgotado(f"No hay conexiones libres tras {espera:.1f}s de espera")
+        self.histograma_espera_ms.observar((time.perf_counter() - inicio) * 1000)
+        try:
+            while True:
+                with self._lock:
+                    entrada = self._inactivas.pop() if self._inactivas else None
+                if entrada is None:
+                    entrada = self._conectar()
+                    break
+                if time.monotonic() - entrada.creada > self.vida_maxima or not self._esta_viva(entrada):
+                    self._descartar(entrada)
+                    continue
+                break
+        except Exception:
+            self._capacidad.release()
+            raise
+        with self._lock:
+            self._prestadas[id(entrada.conn)] = entrada
+        return ConexionPrestada(self, entrada.conn)
+
+    def devolver(self, conn):
+        with self._lock:
+            entrada = self._prestadas.pop(id(conn), None)
+        if entrada is None:
+            return
+        try:
+            estado = conn.get_transaction_status() if not conn.closed else None
+            if estado == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                reutilizable = True
+            elif estado in (psycopg2.extensions.TRANSACTION_STATUS_INTRANS, psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+                # Consultas de solo lectura que no cerraron su transacción
+                conn.rollback()
+                reutilizable = True
+            else:
+                reutilizable = False
+        except psycopg2.Error:
+            reutilizable = False
+
+        if reutilizable and time.monotonic() - entrada.creada <= self.vida_maxima:
+            entrada.usada = time.monotonic()
+            with self._lock:
+                self._inactivas.append(entrada)
+        else:
+            self._descartar(entrada)
+        self._capacidad.release()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'modo': self.modo,
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'en_uso': len(self._prestadas),
+                'inactivas': len(self._inactivas),
+                'creadas': self._creadas,
+                'descartadas': self._descartadas,
+                'agotamientos': self._agotamientos,
+                'espera_ms': self.histograma_espera_ms.exportar(),
+            }
+
+    @classmethod
+    def _despues_de_fork(cls):
+        # Las conexiones heredadas comparten socket con el padre: no se cierran
+        # (enviaría Terminate por el socket del padre), simplemente se abandonan
+        if cls._global is not None:
+            PoolConexiones._heredadas = list(cls._global._inactivas) + list(cls._global._prestadas.values())
+        cls._global = None
+        cls._lock_global = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=PoolConexiones._despues_de_fork)
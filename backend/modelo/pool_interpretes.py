@@ -0,0 +1,63 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from config import MODELO_PATH, POOL_INTERPRETES, HILOS_INTERPRETE
+from modelo.metricas import Histograma
+from modelo.tabla_riesgo import predecir_lote_con_interprete
+
+
+class PoolInterpretes:
+    """Conjunto acotado de intérpretes TFLite preasignados.
+
+    Un intérprete no admite set_tensor/invoke concurrentes, así que cada
+    petición toma uno en exclusiva y lo devuelve al terminar.
+    """
+
+    def __init__(self, ruta_modelo=MODELO_PATH, tamano=POOL_INTERPRETES, hilos=HILOS_INTERPRETE):
+        import tensorflow as tf
+        self.tamano = tamano
+        self.hilos = hilos
+        self._libres = queue.LifoQueue()
+        for _ in range(tamano):
+            interprete = tf.lite.Interpreter(model_path=ruta_modelo, num_threads=hilos)
+            interprete.allocate_tensors()
+            self._libres.put(interprete)
+        self.histograma_espera_ms = Histograma([0.05, 0.1, 0.5, 1, 2, 5, 10, 50, 100])
+        self._en_uso = 0
+        self._lock = threading.Lock()
+
+    def tomar(self):
+        inicio = time.perf_counter()
+        interprete = self._libres.get()
+        self.histograma_espera_ms.observar((time.perf_counter() - inicio) * 1000)
+        with self._lock:
+            self._en_uso += 1
+        return interprete
+
+    def devolver(self, interprete):
+        with self._lock:
+            self._en_uso -= 1
+        self._libres.put(interprete)
+
+    @contextmanager
+    def prestar(self):
+        interprete = self.tomar()
+        try:
+            yield interprete
+        finally:
+            self.devolver(interprete)
+
+    def predecir_lote(self, datos_entrada):
+        with self.prestar() as interprete:
+            return predecir_lote_con_interprete(interprete, datos_entrada)
+
+    def estadisticas(self):
+        with self._lock:
+            en_uso = self._en_uso
+        return {
+            'tamano': self.tamano,
+            'hilos_por_interprete': self.hilos,
+            'en_uso': en_uso,
+            'espera_ms': self.histograma_espera_ms.exportar(),
+        }
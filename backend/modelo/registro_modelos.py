@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from modelo.metricas import Metricas
+
+
+def _memoria_residente():
+    """Memoria residente actual del proceso en bytes"""
+    try:
+        with open('/proc/self/statm') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _cargar_diagnostico():
+    from modelo.modelo_diagnostico import ModeloDiagnostico
+    return ModeloDiagnostico()
+
+
+class RegistroModelos:
+    """Carga cada modelo como máximo una vez por proceso y lo comparte entre peticiones.
+
+    Llamar a precargar() antes de que gunicorn haga fork (gunicorn --preload)
+    permite que los workers compartan las páginas del modelo copy-on-write.
+    """
+    _cargadores = {
+        'diagnostico': _cargar_diagnostico,
+    }
+    _instancias = {}
+    _estadisticas = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def registrar(cls, nombre, cargador):
+        with cls._lock:
+            cls._cargadores[nombre] = cargador
+            cls._instancias.pop(nombre, None)
+
+    @classmethod
+    def obtener(cls, nombre='diagnostico'):
+        instancia = cls._instancias.get(nombre)
+        if instancia is not None:
+            return instancia
+        with cls._lock:
+            instancia = cls._instancias.get(nombre)
+            if instancia is None:
+                instancia = cls._cargar(nombre)
+        return instancia
+
+    @classmethod
+    def _cargar(cls, nombre):
+        memoria_inicial = _memoria_residente()
+        inicio = time.perf_counter()
+        instancia = cls._cargadores[nombre]()
+        segundos = time.perf_counter() - inicio
+        memoria = max(_memoria_residente() - memoria_inicial, 0)
+        cls._instancias[nombre] = instancia
+        cls._estadisticas[nombre] = {
+            'pid': os.getpid(),
+            'segundos_carga': round(segundos, 4),
+            'memoria_bytes': memoria,
+        }
+        print(f"Modelo '{nombre}' cargado en {segundos:.3f}s (+{memoria / 2**20:.1f} MiB, pid {os.getpid()})")
+        return instancia
+
+    @classmethod
+    def precargar(cls, nombres=None):
+        """Carga explícitamente los modelos indicados (o todos) antes de atender peticiones"""
+        for nombre in nombres or list(cls._cargadores):
+            cls.obtener(nombre)
+
+    @classmethod
+    def estadisticas(cls):
+        return {nombre: dict(datos) for nombre, datos in cls._estadisticas.items()}
+
+    @classmethod
+    def _despues_de_fork(cls):
+        # El lock pudo quedar tomado por otro hilo del padre, y los intérpretes
+        # de TFLite no sobreviven al fork (su pool de hilos no se copia)
+        cls._lock = threading.Lock()
+        for nombre, instancia in list(cls._instancias.items()):
+            if not getattr(instancia, 'seguro_para_fork', False):
+                cls._instancias.pop(nombre)
+                cls._estadisticas.pop(nombre, None)
+
+
+Metricas.registrar('modelos', RegistroModelos.estadisticas)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=RegistroModelos._despues_de_fork)
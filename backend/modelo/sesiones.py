@@ -0,0 +1,226 @@
+"""Sesiones guardadas en el servidor: la cookie solo lleva un identificador opaco.
+
+Con la sesión de Flask por defecto todo (identidad y ultimo_diagnostico) viaja
+firmado en la cookie y /api/sesion volvía a consultar el usuario en cada
+sondeo. Aquí los datos se guardan en un almacén del servidor (SESION_ALMACEN):
+una LRU en memoria para un solo worker o un archivo SQLite local que comparten
+todos los workers de la máquina. La identidad del login queda en la sesión, de
+modo que /api/sesion se responde sin ir a PostgreSQL.
+
+La caducidad es deslizante: cada petición aplaza SESION_TTL_S el vencimiento
+(en SQLite, como mucho una escritura cada SESION_RENOVAR_S). Al cambiar el
+usuario de la sesión (login) se emite un identificador nuevo.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from config import SESION_ALMACEN, SESION_TTL_S, SESION_RENOVAR_S, SESION_MAX, SESION_SQLITE_PATH
+from modelo.metricas import Metricas
+from modelo.sqlite_local import SqliteLocal
+
+# El mismo formato que la cookie firmada de Flask (tuplas, fechas, bytes...)
+_serializador = TaggedJSONSerializer()
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    def __init__(self, datos=None, sid=None):
+        def al_modificar(sesion):
+            sesion.modified = True
+            sesion.accessed = True
+
+        super().__init__(datos, al_modificar)
+        self.sid = sid
+        # Para renovar el identificador si cambia el usuario (fijación de sesión)
+        self.usuario_inicial = self.get('user_id')
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, clave):
+        self.accessed = True
+        return super().__getitem__(clave)
+
+    def get(self, clave, defecto=None):
+        self.accessed = True
+        return super().get(clave, defecto)
+
+    def setdefault(self, clave, defecto=None):
+        self.accessed = True
+        return super().setdefault(clave, defecto)
+
+
+class AlmacenSesionesMemoria:
+    """LRU del proceso: solo sirve con un único worker"""
+
+    def __init__(self, maximo=SESION_MAX, ttl=SESION_TTL_S):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sesiones = OrderedDict()
+
+    def cargar(self, sid, ahora):
+        with self._lock:
+            entrada = self._sesiones.get(sid)
+            if entrada is None:
+                return None
+            datos, vence = entrada
+            if vence <= ahora:
+                del self._sesiones[sid]
+                return None
+            self._sesiones[sid] = (datos, ahora + self.ttl)
+            self._sesiones.move_to_end(sid)
+            return datos
+
+    def guardar(self, sid, datos, ahora):
+        with self._lock:
+            self._sesiones[sid] = (datos, ahora + self.ttl)
+            self._sesiones.move_to_end(sid)
+            while len(self._sesiones) > self.maximo:
+                self._sesiones.popitem(last=False)
+
+    def borrar(self, sid):
+        with self._lock:
+            self._sesiones.pop(sid, None)
+
+    def entradas(self):
+        return len(self._sesiones)
+
+
+class AlmacenSesionesSqlite:
+    """Sesiones en un archivo SQLite local compartido por los workers de la máquina"""
+
+    def __init__(self, ruta=SESION_SQLITE_PATH, ttl=SESION_TTL_S, renovar=SESION_RENOVAR_S):
+        self.archivo = SqliteLocal(
+            ruta, "CREATE TABLE IF NOT EXISTS sesiones (sid TEXT PRIMARY KEY, datos TEXT NOT NULL, vence REAL NOT NULL)"
+        )
+        self.ttl = ttl
+        self.renovar = renovar
+        self._proxima_purga = 0
+
+    def cargar(self, sid, ahora):
+        conn = self.archivo.conexion()
+        fila = conn.execute("SELECT datos, vence FROM sesiones WHERE sid = ?", (sid,)).fetchone()
+        if fila is None or fila[1] <= ahora:
+            return None
+        # Aplazar el vencimiento es una escritura: solo si hace más de SESION_RENOVAR_S de la última
+        if fila[1] - ahora < self.ttl - self.renovar:
+            conn.execute("UPDATE sesiones SET vence = ? WHERE sid = ?", (ahora + self.ttl, sid))
+        return fila[0]
+
+    def guardar(self, sid, datos, ahora):
+        conn = self.archivo.conexion()
+        conn.execute("INSERT OR REPLACE INTO sesiones (sid, datos, vence) VALUES (?, ?, ?)", (sid, datos, ahora + self.ttl))
+        if ahora >= self._proxima_purga:
+            self._proxima_purga = ahora + 60
+            conn.execute("DELETE FROM sesiones WHERE vence <= ?", (ahora,))
+
+    def borrar(self, sid):
+        self.archivo.conexion().execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def entradas(self):
+        return self.archivo.conexion().execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+
+class InterfazSesiones(SessionInterface):
+    """session_interface de Flask sobre un almacén del servidor"""
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self, almacen=None):
+        if almacen is None:
+            almacen = AlmacenSesionesSqlite() if SESION_ALMACEN == 'sqlite' else AlmacenSesionesMemoria()
+        self.almacen = almacen
+        self._lock = threading.Lock()
+        self._cargadas = 0
+        self._desconocidas = 0
+        self._guardadas = 0
+        self._borradas = 0
+
+    @classmethod
+    def global_(cls):
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = InterfazSesiones()
+                    Metricas.registrar('sesiones', cls._global.estadisticas)
+        return cls._global
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return SesionServidor()
+        datos = self.almacen.cargar(sid, time.time())
+        with self._lock:
+            if datos is None:
+                self._desconocidas += 1
+            else:
+                self._cargadas += 1
+        if datos is None:
+            # Cookie caducada o de otro almacén: se empieza una sesión vacía
+            return SesionServidor()
+        return SesionServidor(_serializador.loads(datos), sid)
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified:
+                # Logout: la sesión desaparece del servidor, no solo de la cookie
+                if session.sid is not None:
+                    self.almacen.borrar(session.sid)
+                    self._contar(borradas=1)
+                response.delete_cookie(
+                    nombre, domain=dominio, path=ruta, secure=self.get_cookie_secure(app),
+                    partitioned=self.get_cookie_partitioned(app), samesite=self.get_cookie_samesite(app),
+                    httponly=self.get_cookie_httponly(app)
+                )
+                response.vary.add('Cookie')
+            return
+
+        nueva = session.sid is None or session.get('user_id') != session.usuario_inicial
+        if nueva:
+            if session.sid is not None:
+                self.almacen.borrar(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+        if nueva or session.modified:
+            self.almacen.guardar(session.sid, _serializador.dumps(dict(session)), time.time())
+            self._contar(guardadas=1)
+        # Sin cambios, la cookie ya lleva el identificador: un sondeo no reenvía Set-Cookie
+        if nueva or self.should_set_cookie(app, session):
+            response.set_cookie(
+                nombre, session.sid, expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app), domain=dominio, path=ruta,
+                secure=self.get_cookie_secure(app), partitioned=self.get_cookie_partitioned(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+            response.vary.add('Cookie')
+
+    def _contar(self, guardadas=0, borradas=0):
+        with self._lock:
+            self._guardadas += guardadas
+            self._borradas += borradas
+
+    def estadisticas(self):
+        with self._lock:
+            estadisticas = {
+                'almacen': type(self.almacen).__name__,
+                'cargadas': self._cargadas,
+                'desconocidas': self._desconocidas,
+                'guardadas': self._guardadas,
+                'borradas': self._borradas,
+            }
+        estadisticas['entradas'] = self.almacen.entradas()
+        return estadisticas
+
+
+def registrar_sesiones(app):
+    # 'cookie' conserva la sesión firmada de Flask en la propia cookie
+    if SESION_ALMACEN != 'cookie':
+        app.session_interface = InterfazSesiones.global_()
@@ -0,0 +1,28 @@
+"""Archivo SQLite local que comparten los workers de gunicorn de la máquina.
+
+Lo usan el limitador de tasa y las sesiones del servidor: estado efímero y
+pequeño, leído y escrito en cada petición, que no debe ir a PostgreSQL.
+"""
+import os
+import sqlite3
+import threading
+
+
+class SqliteLocal:
+    """Una conexión por hilo y proceso (sqlite3 no comparte conexiones tras un fork)"""
+
+    def __init__(self, ruta, esquema):
+        self.ruta = ruta
+        self.esquema = esquema
+        self._local = threading.local()
+
+    def conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Estado efímero: perder las últimas escrituras en un corte de luz no importa
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(self.esquema)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
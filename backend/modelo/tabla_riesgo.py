@@ -0,0 +1,162 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+# Cantidad de valores posibles de cada variable codificada, en el mismo orden
+# que el vector de entrada del modelo: edad, genero, ps, pd, colesterol,
+# glucosa, fuma, alcohol, actividad, imc
+RADICES = np.array([3, 2, 3, 3, 3, 3, 2, 2, 3, 3], dtype=np.int64)
+
+# Peso de cada posición en el código de base mixta (la última varía más rápido)
+PESOS = np.concatenate([np.cumprod(RADICES[::-1])[::-1][1:], [1]]).astype(np.int64)
+
+TAMANO_DOMINIO = int(np.prod(RADICES))
+
+
+def hash_modelo(ruta_modelo):
+    """Calcula el SHA-256 del archivo .tflite"""
+    with open(ruta_modelo, 'rb') as archivo:
+        return hashlib.sha256(archivo.read()).hexdigest()
+
+
+def enumerar_dominio():
+    """Devuelve todas las entradas posibles ordenadas por su código"""
+    return np.indices(RADICES).reshape(len(RADICES), -1).T.astype(np.float32)
+
+
+def codificar_posicion(datos_entrada):
+    """Convierte una entrada codificada en su código de base mixta, o None si está fuera del dominio"""
+    fila = np.asarray(datos_entrada).reshape(-1)
+    if fila.shape[0] != len(RADICES):
+        return None
+    valores = fila.astype(np.int64)
+    if not np.array_equal(valores, fila):
+        return None
+    if (valores < 0).any() or (valores >= RADICES).any():
+        return None
+    return int(valores @ PESOS)
+
+
+def codificar_posiciones(datos_entrada):
+    """Versión vectorizada de codificar_posicion: devuelve (posiciones, máscara de filas válidas)"""
+    matriz = np.asarray(datos_entrada).reshape(-1, len(RADICES))
+    valores = matriz.astype(np.int64)
+    validas = (valores == matriz).all(axis=1) & (valores >= 0).all(axis=1) & (valores < RADICES).all(axis=1)
+    return np.where(validas, valores @ PESOS, 0), validas
+
+
+def predecir_lote_con_interprete(interprete, datos_entrada):
+    """Ejecuta el intérprete TFLite sobre un lote, redimensionando la entrada si hace falta"""
+    datos_entrada = datos_entrada.astype(np.float32)
+    detalles_entrada = interprete.get_input_details()[0]
+    if tuple(detalles_entrada['shape']) != datos_entrada.shape:
+        interprete.resize_tensor_input(detalles_entrada['index'], datos_entrada.shape)
+        interprete.allocate_tensors()
+    # Escritura directa en el buffer del tensor, sin la copia intermedia de set_tensor
+    interprete.tensor(detalles_entrada['index'])()[...] = datos_entrada
+    interprete.invoke()
+    return interprete.get_tensor(interprete.get_output_details()[0]['index'])
+
+
+class TablaRiesgo:
+    """Resultados del modelo precalculados para todo el dominio de entradas"""
+
+    def __init__(self, probabilidades, hash_modelo):
+        self.probabilidades = np.ascontiguousarray(probabilidades, dtype=np.float32)
+        self.riesgos = np.argmax(self.probabilidades, axis=1).astype(np.int8)
+        self.confianzas = np.max(self.probabilidades, axis=1)
+        self.hash_modelo = hash_modelo
+
+    @staticmethod
+    def construir(predecir_lote, hash_modelo):
+        """Evalúa el modelo una sola vez sobre todas las entradas posibles"""
+        probabilidades = predecir_lote(enumerar_dominio())
+        return TablaRiesgo(probabilidades, hash_modelo)
+
+    @staticmethod
+    def cargar(ruta_tabla, hash_esperado):
+        """Carga la tabla desde disco; devuelve None si no existe o no corresponde al modelo"""
+        if not os.path.exists(ruta_tabla):
+            return None
+        try:
+            with np.load(ruta_tabla, allow_pickle=False) as datos:
+                if str(datos['hash_modelo']) != hash_esperado:
+                    return None
+                probabilidades = datos['probabilidades']
+        except Exception as e:
+            print(f"Tabla de riesgo ilegible, se reconstruirá: {e}")
+            return None
+        if probabilidades.shape[0] != TAMANO_DOMINIO:
+            return None
+        return TablaRiesgo(probabilidades, hash_esperado)
+
+    def guardar(self, ruta_tabla):
+        """Escribe la tabla de forma atómica junto con el hash del modelo"""
+        # Un temporal único en el mismo directorio: varios workers pueden construirla a la vez
+        descriptor, temporal = tempfile.mkstemp(
+            prefix=os.path.basename(ruta_tabla) + '.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(ruta_tabla)))
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                np.savez(archivo, probabilidades=self.probabilidades, hash_modelo=np.array(self.hash_modelo))
+            os.replace(temporal, ruta_tabla)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+    @staticmethod
+    def cargar_o_construir(ruta_modelo, ruta_tabla, predecir_lote):
+        """Obtiene la tabla vigente para el modelo, reconstruyéndola si el hash no coincide.
+
+        Devuelve None si no se pudo construir, en cuyo caso se usa el intérprete directamente.
+        """
+        try:
+            hash_actual = hash_modelo(ruta_modelo)
+            tabla = TablaRiesgo.cargar(ruta_tabla, hash_actual)
+            if tabla is not None:
+                return tabla
+            tabla = TablaRiesgo.construir(predecir_lote, hash_actual)
+        except Exception as e:
+            print(f"No se pudo construir la tabla de riesgo, se usará el intérprete: {e}")
+            return None
+        try:
+            tabla.guardar(ruta_tabla)
+        except OSError as e:
+            print(f"No se pudo guardar la tabla de riesgo: {e}")
+        return tabla
+
+    def buscar(self, datos_entrada):
+        """Devuelve el vector de probabilidades precalculado, o None si la entrada no está en el dominio"""
+        posicion = codificar_posicion(datos_entrada)
+        if posicion is None:
+            return None
+        return self.probabilidades[posicion]
+
+    def resultado(self, datos_entrada):
+        """Devuelve (riesgo, confianza) precalculados, o None si la entrada no está en el dominio"""
+        posicion = codificar_posicion(datos_entrada)
+        if posicion is None:
+            return None
+        return int(self.riesgos[posicion]), float(self.confianzas[posicion])
+
+    def resultados_lote(self, datos_entrada):
+        """Devuelve (riesgos, confianzas) de un lote, o None si alguna fila está fuera del dominio"""
+        posiciones, validas = codificar_posiciones(datos_entrada)
+        if not validas.all():
+            return None
+        return self.riesgos[posiciones].astype(np.int64), self.confianzas[posiciones]
+
+
+if __name__ == '__main__':
+    # Paso de construcción: python -m modelo.tabla_riesgo
+    import tensorflow as tf
+    from config import MODELO_PATH, TABLA_RIESGO_PATH
+
+    interprete = tf.lite.Interpreter(model_path=MODELO_PATH)
+    interprete.allocate_tensors()
+    tabla = TablaRiesgo.construir(
+        lambda lote: predecir_lote_con_interprete(interprete, lote),
+        hash_modelo(MODELO_PATH)
+    )
+    tabla.guardar(TABLA_RIESGO_PATH)
+    print(f"Tabla de riesgo generada: {TAMANO_DOMINIO} entradas en {TABLA_RIESGO_PATH}")
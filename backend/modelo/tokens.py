@@ -0,0 +1,198 @@
+"""Tokens de acceso firmados para los clientes sin cookies (Flutter Web).
+
+El login devuelve un token de acceso corto (TOKEN_ACCESO_TTL_S) y uno de
+refresco (TOKEN_REFRESCO_TTL_S), firmados con SECRET_KEY (itsdangerous,
+HMAC-SHA256). El de acceso lleva id, username y tipo del usuario y se envía
+como "Authorization: Bearer <token>": verificarlo es comprobar la firma y la
+caducidad en CPU, sin ir a la base de datos. Los tokens revocados (logout,
+refresco ya usado) se guardan en memoria solo hasta que caducan; cada proceso
+tiene su lista, de ahí que el token de acceso sea corto.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from flask import jsonify, request, session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from config import SECRET_KEY, TOKEN_ACCESO_TTL_S, TOKEN_REFRESCO_TTL_S
+from modelo.metricas import Metricas
+
+ACCESO = 'acceso'
+REFRESCO = 'refresco'
+_DURACION = {ACCESO: TOKEN_ACCESO_TTL_S, REFRESCO: TOKEN_REFRESCO_TTL_S}
+# Un salt por clase de token: un token de refresco no sirve como token de acceso
+_SERIALIZADORES = {
+    clase: URLSafeTimedSerializer(SECRET_KEY, salt=f'token-{clase}', signer_kwargs={'digest_method': hashlib.sha256})
+    for clase in _DURACION
+}
+
+
+class TokenInvalido(Exception):
+    """Token mal firmado, caducado o revocado"""
+
+
+class ListaRevocacion:
+    """Identificadores (jti) de tokens revocados, hasta la caducidad de cada token"""
+    _global = None
+    _lock_global = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revocados = {}
+        self._ultima_purga = time.time()
+        self._emitidos = 0
+        self._verificados = 0
+        self._rechazados = 0
+        self._revocaciones = 0
+
+    @classmethod
+    def global_(cls):
+        if cls._global is None:
+            with cls._lock_global:
+                if cls._global is None:
+                    cls._global = ListaRevocacion()
+                    Metricas.registrar('tokens', cls._global.estadisticas)
+        return cls._global
+
+    def revocar(self, jti, vence):
+        ahora = time.time()
+        with self._lock:
+            self._revocados[jti] = vence
+            self._revocaciones += 1
+            # Los tokens caducados ya no pasan la verificación: no hace falta recordarlos
+            if ahora - self._ultima_purga >= 60:
+                self._revocados = {jti: vence for jti, vence in self._revocados.items() if vence > ahora}
+                self._ultima_purga = ahora
+
+    def revocado(self, jti):
+        return jti in self._revocados
+
+    def contar(self, emitidos=0, verificados=0, rechazados=0):
+        with self._lock:
+            self._emitidos += emitidos
+            self._verificados += verificados
+            self._rechazados += rechazados
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'emitidos': self._emitidos,
+                'verificados': self._verificados,
+                'rechazados': self._rechazados,
+                'revocaciones': self._revocaciones,
+                'revocados': len(self._revocados),
+            }
+
+
+def emitir_tokens(usuario):
+    """Par de tokens de (id, username, tipo) para la respuesta del login o del refresco"""
+    ListaRevocacion.global_().contar(emitidos=2)
+    return {
+        'access_token': _firmar(ACCESO, usuario),
+        'refresh_token': _firmar(REFRESCO, usuario),
+        'token_type': 'Bearer',
+        'expires_in': TOKEN_ACCESO_TTL_S,
+    }
+
+
+def _firmar(clase, usuario):
+    # Lista en vez de diccionario: el token viaja en cada petición
+    return _SERIALIZADORES[clase].dumps([usuario[0], usuario[1], usuario[2], secrets.token_urlsafe(8)])
+
+
+def leer_token(token, clase=ACCESO):
+    """((id, username, tipo), jti, vence) de un token válido; lanza TokenInvalido si no lo es"""
+    lista = ListaRevocacion.global_()
+    try:
+        datos, emitido = _SERIALIZADORES[clase].loads(token, max_age=_DURACION[clase], return_timestamp=True)
+        usuario_id, username, tipo, jti = datos
+    except (BadSignature, TypeError, ValueError):
+        lista.contar(rechazados=1)
+        raise TokenInvalido("Token inválido o expirado")
+    if lista.revocado(jti):
+        lista.contar(rechazados=1)
+        raise TokenInvalido("Token revocado")
+    lista.contar(verificados=1)
+    return (usuario_id, username, tipo), jti, emitido.timestamp() + _DURACION[clase]
+
+
+def _token_de_cabecera():
+    esquema, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if esquema.lower() == 'bearer' and token.strip() else None
+
+
+def identidad_token():
+    """(id, username, tipo) del token Bearer de la petición, None sin token; TokenInvalido si no vale"""
+    # En el environ: la generación en streaming usa otro contexto de aplicación
+    if 'identidad_token' not in request.environ:
+        token = _token_de_cabecera()
+        request.environ['identidad_token'] = None if token is None else leer_token(token)[0]
+    return request.environ['identidad_token']
+
+
+def identidad_de_ruta(username):
+    """Identidad del token si pertenece al username de la ruta; si no, None"""
+    identidad = identidad_token()
+    if identidad is not None and identidad[1] == username:
+        return identidad
+    return None
+
+
+def _identidad_sesion():
+    if not session.get('logged_in'):
+        return None
+    return session['user_id'], session['username'], session['user_type']
+
+
+def usuario_de_ruta(username):
+    """(id, username, tipo) del usuario de una ruta /<username> si es quien se autentica; si no, None.
+
+    Vale su token Bearer o su sesión: el username de la ruta por sí solo no
+    autentica a nadie, así que no se busca en la base de datos.
+    """
+    identidad = identidad_de_ruta(username)
+    if identidad is None:
+        sesion = _identidad_sesion()
+        if sesion is not None and sesion[1] == username:
+            identidad = sesion
+    return identidad
+
+
+def administrador_autenticado(username=None):
+    """Hay un administrador autenticado por su token Bearer o por la sesión (el de la ruta, si se indica)"""
+    if username is None:
+        identidad = identidad_token() or _identidad_sesion()
+    else:
+        identidad = usuario_de_ruta(username)
+    return identidad is not None and identidad[2] == 'administrador'
+
+
+def refrescar_tokens(token_refresco):
+    """Nuevo par de tokens; el de refresco usado queda revocado (un solo uso)"""
+    usuario, jti, vence = leer_token(token_refresco, REFRESCO)
+    ListaRevocacion.global_().revocar(jti, vence)
+    return emitir_tokens(usuario)
+
+
+def revocar_tokens_peticion():
+    """Logout: revoca el token de acceso de la cabecera y el de refresco del cuerpo, si son válidos"""
+    datos = request.get_json(silent=True) or {}
+    for token, clase in ((_token_de_cabecera(), ACCESO), (datos.get('refresh_token'), REFRESCO)):
+        if not token:
+            continue
+        try:
+            _, jti, vence = leer_token(token, clase)
+        except TokenInvalido:
+            continue
+        ListaRevocacion.global_().revocar(jti, vence)
+
+
+def registrar_tokens(app):
+    ListaRevocacion.global_()
+
+    @app.errorhandler(TokenInvalido)
+    def _token_invalido(error):
+        respuesta = jsonify({'message': str(error)})
+        respuesta.status_code = 401
+        respuesta.headers['WWW-Authenticate'] = 'Bearer'
+        return respuesta
@@ -0,0 +1,302 @@
+import time
+from flask import g, has_app_context, has_request_context
+from config import DB_VERIFICAR_CONEXIONES, BD_MOTOR
+from modelo.instrumentacion import medicion_actual
+from modelo.interruptor import InterruptorCircuito, BDNoDisponible, PlazoAgotado, es_fallo_bd, respuesta_no_disponible
+from modelo.plazos import plazo_restante
+
+
+class _CursorContado:
+    """Cursor que cuenta las idas y vueltas a la base de datos de la petición.
+
+    Con la instrumentación activa también mide cada sentencia y las filas leídas.
+    """
+
+    def __init__(self, cursor, unidad):
+        self._cursor = cursor
+        self._unidad = unidad
+        self._medicion = medicion_actual()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        if self._medicion is None:
+            return iter(self._cursor)
+        return self._contar_filas(iter(self._cursor))
+
+    def _contar_filas(self, filas):
+        for fila in filas:
+            self._medicion.filas += 1
+            yield fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        self._cursor.close()
+
+    def execute(self, consulta, *args, **kwargs):
+        self._unidad.consultas += 1
+        self._unidad.en_transaccion = True
+        return self._ejecutar(consulta, 1, self._cursor.execute, self._con_plazo(consulta), *args, **kwargs)
+
+    def executemany(self, consulta, parametros):
+        parametros = list(parametros)
+        self._unidad.consultas += len(parametros)
+        self._unidad.en_transaccion = True
+        self._fijar_plazo_aparte()
+        return self._ejecutar(consulta, len(parametros), self._cursor.executemany, consulta, parametros)
+
+    def copy_expert(self, consulta, archivo, *args, **kwargs):
+        self._unidad.consultas += 1
+        self._unidad.en_transaccion = True
+        self._fijar_plazo_aparte()
+        return self._ejecutar(consulta, 1, self._cursor.copy_expert, consulta, archivo, *args, **kwargs)
+
+    def _ejecutar(self, consulta, veces, ejecutar, *args, **kwargs):
+        if self._medicion is None:
+            return self._unidad.vigilar(ejecutar, *args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return self._unidad.vigilar(ejecutar, *args, **kwargs)
+        finally:
+            self._medicion.consulta(consulta, inicio, self._cursor.rowcount, veces)
+
+    def _con_plazo(self, consulta):
+        """La sentencia con el SET LOCAL statement_timeout que toque delante: misma ida y vuelta"""
+        ajuste = self._unidad.ajuste_plazo()
+        if not ajuste:
+            return consulta
+        if isinstance(consulta, str) and self._cursor.name is None:
+            return ajuste + consulta
+        # Un cursor de servidor envía DECLARE ... FOR <consulta>: el SET va aparte
+        self._unidad.fijar_plazo(ajuste)
+        return consulta
+
+    def _fijar_plazo_aparte(self):
+        ajuste = self._unidad.ajuste_plazo()
+        if ajuste:
+            self._unidad.fijar_plazo(ajuste)
+
+    # Un cursor de servidor (con nombre) va a buscar las filas en cada fetch
+    def fetchone(self):
+        fila = self._leer(self._cursor.fetchone)
+        if fila is not None and self._medicion is not None:
+            self._medicion.filas += 1
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._leer(self._cursor.fetchmany, *args, **kwargs)
+        if self._medicion is not None:
+            self._medicion.filas += len(filas)
+        return filas
+
+    def fetchall(self):
+        filas = self._leer(self._cursor.fetchall)
+        if self._medicion is not None:
+            self._medicion.filas += len(filas)
+        return filas
+
+    def _leer(self, leer, *args, **kwargs):
+        if self._medicion is None:
+            return leer(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return leer(*args, **kwargs)
+        finally:
+            self._medicion.espera(inicio)
+
+
+class _ConexionPeticion:
+    """Vista de la conexión de la petición que reciben los modelos.
+
+    commit() y rollback() actúan en el momento, como con una conexión propia:
+    un fallo del COMMIT llega a la vista antes de construir la respuesta. close()
+    no libera nada: la conexión se devuelve en el teardown.
+    """
+
+    def __init__(self, unidad):
+        self._unidad = unidad
+
+    def __getattr__(self, nombre):
+        return getattr(self._unidad.conn, nombre)
+
+    def cursor(self, *args, **kwargs):
+        return _CursorContado(self._unidad.conn.cursor(*args, **kwargs), self._unidad)
+
+    def commit(self):
+        self._unidad.confirmar()
+
+    def rollback(self):
+        self._unidad.deshacer()
+
+    def close(self):
+        pass
+
+
+class UnidadTrabajo:
+    """Una conexión por petición HTTP, compartida por todas las llamadas a Modelo*"""
+
+    def __init__(self, abrir_conexion):
+        self._abrir_conexion = abrir_conexion
+        self.conn = None
+        self.conexiones = 0
+        self.consultas = 0
+        # Hay sentencias sin commit ni rollback: al terminar la petición se deshacen
+        self.en_transaccion = False
+        # statement_timeout fijado con SET LOCAL en la transacción actual
+        self.timeout_ms = None
+        # Fallo de disponibilidad de la base de datos: la respuesta de error será un 503
+        self.error_bd = None
+        # Acciones pendientes del próximo commit (invalidar cachés de lo que se escribió)
+        self.al_confirmar = []
+
+    @staticmethod
+    def actual(abrir_conexion):
+        unidad = g.get('unidad_trabajo')
+        if unidad is None:
+            unidad = g.unidad_trabajo = UnidadTrabajo(abrir_conexion)
+        return unidad
+
+    def conexion(self):
+        if self.conn is None:
+            inicio = time.perf_counter()
+            # Obtener la conexión no cuenta como éxito (puede venir del pool): solo las sentencias
+            self.conn = self.vigilar(self._abrir_con_interruptor, exito=False)
+            self.conexiones += 1
+            medicion = medicion_actual()
+            if medicion is not None:
+                medicion.conexion(inicio)
+        return _ConexionPeticion(self)
+
+    def _abrir_con_interruptor(self):
+        InterruptorCircuito.global_().permitir()
+        return self._abrir_conexion()
+
+    def vigilar(self, accion, *args, exito=True, **kwargs):
+        """Ejecuta accion informando al interruptor; un timeout o error de conexión marca la unidad"""
+        try:
+            resultado = accion(*args, **kwargs)
+        except Exception as e:
+            if es_fallo_bd(e):
+                self.error_bd = e
+                if not isinstance(e, BDNoDisponible):
+                    InterruptorCircuito.global_().fallo()
+            raise
+        if exito:
+            InterruptorCircuito.global_().exito()
+        return resultado
+
+    def ajuste_plazo(self):
+        """SET LOCAL statement_timeout con lo que le queda a la petición, o '' si no hace falta.
+
+        Se fija en la primera sentencia de la transacción y solo se vuelve a fijar
+        cuando lo que queda baja de la mitad: una sentencia nunca pasa del doble
+        del plazo restante y las peticiones rápidas no pagan idas y vueltas extra.
+        """
+        if BD_MOTOR != 'postgres':
+            return ''
+        restante = plazo_restante()
+        if restante is None:
+            return ''
+        if restante <= 0:
+            self.error_bd = PlazoAgotado("Se agotó el plazo de la petición")
+            raise self.error_bd
+        milisegundos = int(restante * 1000)
+        if self.timeout_ms is not None and milisegundos * 2 >= self.timeout_ms:
+            return ''
+        self.timeout_ms = milisegundos
+        return f"SET LOCAL statement_timeout = {milisegundos}; "
+
+    def fijar_plazo(self, ajuste):
+        cur = self.conn.cursor()
+        try:
+            self.consultas += 1
+            self.en_transaccion = True
+            self.vigilar(cur.execute, ajuste)
+        finally:
+            cur.close()
+
+    def medir(self, sentencia, accion):
+        """commit o rollback de la conexión, contado (y medido) como una sentencia más y vigilado"""
+        self.consultas += 1
+        medicion = medicion_actual()
+        if medicion is None:
+            return self.vigilar(accion)
+        inicio = time.perf_counter()
+        try:
+            return self.vigilar(accion)
+        finally:
+            medicion.consulta(sentencia, inicio)
+
+    def confirmar(self):
+        """COMMIT de lo que escribió el modelo; después se ejecutan las acciones pendientes"""
+        self.medir('COMMIT', self.conn.commit)
+        # El SET LOCAL statement_timeout acaba con la transacción
+        self.en_transaccion, self.timeout_ms = False, None
+        acciones, self.al_confirmar = self.al_confirmar, []
+        for accion in acciones:
+            accion()
+
+    def deshacer(self):
+        self.en_transaccion, self.timeout_ms = False, None
+        # Lo que se iba a invalidar no llegó a escribirse
+        self.al_confirmar = []
+        self.medir('ROLLBACK', self.conn.rollback)
+
+    def terminar(self):
+        """Cierra la transacción que quede abierta (lecturas sin commit) antes de responder"""
+        if self.conn is not None and self.en_transaccion:
+            self.deshacer()
+
+    def liberar(self):
+        """Devuelve la conexión; el pool deshace lo que siga sin confirmar (petición con excepción)"""
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            conn.close()
+
+
+def conexion_de_peticion(abrir_conexion):
+    """Conexión de la unidad de trabajo actual, o None fuera de una petición"""
+    if not has_request_context():
+        return None
+    return UnidadTrabajo.actual(abrir_conexion).conexion()
+
+
+def al_confirmar(accion):
+    """Ejecuta accion con el próximo commit de la unidad de trabajo; si no hay nada pendiente, ya"""
+    unidad = g.get('unidad_trabajo') if has_app_context() else None
+    if unidad is None or unidad.conn is None or not unidad.en_transaccion:
+        accion()
+    else:
+        unidad.al_confirmar.append(accion)
+
+
+def registrar_unidad_trabajo(app):
+    @app.after_request
+    def _terminar_unidad(respuesta):
+        unidad = g.get('unidad_trabajo')
+        if unidad is None:
+            return respuesta
+        try:
+            # Antes de enviar la respuesta: la conexión no vuelve al pool con una transacción abierta
+            unidad.terminar()
+        except Exception as e:
+            # Solo se descartaban lecturas: la respuesta sigue siendo válida
+            print(f"Error al cerrar la transacción de la petición: {e}")
+        if DB_VERIFICAR_CONEXIONES:
+            respuesta.headers['X-DB-Conexiones'] = str(unidad.conexiones)
+            respuesta.headers['X-DB-Consultas'] = str(unidad.consultas)
+            assert unidad.conexiones <= 1, f"La petición abrió {unidad.conexiones} conexiones a la base de datos"
+        # Las vistas convierten cualquier excepción en un 500: si la causa fue la
+        # base de datos (timeout, conexión, interruptor abierto, COMMIT fallido) se responde 503
+        if unidad.error_bd is not None and respuesta.status_code >= 500:
+            return respuesta_no_disponible()
+        return respuesta
+
+    @app.teardown_appcontext
+    def _liberar_unidad(error):
+        unidad = g.pop('unidad_trabajo', None)
+        if unidad is not None:
+            unidad.liberar()
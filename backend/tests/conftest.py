@@ -0,0 +1,92 @@
+"""Configuración común de las pruebas (pytest desde backend/).
+
+Las variables se fijan antes de que nada importe config.py: las pruebas usan
+SQLite, sin pool ni persistencia diferida, con el limitador y las sesiones en
+memoria, y las rutas de los archivos del modelo no dependen del directorio de
+trabajo.
+"""
+import os
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['BD_MOTOR'] = 'sqlite'
+os.environ['PERSISTENCIA_DIFERIDA'] = '0'
+os.environ['POOL_CONEXIONES_ACTIVO'] = '0'
+os.environ['LIMITADOR_ALMACEN'] = 'memoria'
+os.environ['SESION_ALMACEN'] = 'memoria'
+# La app se importa en el fixture cliente, ya con la base de la prueba
+os.environ['PRECARGAR_MODELOS'] = '0'
+os.environ.setdefault('MODELO_PATH', os.path.join(BACKEND, 'modeloDEC.tflite'))
+
+from tests.datos import diagnostico
+
+
+@pytest.fixture(scope='session', autouse=True)
+def tabla_riesgo(tmp_path_factory):
+    """La tabla de riesgo que construyan las pruebas se guarda en un directorio temporal"""
+    from modelo import modelo_diagnostico
+    with pytest.MonkeyPatch.context() as parche:
+        parche.setattr(modelo_diagnostico, 'TABLA_RIESGO_PATH', str(tmp_path_factory.mktemp('modelo') / 'tabla_riesgo.npz'))
+        yield
+
+
+@pytest.fixture
+def bd(tmp_path, monkeypatch):
+    """Base SQLite vacía, con las migraciones aplicadas, solo para esta prueba"""
+    from modelo import almacenamiento
+    from modelo.cache_usuarios import CacheUsuarios
+    from modelo.migraciones import aplicar_migraciones
+    from modelo.modelo import abrir_conexion_bd
+    ruta = str(tmp_path / 'pruebas.db')
+    monkeypatch.setattr(almacenamiento, 'SQLITE_PATH', ruta)
+    # La caché de usernames es del proceso: no debe arrastrar ids de otra base
+    monkeypatch.setattr(CacheUsuarios, '_global', None)
+    conn = abrir_conexion_bd()
+    aplicar_migraciones(conn)
+    conn.close()
+    yield ruta
+    conexion = almacenamiento._locales.conexiones.pop(ruta, None)
+    if conexion is not None:
+        conexion.close()
+
+
+@pytest.fixture
+def pacientes(bd):
+    """ana, beto y carla registrados con la contraseña 'clave': {username: id}"""
+    from modelo.modelo_usuario import ModeloUsuario
+    for username in ('ana', 'beto', 'carla'):
+        ok, error = ModeloUsuario.registrar_usuario(username, 'clave', 'paciente', username.title(), 'Prueba', None, None, None, None, None)
+        assert ok, error
+    return {username: usuario[0] for username, usuario in ModeloUsuario.buscar_usuarios_por_username(['ana', 'beto', 'carla']).items()}
+
+
+@pytest.fixture
+def administrador(pacientes):
+    """Id del administrador 'admin' (contraseña 'clave')"""
+    from modelo.modelo_usuario import ModeloUsuario
+    ok, error = ModeloUsuario.registrar_usuario('admin', 'clave', 'administrador', 'Admin', 'Prueba', None, None, None, None, None)
+    assert ok, error
+    return ModeloUsuario.buscar_usuario_por_username('admin')[0]
+
+
+@pytest.fixture
+def cliente(pacientes, monkeypatch):
+    """Cliente de la app Flask sobre la base de la prueba, con los contadores del limitador a cero"""
+    from modelo.limitador import Limitador, AlmacenMemoria
+    from app import app
+    monkeypatch.setattr(Limitador.global_(), 'almacen', AlmacenMemoria())
+    return app.test_client()
+
+
+@pytest.fixture
+def historial(pacientes):
+    """Tres diagnósticos de ana (el último de riesgo 2) más uno antiguo, y 120 de beto"""
+    from datetime import datetime, timedelta
+    from modelo.modelo_resultados import ModeloResultados
+    for riesgo in (0, 1, 2):
+        assert ModeloResultados.guardar_diagnostico(*diagnostico(pacientes['ana'], riesgo))
+    assert ModeloResultados.guardar_diagnosticos_lote([diagnostico(pacientes['beto'], i % 3) for i in range(120)])
+    antigua = datetime.now() - timedelta(days=30)
+    assert ModeloResultados.guardar_diagnosticos_lote([diagnostico(pacientes['ana'], 0)], [antigua])
+    return pacientes
@@ -0,0 +1,34 @@
+"""Filas de prueba compartidas por varios archivos"""
+
+
+# Cuerpo válido de POST /api/diagnostico
+REGISTRO = {
+    'edad': 50, 'genero': 'Femenino', 'ps': 130, 'pd': 85, 'colesterol': 210, 'glucosa': 90,
+    'fuma': 'n', 'alcohol': 'n', 'actividad': '1-2 veces', 'peso': 70, 'estatura': 165,
+}
+
+
+def diagnostico(usuario_id, riesgo, confianza=0.9):
+    return (usuario_id, 50, 'Femenino', 130, 85, 210.0, 90.0, 'n', 'n', '1-2 veces', 70.0, 165, 25.7, riesgo, confianza)
+
+
+def password(username):
+    from modelo.modelo import abrir_conexion_bd
+    conn = abrir_conexion_bd()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT password FROM usuarios WHERE username = %s", (username,))
+        return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def tokens(cliente, username, password='clave'):
+    """Tokens del login de username, pedidos con otro cliente: el de la prueba no recibe la cookie de sesión"""
+    respuesta = cliente.application.test_client().post('/api/login', json={'username': username, 'password': password})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return respuesta.get_json()
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,60 @@
+"""Rutas de administrador por /<username>: exigen el token Bearer o la sesión de un administrador"""
+from modelo.modelo_usuario import ModeloUsuario
+from tests.datos import REGISTRO, bearer, tokens
+
+
+def _rechazos(cliente, metodo, ruta, **kwargs):
+    """Códigos sin credenciales, con el token de un paciente, con el del administrador en la
+    ruta de otro y con un token inválido"""
+    ana = bearer(tokens(cliente, 'ana')['access_token'])
+    admin = bearer(tokens(cliente, 'admin')['access_token'])
+    casos = [
+        (ruta.format('admin'), {}),
+        (ruta.format('ana'), ana),
+        (ruta.format('ana'), admin),
+        (ruta.format('admin'), bearer('no-es-un-token')),
+    ]
+    return [cliente.open(ruta, method=metodo, headers=cabeceras, **kwargs).status_code for ruta, cabeceras in casos]
+
+
+def test_exportar(cliente, administrador, historial):
+    assert _rechazos(cliente, 'GET', '/api/admin/{}/exportar') == [403, 403, 403, 401]
+    respuesta = cliente.get('/api/admin/admin/exportar', headers=bearer(tokens(cliente, 'admin')['access_token']))
+    assert respuesta.status_code == 200
+    # Cabecera más los 4 diagnósticos de ana y los 120 de beto
+    assert len(respuesta.get_data(as_text=True).splitlines()) == 125
+
+
+def test_importar(cliente, administrador):
+    archivo = "username,password,nombre,genero\ndario,clave,Darío,Masculino\n"
+    assert _rechazos(cliente, 'POST', '/api/admin/{}/importar', data=archivo, content_type='text/csv') == [403, 403, 403, 401]
+    # Ninguna de las peticiones rechazadas llegó a importar
+    assert ModeloUsuario.buscar_usuario_por_username('dario') is None
+    respuesta = cliente.post('/api/admin/admin/importar', data=archivo, content_type='text/csv',
+                             headers=bearer(tokens(cliente, 'admin')['access_token']))
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['pacientes_nuevos'] == 1
+    assert ModeloUsuario.buscar_usuario_por_username('dario')[1] == 'dario'
+
+
+def test_lote(cliente, administrador):
+    registros = [dict(REGISTRO, username='ana'), dict(REGISTRO, username=7)]
+    assert _rechazos(cliente, 'POST', '/api/diagnostico/lote/{}', json=registros) == [403, 403, 403, 401]
+    respuesta = cliente.post('/api/diagnostico/lote/admin', json=registros,
+                             headers=bearer(tokens(cliente, 'admin')['access_token']))
+    assert respuesta.status_code == 200
+    lote = respuesta.get_json()
+    assert [r['username'] for r in lote['resultados']] == ['ana']
+    # Un username que no es texto se rechaza en su fila en vez de romper el lote
+    assert lote['errores'] == [{'indice': 1, 'message': "El campo 'username' debe ser un texto"}]
+
+
+def test_metricas(cliente, administrador):
+    assert cliente.get('/api/metricas').status_code == 403
+    assert cliente.get('/api/metricas', headers=bearer(tokens(cliente, 'ana')['access_token'])).status_code == 403
+    assert cliente.get('/api/metricas', headers=bearer('no-es-un-token')).status_code == 401
+    respuesta = cliente.get('/api/metricas', headers=bearer(tokens(cliente, 'admin')['access_token']))
+    assert respuesta.status_code == 200
+    assert 'tokens' in respuesta.get_json()
+    assert cliente.post('/api/login', json={'username': 'admin', 'password': 'clave'}).status_code == 200
+    assert cliente.get('/api/metricas').status_code == 200
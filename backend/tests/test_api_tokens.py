@@ -0,0 +1,66 @@
+"""Tokens Bearer y rutas /<username>: el username de la ruta no autentica a nadie"""
+import pytest
+from tests.datos import bearer, tokens
+
+
+def test_login_emite_tokens_que_autentican_la_ruta(cliente):
+    par = tokens(cliente, 'ana')
+    assert par['token_type'] == 'Bearer' and par['access_token'] and par['refresh_token']
+    respuesta = cliente.get('/api/resultados/ana', headers=bearer(par['access_token']))
+    assert respuesta.status_code == 200
+    assert respuesta.get_json() == {'diagnostico': None}
+
+
+def test_token_invalido_401(cliente):
+    respuesta = cliente.get('/api/resultados/ana', headers=bearer('no-es-un-token'))
+    assert respuesta.status_code == 401
+    assert respuesta.headers['WWW-Authenticate'] == 'Bearer'
+
+
+def test_refresco_de_un_solo_uso(cliente):
+    par = tokens(cliente, 'ana')
+    respuesta = cliente.post('/api/token/refrescar', json={'refresh_token': par['refresh_token']})
+    assert respuesta.status_code == 200
+    nuevo = respuesta.get_json()
+    assert cliente.get('/api/configuracion/ana', headers=bearer(nuevo['access_token'])).status_code == 200
+    # El refresh_token ya canjeado queda revocado
+    assert cliente.post('/api/token/refrescar', json={'refresh_token': par['refresh_token']}).status_code == 401
+    # Un token de acceso no sirve como token de refresco
+    assert cliente.post('/api/token/refrescar', json={'refresh_token': nuevo['access_token']}).status_code == 401
+
+
+def test_logout_revoca_los_tokens(cliente):
+    par = tokens(cliente, 'ana')
+    respuesta = cliente.post('/api/logout', headers=bearer(par['access_token']), json={'refresh_token': par['refresh_token']})
+    assert respuesta.status_code == 200
+    assert cliente.get('/api/resultados/ana', headers=bearer(par['access_token'])).status_code == 401
+    assert cliente.post('/api/token/refrescar', json={'refresh_token': par['refresh_token']}).status_code == 401
+
+
+@pytest.mark.parametrize('ruta', ['/api/resultados/ana', '/api/configuracion/ana'])
+def test_lecturas_de_la_ruta_exigen_al_propio_usuario(cliente, ruta):
+    # Sin token ni sesión, aunque ana existe
+    assert cliente.get(ruta).status_code == 401
+    # Con el token de otro paciente
+    assert cliente.get(ruta, headers=bearer(tokens(cliente, 'beto')['access_token'])).status_code == 401
+    # Con su sesión
+    assert cliente.post('/api/login', json={'username': 'ana', 'password': 'clave'}).status_code == 200
+    assert cliente.get(ruta).status_code == 200
+
+
+def test_diagnostico_de_la_ruta_exige_al_propio_usuario(cliente):
+    respuesta = cliente.post('/api/diagnostico/ana', json={'edad': 50})
+    assert respuesta.status_code == 401
+
+
+@pytest.mark.parametrize('ruta', ['/api/admin/{}', '/api/admin/{}/diagnosticos/{}'])
+def test_rutas_de_administrador(cliente, administrador, historial, ruta):
+    de_admin, de_ana = ruta.format('admin', historial['ana']), ruta.format('ana', historial['ana'])
+    token_ana = tokens(cliente, 'ana')['access_token']
+    # El username de un administrador en la ruta no basta
+    assert cliente.get(de_admin).status_code == 403
+    assert cliente.get(de_admin, headers=bearer(token_ana)).status_code == 403
+    assert cliente.get(de_ana, headers=bearer(token_ana)).status_code == 403
+    assert cliente.get(de_admin, headers=bearer(tokens(cliente, 'admin')['access_token'])).status_code == 200
+    assert cliente.post('/api/login', json={'username': 'admin', 'password': 'clave'}).status_code == 200
+    assert cliente.get(de_admin).status_code == 200
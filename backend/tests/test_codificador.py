@@ -0,0 +1,68 @@
+"""ESPECIFICACION reproduce las condiciones encadenadas que sustituyó, límite a límite"""
+import math
+import numpy as np
+import pytest
+from modelo.codificador import ESPECIFICACION, codificar, codificar_columnas, leer_registro
+from tests.datos import REGISTRO
+
+GENEROS = ['Femenino', 'femenino', 'FEMENINO', 'Mujer femenina', 'Masculino', 'masculino', 'Otro', '']
+ACTIVIDADES = [
+    'No realiza', 'no', 'NO', 'Nunca', 'Ninguna', '1-2 veces por semana', '1-2 veces', '1 vez', '2 veces',
+    '3 o más veces', '3-4 veces', '12 veces', 'Diario', '',
+]
+# Valores fuera de rango y sin número
+EXTREMOS = [-1e9, -1.0, 0.0, 1e9, math.inf, -math.inf, math.nan]
+
+
+def codificar_original(d):
+    """Las condiciones de los controladores anteriores a ESPECIFICACION, tal cual"""
+    edad, genero, ps, pd, col, glu = d['edad'], d['genero'], d['ps'], d['pd'], d['colesterol'], d['glucosa']
+    fuma, alcohol, actividad, imc = d['fuma'], d['alcohol'], d['actividad'], d['imc']
+    return [
+        0 if edad < 45 else 1 if edad <= 59 else 2,
+        0 if 'femenino' in genero.lower() else 1,
+        0 if ps < 120 else 1 if ps <= 139 else 2,
+        0 if pd < 80 else 1 if pd <= 89 else 2,
+        0 if col < 200 else 1 if col <= 239 else 2,
+        0 if glu < 100 else 1 if glu <= 125 else 2,
+        1 if fuma == 's' else 0,
+        1 if alcohol == 's' else 0,
+        2 if 'no' in actividad.lower() else 1 if '1' in actividad or '2' in actividad else 0,
+        1 if imc == 0 else 1 if imc < 18.5 else 0 if imc < 25 else 1 if imc < 30 else 2
+    ]
+
+
+def _alrededor(limite):
+    """El límite, los float64 contiguos y los enteros vecinos"""
+    return [limite - 1, np.nextafter(limite, -math.inf), limite, np.nextafter(limite, math.inf), limite + 1]
+
+
+def _registros():
+    base = leer_registro(REGISTRO)
+    variaciones = [('genero', genero) for genero in GENEROS] + [('actividad', actividad) for actividad in ACTIVIDADES]
+    variaciones += [(campo, valor) for campo in ('fuma', 'alcohol') for valor in ('s', 'n', 'S', 'si', '')]
+    for campo, limites in (('edad', (45, 59)), ('ps', (120, 139)), ('pd', (80, 89)),
+                           ('colesterol', (200, 239)), ('glucosa', (100, 125)), ('imc', (18.5, 25, 30))):
+        valores = [float(valor) for limite in limites for valor in _alrededor(limite)] + EXTREMOS
+        variaciones += [(campo, valor) for valor in valores]
+    return [dict(base, **{campo: valor}) for campo, valor in variaciones]
+
+
+REGISTROS = _registros()
+
+
+@pytest.mark.parametrize('registro', REGISTROS)
+def test_ruta_escalar_igual_que_las_condiciones(registro):
+    assert codificar(registro)[0].tolist() == codificar_original(registro)
+
+
+def test_ruta_columnar_igual_que_las_condiciones():
+    columnas = {variable.campo: [r[variable.campo] for r in REGISTROS] for variable in ESPECIFICACION}
+    assert codificar_columnas(columnas).tolist() == [codificar_original(r) for r in REGISTROS]
+
+
+@pytest.mark.parametrize('estatura', [0, -170, '0'])
+def test_estatura_no_positiva_rechazada(estatura):
+    # Antes 0 acababa en un ZeroDivisionError (500) y una estatura negativa daba un IMC positivo
+    with pytest.raises(ValueError, match='estatura'):
+        leer_registro(dict(REGISTRO, estatura=estatura))
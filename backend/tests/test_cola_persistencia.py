@@ -0,0 +1,82 @@
+"""Persistencia diferida: workers configurados, drenado con SIGTERM y lectura de lo propio"""
+import os
+import signal
+import subprocess
+import sys
+import pytest
+from modelo.cola_persistencia import ColaPersistencia, workers_configurados
+from tests.datos import REGISTRO, bearer, tokens
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Proceso con una cola cuya ventana de agrupación no vence sola: solo el drenado escribe
+PROCESO_CON_COLA = """
+import sys, time
+from modelo.cola_persistencia import ColaPersistencia, drenar_al_terminar
+
+def guardar_lote(filas, fechas):
+    with open(sys.argv[1], 'a') as archivo:
+        archivo.write(f"{len(filas)}\\n")
+
+cola = ColaPersistencia(guardar_lote, archivo=sys.argv[2], intervalo_ms=600000, reintento_s=600)
+cola._arrancar()
+drenar_al_terminar(cola)
+for usuario_id in range(3):
+    cola.encolar((usuario_id,) + (0,) * 12 + (1, 0.9))
+print('listo', flush=True)
+time.sleep(600)
+"""
+
+
+@pytest.mark.parametrize('argumentos, entorno, esperados', [
+    ([], {}, 1),
+    (['-w', '4'], {}, 4),
+    (['--workers=2'], {}, 2),
+    (['-w3'], {}, 3),
+    ([], {'WEB_CONCURRENCY': '5'}, 5),
+    ([], {'GUNICORN_CMD_ARGS': '--workers 6'}, 6),
+    # Los valores mal formados se ignoran: pasa a la siguiente fuente
+    (['-w', 'muchos'], {'WEB_CONCURRENCY': '2'}, 2),
+    (['--workers='], {}, 1),
+    ([], {'WEB_CONCURRENCY': 'auto'}, 1),
+])
+def test_workers_configurados(monkeypatch, argumentos, entorno, esperados):
+    monkeypatch.setattr(sys, 'argv', ['app.py'] + argumentos)
+    for variable in ('WEB_CONCURRENCY', 'GUNICORN_CMD_ARGS'):
+        monkeypatch.delenv(variable, raising=False)
+    for variable, valor in entorno.items():
+        monkeypatch.setenv(variable, valor)
+    assert workers_configurados() == esperados
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='SIGTERM no se puede capturar en Windows')
+def test_sigterm_drena_la_cola(tmp_path):
+    escritas = tmp_path / 'escritas.txt'
+    proceso = subprocess.Popen(
+        [sys.executable, '-c', PROCESO_CON_COLA, str(escritas), str(tmp_path / 'pendientes.jsonl')],
+        cwd=BACKEND, stdout=subprocess.PIPE, text=True)
+    try:
+        assert proceso.stdout.readline().strip() == 'listo'
+        proceso.send_signal(signal.SIGTERM)
+        assert proceso.wait(timeout=30) == 128 + signal.SIGTERM
+    finally:
+        proceso.kill()
+        proceso.stdout.close()
+    assert escritas.read_text().split() == ['3']
+    assert not os.path.exists(tmp_path / 'pendientes.jsonl')
+
+
+def test_lectura_de_lo_propio_con_persistencia_diferida(cliente, monkeypatch, tmp_path):
+    from modelo import modelo_resultados
+    monkeypatch.setattr(modelo_resultados, 'PERSISTENCIA_DIFERIDA', True)
+    # Sin arrancar el hilo: el diagnóstico sigue en la cola durante toda la prueba
+    cola = ColaPersistencia(modelo_resultados.ModeloResultados.insertar_diagnosticos_lote,
+                            archivo=str(tmp_path / 'pendientes.jsonl'))
+    monkeypatch.setattr(ColaPersistencia, '_global', cola)
+    cabeceras = bearer(tokens(cliente, 'ana')['access_token'])
+
+    respuesta = cliente.post('/api/diagnostico/ana', json=REGISTRO, headers=cabeceras)
+    assert respuesta.status_code == 200
+    assert cola.estadisticas()['pendientes'] == 1
+    ultimo = cliente.get('/api/resultados/ana', headers=cabeceras).get_json()['diagnostico']
+    assert (ultimo['riesgo'], ultimo['confianza']) == (respuesta.get_json()['riesgo'], respuesta.get_json()['confianza'])
@@ -0,0 +1,71 @@
+"""Diagnósticos, resumen por paciente, paginación y exportación"""
+from datetime import date, datetime
+from modelo.migraciones import diferencias_resumen_pacientes, reconstruir_resumen_pacientes
+from modelo.modelo import abrir_conexion_bd
+from modelo.modelo_admin import ModeloAdmin, COLUMNAS_EXPORTACION
+from modelo.modelo_configuracion import ModeloConfiguracion
+from modelo.modelo_resultados import ModeloResultados
+
+
+def test_datos_personales(pacientes):
+    datos = {
+        'nombre': 'Ana', 'apellido': 'López', 'fecha_nacimiento': date(1980, 5, 17), 'genero': 'Femenino',
+        'telefono': '555', 'direccion': 'Calle 1', 'dni': '12345678',
+    }
+    assert ModeloConfiguracion.actualizar_datos_usuario(pacientes['ana'], datos)
+    assert ModeloConfiguracion.obtener_datos_usuario(pacientes['ana']) == datos
+
+
+def test_ultimo_diagnostico(historial):
+    # El diagnóstico antiguo guardado después no pasa a ser el último
+    ultimo = ModeloResultados.obtener_ultimo_diagnostico(historial['ana'])
+    assert ultimo[0] == 2 and isinstance(ultimo[2], datetime)
+    assert ModeloResultados.obtener_ultimo_diagnostico(historial['carla']) is None
+
+
+def test_resumen_pacientes(historial):
+    pacientes = {fila[1]: fila for fila in ModeloAdmin.obtener_pacientes()}
+    assert (pacientes['ana'][4], pacientes['beto'][4], pacientes['carla'][4]) == (4, 120, 0)
+    assert len(pacientes['ana'][5]) == 19 and pacientes['carla'][5] is None
+    assert [fila[1] for fila in ModeloAdmin.obtener_pacientes('bet')] == ['beto']
+
+
+def test_reconstruir_resumen(historial):
+    conn = abrir_conexion_bd()
+    try:
+        assert diferencias_resumen_pacientes(conn) == []
+        assert reconstruir_resumen_pacientes(conn) == 2
+        assert diferencias_resumen_pacientes(conn) == []
+    finally:
+        conn.close()
+
+
+def test_paginacion_pacientes(historial):
+    paginas, cursor = [], None
+    while True:
+        pagina, cursor = ModeloAdmin.obtener_pacientes_pagina('', 2, cursor)
+        paginas += pagina
+        if cursor is None:
+            break
+    assert sorted(paginas) == sorted(ModeloAdmin.obtener_pacientes())
+    assert ModeloAdmin.contar_pacientes() == 3
+
+
+def test_paginacion_historial(historial):
+    paginas, cursor = [], None
+    while True:
+        pagina, cursor, total = ModeloAdmin.obtener_historial_pagina(historial['beto'], 50, cursor)
+        paginas += pagina
+        if cursor is None:
+            break
+    assert total == 120 and len(paginas) == 120
+    assert len(ModeloAdmin.obtener_historial_diagnosticos(historial['beto'])) == 120
+    fechas = [fila['fecha_diagnostico'] for fila in paginas]
+    assert fechas == sorted(fechas, reverse=True)
+
+
+def test_exportacion(historial):
+    filas = [fila for bloque in ModeloAdmin.exportar_diagnosticos(bloque=7) for fila in bloque]
+    assert len(filas) == 124 and all(len(fila) == len(COLUMNAS_EXPORTACION) for fila in filas)
+    filas = [fila for bloque in ModeloAdmin.exportar_diagnosticos(historial['ana']) for fila in bloque]
+    assert len(filas) == 4 and {fila[1] for fila in filas} == {'ana'}
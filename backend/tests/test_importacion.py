@@ -0,0 +1,79 @@
+"""Importación masiva de pacientes y diagnósticos desde CSV"""
+import io
+from datetime import datetime
+import pytest
+from modelo.migraciones import diferencias_resumen_pacientes
+from modelo.modelo import abrir_conexion_bd
+from modelo.modelo_admin import ModeloAdmin
+from modelo.modelo_configuracion import ModeloConfiguracion
+from modelo.modelo_importacion import ModeloImportacion
+from modelo.modelo_resultados import ModeloResultados
+from modelo.modelo_usuario import ModeloUsuario
+
+MEDICION = "50,130,85,210,90,n,n,1-2 veces,70,165"
+ARCHIVO = "\n".join([
+    "username,password,nombre,apellido,fecha_nacimiento,genero,telefono,direccion,dni,"
+    "edad,ps,pd,colesterol,glucosa,fuma,alcohol,actividad,peso,estatura,fecha_diagnostico",
+    f"dario,clave,Darío,Ruiz,1970-02-03,Masculino,,,111,{MEDICION},2020-01-05 10:00:00",
+    f"dario,,,,,Masculino,,,,{MEDICION},2020-02-01",
+    f"dario2,clave,Darío,Ruiz,,Masculino,,,111,{MEDICION},2020-03-01",
+    f"elena,,Elena,Soto,,Femenino,,,,{MEDICION},2020-01-01",
+    f"ana,,,,,Femenino,,,,{MEDICION},2019-06-01",
+    f"otra_ana,clave,,,,Femenino,,,12345678,{MEDICION},2019-07-01",
+    f"ana,,,,,Femenino,,,999,{MEDICION},2019-08-01",
+    "dario,,,,,Masculino,,,,x,130,85,210,90,n,n,1-2 veces,70,165,2020-04-01",
+    f",clave,,,,Femenino,,,,{MEDICION},2020-04-01",
+    f"dario,,,,,Masculino,,,,{MEDICION},2020-01-05 10:00:00",
+    "fede,clave,Fede,Gil,,Masculino,,,,,,,,,,,,,,",
+])
+# Línea del archivo (contando la cabecera) -> texto del error
+ERRORES = {5: 'sin contraseña', 8: 'no coincide', 9: "'edad'", 10: "'username'", 11: 'repetido'}
+
+
+@pytest.fixture
+def ana_con_dni(historial):
+    """El DNI de ana identifica sus filas aunque lleguen con otro username"""
+    datos = ModeloConfiguracion.obtener_datos_usuario(historial['ana'])
+    assert ModeloConfiguracion.actualizar_datos_usuario(historial['ana'], {**datos, 'dni': '12345678'})
+    return historial
+
+
+def test_simulacion_no_escribe(ana_con_dni):
+    simulado = ModeloImportacion.importar_csv(io.StringIO(ARCHIVO), simular=True)
+    assert simulado['simulada'] and simulado['pacientes_nuevos'] == 2
+    assert ModeloAdmin.contar_pacientes() == 3
+    assert ModeloImportacion.importar_csv(io.StringIO(ARCHIVO), bloque=4) == {**simulado, 'simulada': False}
+
+
+def test_informe(ana_con_dni):
+    informe = ModeloImportacion.importar_csv(io.StringIO(ARCHIVO), bloque=4)
+    assert (informe['filas'], informe['pacientes_nuevos'], informe['diagnosticos'], informe['rechazadas']) == (11, 2, 5, 5)
+    errores = {error['linea']: error['message'] for error in informe['errores']}
+    assert sorted(errores) == sorted(ERRORES)
+    assert all(texto in errores[linea] for linea, texto in ERRORES.items()), errores
+
+
+def test_pacientes_y_diagnosticos(ana_con_dni):
+    # Inexistente guardado en la caché antes del alta masiva
+    assert ModeloUsuario.buscar_usuario_por_username('dario') is None
+    ModeloImportacion.importar_csv(io.StringIO(ARCHIVO), bloque=4)
+    pacientes = {fila[1]: fila for fila in ModeloAdmin.obtener_pacientes()}
+    assert sorted(pacientes) == ['ana', 'beto', 'carla', 'dario', 'fede']
+    dario = (pacientes['dario'][0], 'dario', 'paciente')
+    assert ModeloUsuario.buscar_usuario_por_username('dario') == dario
+    assert ModeloUsuario.buscar_usuario('dario', 'clave') == dario
+    assert (pacientes['dario'][4], pacientes['ana'][4], pacientes['fede'][4]) == (3, 6, 0)
+    # Las mediciones antiguas no sustituyen al último diagnóstico del paciente
+    assert ModeloResultados.obtener_ultimo_diagnostico(ana_con_dni['ana'])[2].year > 2020
+    assert ModeloResultados.obtener_ultimo_diagnostico(pacientes['dario'][0])[2] == datetime(2020, 3, 1)
+
+
+def test_reimportar_no_duplica(ana_con_dni):
+    ModeloImportacion.importar_csv(io.StringIO(ARCHIVO))
+    informe = ModeloImportacion.importar_csv(io.StringIO(ARCHIVO))
+    assert (informe['pacientes_nuevos'], informe['diagnosticos'], informe['rechazadas']) == (0, 0, 10)
+    conn = abrir_conexion_bd()
+    try:
+        assert diferencias_resumen_pacientes(conn) == []
+    finally:
+        conn.close()
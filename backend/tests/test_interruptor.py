@@ -0,0 +1,19 @@
+"""Interruptor de la base de datos: con el circuito abierto las peticiones responden 503 sin esperar"""
+from modelo.interruptor import InterruptorCircuito
+from tests.datos import bearer, tokens
+
+
+def test_circuito_abierto_503_con_retry_after(cliente, monkeypatch):
+    cabeceras = bearer(tokens(cliente, 'ana')['access_token'])
+    # Con SQLite el interruptor no se activa solo: se abre a mano tras un fallo
+    interruptor = InterruptorCircuito(fallos_max=1, espera=30)
+    interruptor.activo = True
+    interruptor.fallo()
+    monkeypatch.setattr(InterruptorCircuito, '_global', interruptor)
+
+    respuesta = cliente.get('/api/resultados/ana', headers=cabeceras)
+    assert respuesta.status_code == 503
+    assert 1 <= int(respuesta.headers['Retry-After']) <= 30
+    assert interruptor.estadisticas()['rechazadas'] == 1
+    # Lo que no necesita la base de datos sigue respondiendo
+    assert cliente.get('/api/sesion').status_code == 200
@@ -0,0 +1,67 @@
+"""Cubetas de fichas del limitador de tasa, en memoria y en SQLite"""
+import time
+import pytest
+from modelo.limitador import Limitador, AlmacenMemoria, AlmacenSqlite, TasaExcedida, leer_limites
+
+LIMITES = 'login.ip=3/60,login.usuario=2/60'
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def almacen(request, tmp_path):
+    if request.param == 'memoria':
+        return AlmacenMemoria(fragmentos=4)
+    return AlmacenSqlite(ruta=str(tmp_path / 'limitador.db'))
+
+
+def test_leer_limites():
+    assert leer_limites(LIMITES) == {'login': {'ip': (3.0, 60.0), 'usuario': (2.0, 60.0)}}
+    with pytest.raises(ValueError):
+        leer_limites('login.cookie=3/60')
+
+
+def test_cubeta_por_usuario(almacen):
+    limitador = Limitador(leer_limites(LIMITES), almacen)
+    limitador.comprobar('login', '10.0.0.1', 'ana')
+    limitador.comprobar('login', '10.0.0.1', 'ana')
+    # Sin fichas para ana aunque cambie de IP
+    with pytest.raises(TasaExcedida) as error:
+        limitador.comprobar('login', '10.0.0.2', 'ana')
+    assert 0 < error.value.espera <= 30
+
+
+def test_cubeta_por_ip(almacen):
+    limitador = Limitador(leer_limites(LIMITES), almacen)
+    for username in ('ana', 'beto', 'carla'):
+        limitador.comprobar('login', '10.0.0.1', username)
+    with pytest.raises(TasaExcedida):
+        limitador.comprobar('login', '10.0.0.1', 'dario')
+    estadisticas = limitador.estadisticas()
+    assert estadisticas['rechazadas'] == {'login': 1} and estadisticas['errores'] == 0
+
+
+def test_cubeta_se_rellena(almacen):
+    ahora = time.time()
+    for _ in range(3):
+        assert almacen.consumir('login:ip:10.0.0.1', 3, 3 / 60, ahora)[0]
+    assert not almacen.consumir('login:ip:10.0.0.1', 3, 3 / 60, ahora)[0]
+    # 3 fichas por minuto: una cada 20 s
+    assert almacen.consumir('login:ip:10.0.0.1', 3, 3 / 60, ahora + 20)[0]
+
+
+def test_grupo_sin_limites(almacen):
+    limitador = Limitador(leer_limites(LIMITES), almacen)
+    for _ in range(10):
+        limitador.comprobar('otro', '10.0.0.1', 'ana')
+    assert almacen.claves() == 0
+
+
+def test_login_429_con_retry_after(cliente, monkeypatch):
+    # Cinco intentos por usuario y una ficha nueva cada 12 s
+    monkeypatch.setattr(Limitador.global_(), 'limites', leer_limites('login.usuario=5/60'))
+    for _ in range(5):
+        assert cliente.post('/api/login', json={'username': 'ana', 'password': 'otra'}).status_code == 401
+    respuesta = cliente.post('/api/login', json={'username': 'ana', 'password': 'clave'})
+    assert respuesta.status_code == 429
+    assert 1 <= int(respuesta.headers['Retry-After']) <= 12
+    # La cubeta es por usuario: beto sigue pudiendo entrar
+    assert cliente.post('/api/login', json={'username': 'beto', 'password': 'clave'}).status_code == 200
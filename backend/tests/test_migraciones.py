@@ -0,0 +1,27 @@
+"""Las consultas calientes se resuelven con índices (EXPLAIN QUERY PLAN sobre SQLite)"""
+import pytest
+from modelo.almacenamiento import conexion_sqlite
+from modelo.migraciones import CONSULTAS_CALIENTES, verificar_indices
+
+
+@pytest.fixture(scope='module')
+def escaneos(tmp_path_factory):
+    conn = conexion_sqlite(str(tmp_path_factory.mktemp('indices') / 'indices.db'))
+    try:
+        return verificar_indices(conn)
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('consulta', [nombre for nombre, _, _ in CONSULTAS_CALIENTES])
+def test_consulta_caliente_sin_escaneos_completos(escaneos, consulta):
+    assert escaneos[consulta] == []
+
+
+def test_verificar_no_toca_la_base_conectada(bd):
+    conn = conexion_sqlite(bd)
+    cur = conn.cursor()
+    for _ in range(2):
+        assert not any(verificar_indices(conn, pacientes=20, diagnosticos=2).values())
+        cur.execute("SELECT COUNT(*) FROM usuarios")
+        assert cur.fetchone()[0] == 0
@@ -0,0 +1,32 @@
+"""Paridad del motor NumPy con el intérprete de TensorFlow Lite en todo el dominio de entradas"""
+import numpy as np
+import pytest
+from config import MODELO_PATH
+from modelo.motor_numpy import MotorNumpy
+from modelo.tabla_riesgo import enumerar_dominio, predecir_lote_con_interprete
+
+tf = pytest.importorskip('tensorflow')
+
+
+@pytest.fixture(scope='module')
+def predicciones():
+    dominio = enumerar_dominio()
+    interprete = tf.lite.Interpreter(model_path=MODELO_PATH)
+    interprete.allocate_tensors()
+    return dominio, predecir_lote_con_interprete(interprete, dominio), MotorNumpy(MODELO_PATH).predecir_lote(dominio)
+
+
+def test_recorre_todo_el_dominio(predicciones):
+    dominio, esperado, obtenido = predicciones
+    assert len(dominio) == 17496
+    assert obtenido.shape == esperado.shape
+
+
+def test_mismas_probabilidades(predicciones):
+    _, esperado, obtenido = predicciones
+    assert float(np.max(np.abs(esperado - obtenido))) < 1e-5
+
+
+def test_mismo_riesgo(predicciones):
+    _, esperado, obtenido = predicciones
+    assert np.array_equal(np.argmax(esperado, axis=1), np.argmax(obtenido, axis=1))
@@ -0,0 +1,38 @@
+"""Microlotes: la espera de cada fila no pasa del plazo de la petición"""
+import threading
+import time
+import numpy as np
+from flask import Flask
+from modelo.planificador_lotes import PlanificadorLotes
+
+app = Flask(__name__)
+
+
+def _planificador(liberar):
+    def predecir_lote(datos):
+        # Solo el despachador se queda bloqueado; la predicción directa responde
+        if threading.current_thread().name == 'planificador-lotes':
+            liberar.wait(10)
+        return datos * 2
+    return PlanificadorLotes(predecir_lote, max_lote=4, espera_max_ms=1)
+
+
+def test_prediccion_agrupada():
+    liberar = threading.Event()
+    liberar.set()
+    planificador = _planificador(liberar)
+    assert planificador.predecir(np.ones((1, 3))).tolist() == [2, 2, 2]
+    assert planificador.estadisticas()['esperas_agotadas'] == 0
+
+
+def test_despachador_bloqueado_predice_dentro_del_plazo():
+    liberar = threading.Event()
+    planificador = _planificador(liberar)
+    try:
+        with app.test_request_context(environ_base={'plazo_bd': time.monotonic() + 0.2}):
+            inicio = time.monotonic()
+            assert planificador.predecir(np.ones((1, 3))).tolist() == [2, 2, 2]
+            assert time.monotonic() - inicio < 2
+        assert planificador.estadisticas()['esperas_agotadas'] == 1
+    finally:
+        liberar.set()
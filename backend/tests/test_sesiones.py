@@ -0,0 +1,54 @@
+"""Almacenes de sesiones del servidor: caducidad deslizante y borrado"""
+import time
+import pytest
+from modelo.sesiones import AlmacenSesionesMemoria, AlmacenSesionesSqlite
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def almacen(request, tmp_path):
+    if request.param == 'memoria':
+        return AlmacenSesionesMemoria(maximo=2, ttl=100)
+    return AlmacenSesionesSqlite(ruta=str(tmp_path / 'sesiones.db'), ttl=100, renovar=10)
+
+
+def test_caducidad_deslizante(almacen):
+    ahora = time.time()
+    almacen.guardar('a', '{"user_id": 1}', ahora)
+    assert almacen.cargar('a', ahora + 50) == '{"user_id": 1}'
+    # La carga anterior la aplazó hasta ahora + 150
+    assert almacen.cargar('a', ahora + 120) is not None
+    assert almacen.cargar('a', ahora + 500) is None
+
+
+def test_desconocida_y_borrada(almacen):
+    ahora = time.time()
+    assert almacen.cargar('desconocida', ahora) is None
+    almacen.guardar('b', '{}', ahora)
+    almacen.borrar('b')
+    assert almacen.cargar('b', ahora) is None
+
+
+def test_memoria_no_pasa_del_maximo():
+    almacen = AlmacenSesionesMemoria(maximo=2, ttl=100)
+    for sid in ('x', 'y', 'z'):
+        almacen.guardar(sid, '{}', time.time())
+    assert almacen.entradas() == 2 and almacen.cargar('x', time.time()) is None
+
+
+def test_api_sesion_desde_la_sesion_del_servidor(cliente, pacientes, monkeypatch):
+    from modelo import unidad_trabajo
+    from modelo.sesiones import InterfazSesiones
+    monkeypatch.setattr(unidad_trabajo, 'DB_VERIFICAR_CONEXIONES', True)
+    assert cliente.get('/api/sesion').get_json() == {'message': 'No hay sesión activa'}
+    assert cliente.post('/api/login', json={'username': 'ana', 'password': 'clave'}).status_code == 200
+    sid = cliente.get_cookie('session').value
+    # La cookie es un identificador opaco: los datos están en el almacén del servidor
+    assert 'ana' in InterfazSesiones.global_().almacen.cargar(sid, time.time())
+    respuesta = cliente.get('/api/sesion')
+    assert respuesta.get_json() == {'logged_in': True, 'user_id': pacientes['ana'], 'username': 'ana', 'user_type': 'paciente'}
+    # Sin consultas a la base de datos, a diferencia de una lectura del historial
+    assert respuesta.headers.get('X-DB-Consultas', '0') == '0'
+    assert int(cliente.get('/api/resultados').headers['X-DB-Consultas']) > 0
+    assert cliente.post('/api/logout').status_code == 200
+    assert InterfazSesiones.global_().almacen.cargar(sid, time.time()) is None
+    assert cliente.get('/api/sesion').get_json() == {'message': 'No hay sesión activa'}
@@ -0,0 +1,34 @@
+"""Guardado atómico de la tabla de riesgo precalculada"""
+import os
+import numpy as np
+import pytest
+from modelo.tabla_riesgo import TAMANO_DOMINIO, TablaRiesgo
+
+
+def _tabla(riesgo):
+    probabilidades = np.zeros((TAMANO_DOMINIO, 3), dtype=np.float32)
+    probabilidades[:, riesgo] = 1
+    return TablaRiesgo(probabilidades, f'hash-{riesgo}')
+
+
+def test_guardar_reemplaza_sin_dejar_temporales(tmp_path):
+    ruta = str(tmp_path / 'tabla_riesgo.npz')
+    _tabla(0).guardar(ruta)
+    _tabla(2).guardar(ruta)
+    assert os.listdir(tmp_path) == ['tabla_riesgo.npz']
+    assert TablaRiesgo.cargar(ruta, 'hash-0') is None
+    assert TablaRiesgo.cargar(ruta, 'hash-2').riesgos.tolist() == [2] * TAMANO_DOMINIO
+
+
+def test_guardar_fallido_no_deja_temporales(tmp_path, monkeypatch):
+    ruta = str(tmp_path / 'tabla_riesgo.npz')
+    _tabla(0).guardar(ruta)
+
+    def savez_roto(*args, **kwargs):
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(np, 'savez', savez_roto)
+    with pytest.raises(OSError):
+        _tabla(1).guardar(ruta)
+    assert os.listdir(tmp_path) == ['tabla_riesgo.npz']
+    assert TablaRiesgo.cargar(ruta, 'hash-0') is not None
@@ -0,0 +1,81 @@
+"""Alta y búsqueda de usuarios, caché de usernames y rehash de contraseñas"""
+import pytest
+from werkzeug.security import generate_password_hash
+from config import CONTRASENA_METODO
+from modelo.cache_usuarios import CacheUsuarios
+from modelo.contrasenas import comprobar, es_hash, necesita_rehash
+from modelo.modelo import abrir_conexion_bd
+from modelo.modelo_autenticacion import ModeloAutenticacion
+from modelo.modelo_usuario import ModeloUsuario
+from tests.datos import password
+
+
+def test_busqueda_por_credenciales(pacientes):
+    ana = ModeloUsuario.buscar_usuario('ana', 'clave')
+    assert ana == (pacientes['ana'], 'ana', 'paciente')
+    assert password('ana').startswith(CONTRASENA_METODO + '$')
+    assert ModeloUsuario.buscar_usuario('ana', 'mala') is None
+    assert ModeloUsuario.buscar_usuario('nadie', 'clave') is None
+    assert ModeloAutenticacion.verificar_credenciales('ana', 'clave') == ana
+    assert ModeloAutenticacion.obtener_info_sesion(ana[0]) == ana
+
+
+def test_username_repetido(pacientes):
+    ok, error = ModeloUsuario.registrar_usuario('ana', 'otra', 'paciente', 'Ana', 'Bis', None, None, None, None, None)
+    assert not ok and 'ya existe' in error
+
+
+def test_busqueda_por_username(pacientes):
+    assert ModeloUsuario.buscar_usuario_por_username('ana') == (pacientes['ana'], 'ana', 'paciente')
+    encontrados = ModeloUsuario.buscar_usuarios_por_username(['ana', 'beto', 'nadie'])
+    assert sorted(encontrados) == ['ana', 'beto']
+
+
+def test_cache_evita_volver_a_la_base(pacientes):
+    ModeloUsuario.buscar_usuarios_por_username(['ana', 'beto', 'nadie'])
+    fallos = CacheUsuarios.global_().estadisticas()['fallos']
+    assert ModeloUsuario.buscar_usuario_por_username('ana')[0] == pacientes['ana']
+    # Los usernames inexistentes también se guardan (como None)
+    assert ModeloUsuario.buscar_usuario_por_username('nadie') is None
+    assert sorted(ModeloUsuario.buscar_usuarios_por_username(['ana', 'beto', 'nadie'])) == ['ana', 'beto']
+    assert CacheUsuarios.global_().estadisticas()['fallos'] == fallos
+
+
+def test_registro_invalida_el_inexistente_guardado(bd):
+    assert ModeloUsuario.buscar_usuario_por_username('dario') is None
+    ok, error = ModeloUsuario.registrar_usuario('dario', 'clave', 'paciente', 'Darío', 'Ruiz', None, None, None, None, None)
+    assert ok, error
+    assert ModeloUsuario.buscar_usuario_por_username('dario')[1] == 'dario'
+
+
+@pytest.mark.parametrize('guardada', ['secreta', generate_password_hash('secreta', method='pbkdf2:sha256:1000')],
+                         ids=['en_claro', 'coste_antiguo'])
+def test_rehash_al_iniciar_sesion(bd, guardada):
+    conn = abrir_conexion_bd()
+    try:
+        conn.cursor().execute("INSERT INTO usuarios (username, password, tipo) VALUES ('antiguo', %s, 'administrador')", (guardada,))
+        conn.commit()
+    finally:
+        conn.close()
+    assert ModeloUsuario.buscar_usuario('antiguo', 'mala') is None
+    assert necesita_rehash(password('antiguo'))
+    assert ModeloUsuario.buscar_usuario('antiguo', 'secreta')[1:] == ('antiguo', 'administrador')
+    assert es_hash(password('antiguo')) and not necesita_rehash(password('antiguo'))
+    # Con el hash nuevo la contraseña sigue valiendo
+    assert ModeloUsuario.buscar_usuario('antiguo', 'secreta')[1] == 'antiguo'
+
+
+@pytest.mark.parametrize('contrasena', [123, None, ['clave'], {'clave': 1}])
+def test_contrasena_que_no_es_texto_no_coincide(contrasena):
+    assert not comprobar(generate_password_hash('123', method=CONTRASENA_METODO), contrasena)
+    assert not comprobar('123', contrasena)
+
+
+@pytest.mark.parametrize('credenciales', [
+    {'username': 'ana', 'password': 123},
+    {'username': 'ana', 'password': ['clave']},
+    {'username': 'ana'},
+    {'username': 7, 'password': 'clave'},
+])
+def test_login_con_credenciales_que_no_son_texto_401(cliente, credenciales):
+    assert cliente.post('/api/login', json=credenciales).status_code == 401